@@ -71,4 +71,29 @@ VALIDATION_THRESHOLDS = {
     'missing_dates_warning': 5,
     'invalid_dates_warning': 3,
     'data_completeness_minimum': 95
-} 
\ No newline at end of file
+} 
+
+# Feriados nacionales de Perú para el cálculo de días hábiles.
+# 'fijos': (mes, día, desde_año) se repiten cada año a partir de desde_año.
+# 'semana_santa': Jueves y Viernes Santo se calculan a partir de la Pascua.
+# 'adicionales': días no laborables decretados u otros feriados puntuales (YYYY-MM-DD).
+FERIADOS_PERU = {
+    'fijos': [
+        (1, 1, None),     # Año Nuevo
+        (5, 1, None),     # Día del Trabajo
+        (6, 7, 2024),     # Batalla de Arica y Día de la Bandera
+        (6, 29, None),    # San Pedro y San Pablo
+        (7, 23, 2024),    # Día de la Fuerza Aérea del Perú
+        (7, 28, None),    # Fiestas Patrias
+        (7, 29, None),    # Fiestas Patrias
+        (8, 6, 2024),     # Batalla de Junín
+        (8, 30, None),    # Santa Rosa de Lima
+        (10, 8, None),    # Combate de Angamos
+        (11, 1, None),    # Todos los Santos
+        (12, 8, None),    # Inmaculada Concepción
+        (12, 9, 2022),    # Batalla de Ayacucho
+        (12, 25, None),   # Navidad
+    ],
+    'semana_santa': True,
+    'adicionales': [],
+}
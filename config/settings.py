@@ -127,6 +127,10 @@ MONGODB_CONFIG = {
     'database': 'expedientes_db',
     'collections': {
         'rankings': 'rankings',
+        # Esquema aplanado: un documento por (modulo, fecha, evaluador)
+        'rankings_diarios': 'rankings_diarios',
+        # Módulos ya migrados al esquema aplanado
+        'rankings_esquema': 'rankings_esquema',
         'historico': 'historico'
     }
 }
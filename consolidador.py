@@ -1,7 +1,18 @@
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 import os
 import shutil
+import json
+import hashlib
+import threading
+import multiprocessing
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from file_utils import confirmar_sobrescritura
+from src.utils.excel_tables import write_excel_table
+from src.utils.parquet_store import EXPORTAR_EXCEL, guardar_parquet
 import platform
 
 # Configuración de carpetas y archivos
@@ -21,10 +32,22 @@ else:  # Windows
     }
 
 output_files = {
-    "CCM": os.path.join(descargas_dir, "CCM", "consolidado_filtrado_ccm.xlsx"),
-    "PRR": os.path.join(descargas_dir, "PRR", "consolidado_filtrado_prr.xlsx")
+    "CCM": os.path.join(descargas_dir, "CCM", "consolidado_filtrado_ccm.parquet"),
+    "PRR": os.path.join(descargas_dir, "PRR", "consolidado_filtrado_prr.parquet")
 }
 
+# Lecturas simultáneas sobre las carpetas compartidas (red)
+LECTURAS_SIMULTANEAS = 4
+# Procesos que interpretan los libros (None: uno por CPU)
+PROCESOS_LECTURA = None
+HOJA_ASIGNACION = "ASIGNACION"
+# Caché de la consolidación incremental: un fragmento filtrado por libro y el manifiesto de huellas
+CACHE_DIR = os.path.join(descargas_dir, "cache_consolidador")
+MANIFIESTO = "manifiesto.json"
+# Subir al cambiar cómo se filtra o tipa un libro (extraer_relevante, tipar_fragmento):
+# invalida los fragmentos en caché aunque los libros no hayan cambiado
+ESQUEMA_FRAGMENTO = 1
+
 output_paths = {
     "CCM": [os.path.join(descargas_dir, "CCM"), os.path.join(descargas_dir, "CCM-ESP")],
     "PRR": [os.path.join(descargas_dir, "PRR")]
@@ -68,60 +91,210 @@ estados_validos = [
     "Pendiente (Por encauzamiento, etapas, etc)"
 ]
 
+# Estados válidos tal como quedan tras normalizar_estado
+ESTADOS_VALIDOS_NORMALIZADOS = frozenset(estado.upper() for estado in estados_validos)
+COLUMNAS_RELEVANTES = ["EXPEDIENTE", "ESTADO", "DESCRIPCION (OPCIONAL)", "DESCRIPCION", "FECHA DE TRABAJO"]
+
 def normalizar_estado(estado):
     """Normaliza el estado eliminando espacios antes y después."""
     return estado.strip().upper() if isinstance(estado, str) else estado
 
+def normalizar_columna(col):
+    return col.strip().upper() if isinstance(col, str) else str(col).strip()
+
+def _empieza_con(serie, prefijo):
+    """Máscara de las celdas de texto que empiezan con `prefijo` (las demás celdas, False)."""
+    try:
+        texto = pa.array(serie, from_pandas=True, type=pa.string())
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Columna con números o fechas mezclados: comparación celda a celda
+        return serie.map(lambda x: isinstance(x, str) and x.startswith(prefijo)).to_numpy(dtype=bool)
+    return pc.starts_with(texto, prefijo).fill_null(False).to_numpy(zero_copy_only=False)
+
+def _normalizar_estados(serie):
+    """
+    (estados normalizados, máscara de estados válidos).
+
+    Se normaliza una vez cada valor distinto y el resultado se expande con
+    los códigos de pd.factorize.
+    """
+    codigos, unicos = pd.factorize(serie, use_na_sentinel=True)
+    normalizados = np.array([normalizar_estado(estado) for estado in unicos] + [np.nan], dtype=object)
+    validos = np.array([estado in ESTADOS_VALIDOS_NORMALIZADOS for estado in normalizados])
+    return normalizados[codigos], validos[codigos]
+
 def extraer_relevante(df, archivo_origen):
     """Extrae las columnas EXPEDIENTE, ESTADO, DESCRIPCION y FECHA DE TRABAJO si existen."""
-    df.columns = [col.strip().upper() if isinstance(col, str) else str(col).strip() for col in df.columns]
-    columnas_necesarias = ["EXPEDIENTE", "ESTADO", "DESCRIPCION (OPCIONAL)", "DESCRIPCION", "FECHA DE TRABAJO"]
-    columnas_presentes = [col for col in columnas_necesarias if col in df.columns]
-    df_filtrado = df[columnas_presentes].copy()
-
-    if "DESCRIPCION (OPCIONAL)" in df_filtrado:
-        df_filtrado.rename(columns={"DESCRIPCION (OPCIONAL)": "DESCRIPCION"}, inplace=True)
+    df.columns = [normalizar_columna(col) for col in df.columns]
+    columnas_presentes = [col for col in COLUMNAS_RELEVANTES if col in df.columns]
+    df_filtrado = df[columnas_presentes].rename(columns={"DESCRIPCION (OPCIONAL)": "DESCRIPCION"})
 
+    # Un solo filtrado con las dos condiciones (las celdas que no son texto no pasan ninguna)
+    filas = np.ones(len(df_filtrado), dtype=bool)
     if "EXPEDIENTE" in df_filtrado:
-        df_filtrado = df_filtrado[df_filtrado["EXPEDIENTE"].apply(lambda x: isinstance(x, str) and x.startswith("LM"))]
-
+        filas &= _empieza_con(df_filtrado["EXPEDIENTE"], "LM")
+    if "ESTADO" in df_filtrado:
+        estados, validos = _normalizar_estados(df_filtrado["ESTADO"])
+        filas &= validos
+    df_filtrado = df_filtrado[filas]
     if "ESTADO" in df_filtrado:
-        df_filtrado["ESTADO"] = df_filtrado["ESTADO"].apply(normalizar_estado)
-        df_filtrado = df_filtrado[df_filtrado["ESTADO"].isin([estado.upper() for estado in estados_validos])]
+        df_filtrado["ESTADO"] = pd.Series(estados[filas], index=df_filtrado.index, dtype=object)
 
     df_filtrado["ARCHIVO_ORIGEN"] = archivo_origen
     return df_filtrado
 
-def consolidar_archivos_filtrados(input_folder, output_file):
-    datos_filtrados = []
-    archivos = [archivo for archivo in os.listdir(input_folder) if os.path.isfile(os.path.join(input_folder, archivo))]
-    total_archivos = len(archivos)
+def listar_libros(input_folder):
+    """Libros de asignación de la carpeta (sin temporales de Excel), en orden de nombre."""
+    return [
+        os.path.join(input_folder, archivo) for archivo in sorted(os.listdir(input_folder))
+        if os.path.isfile(os.path.join(input_folder, archivo))
+        and archivo.endswith((".xlsx", ".xlsm")) and not archivo.startswith("~$")
+    ]
+
+def tipar_fragmento(df):
+    """
+    FECHA DE TRABAJO como fecha y el resto de columnas como texto.
+
+    Se aplica a cada libro, de modo que su fragmento en la caché se guarda y
+    se relee sin cambios de tipo.
+    """
+    for columna in df.columns:
+        if columna == "FECHA DE TRABAJO":
+            df[columna] = pd.to_datetime(df[columna], errors='coerce')
+        else:
+            df[columna] = df[columna].map(lambda v: v if isinstance(v, str) or pd.isna(v) else str(v))
+    return df
+
+def interpretar_libro(contenido, archivo):
+    """
+    Lee la hoja de asignación de un libro ya descargado en memoria.
+
+    La hoja se elige de la lista de hojas del libro (ASIGNACION o, si no
+    existe, la primera), sin intentar una lectura que falle.
+
+    Returns:
+        (DataFrame filtrado o None, hoja usada, mensaje de error o None)
+    """
+    hoja = None
+    try:
+        with pd.ExcelFile(BytesIO(contenido)) as libro:
+            hoja = HOJA_ASIGNACION if HOJA_ASIGNACION in libro.sheet_names else libro.sheet_names[0]
+            df = _leer_hoja(libro, hoja)
+        return tipar_fragmento(extraer_relevante(df, archivo)), hoja, None
+    except Exception as e:
+        return None, hoja, str(e)
+
+def _leer_hoja(libro, hoja):
+    """
+    Lee la hoja con su fila de encabezado, solo con las columnas relevantes.
+
+    El encabezado es la primera fila no vacía entre las tres primeras. Las
+    columnas se eligen por posición a partir de esa fila, antes de separar
+    los datos, para no copiar las que se descartan.
+    """
+    df = libro.parse(hoja, header=None)
+    for i in range(3):
+        if not df.iloc[i].isnull().all():
+            encabezado = df.iloc[i]
+            posiciones = [
+                j for j, col in enumerate(encabezado) if normalizar_columna(col) in COLUMNAS_RELEVANTES
+            ]
+            df = df.iloc[i + 1:, posiciones].reset_index(drop=True)
+            df.columns = [encabezado.iloc[j] for j in posiciones]
+            break
+    return df
+
+def _leer_archivo(ruta):
+    with open(ruta, 'rb') as archivo:
+        return archivo.read()
+
+def leer_libros(rutas, lecturas=LECTURAS_SIMULTANEAS, procesos=PROCESOS_LECTURA, conocidos=None):
+    """
+    Lee e interpreta los libros en paralelo.
+
+    Un grupo acotado de hilos copia los archivos desde la carpeta compartida
+    (`lecturas` a la vez) y un pool de procesos los interpreta. Los libros
+    leídos que esperan proceso también están acotados, para no acumularlos en
+    memoria si la red es más rápida que el parseo.
+
+    Args:
+        conocidos: Hash del contenido ya consolidado por ruta; esos libros, si
+            no cambiaron, no se vuelven a interpretar
+    Yields:
+        (ruta, hash del contenido, resultado) en el orden de `rutas`. El
+        resultado es (DataFrame filtrado o None, hoja usada, error), o None si
+        el contenido coincide con `conocidos`
+    """
+    if not rutas:
+        return
+    conocidos = conocidos or {}
+    procesos = min(procesos or os.cpu_count() or 1, len(rutas))
+    if procesos > 1:
+        # spawn: mismo criterio que en descarga.py, el llamador puede tener hilos activos
+        pool = ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context('spawn'))
+    else:
+        pool = ThreadPoolExecutor(max_workers=1)
+    en_espera = threading.BoundedSemaphore(procesos * 2)
 
-    for idx, archivo in enumerate(archivos, start=1):
-        archivo_path = os.path.join(input_folder, archivo)
-        if archivo.endswith((".xlsx", ".xlsm")) and not archivo.startswith("~$"):
-            print(f"Procesando archivo {idx}/{total_archivos}: {archivo}")
+    def cargar(ruta):
+        en_espera.acquire()
+        try:
+            contenido = _leer_archivo(ruta)
+            huella = hashlib.sha1(contenido).hexdigest()
+            if conocidos.get(ruta) == huella:
+                en_espera.release()
+                return huella, None
+            futuro = pool.submit(interpretar_libro, contenido, os.path.basename(ruta))
+        except BaseException:
+            en_espera.release()
+            raise
+        futuro.add_done_callback(lambda _: en_espera.release())
+        return huella, futuro
+
+    with pool, ThreadPoolExecutor(max_workers=lecturas) as red:
+        cargas = [(ruta, red.submit(cargar, ruta)) for ruta in rutas]
+        for ruta, carga in cargas:
             try:
-                try:
-                    df = pd.read_excel(archivo_path, sheet_name="ASIGNACION", header=None)
-                except Exception:
-                    print(f"Pestaña 'ASIGNACION' no encontrada en {archivo}. Usando la primera pestaña.")
-                    df = pd.read_excel(archivo_path, sheet_name=0, header=None)
-
-                for i in range(3):
-                    if not df.iloc[i].isnull().all():
-                        df.columns = df.iloc[i]
-                        df = df[i + 1:].reset_index(drop=True)
-                        break
-
-                df_filtrado = extraer_relevante(df, archivo)
-                datos_filtrados.append(df_filtrado)
+                huella, futuro = carga.result()
+                resultado = futuro.result() if futuro is not None else None
             except Exception as e:
-                print(f"No se pudo procesar el archivo {archivo}: {e}")
+                huella, resultado = None, (None, None, str(e))
+            yield ruta, huella, resultado
+
+def consolidar_archivos_filtrados(input_folder, output_file, libros=None):
+    """
+    Consolida los libros de asignación de la carpeta.
+
+    Args:
+        libros: Resultados ya calculados de los libros de la carpeta (ruta ->
+            (DataFrame, hoja, error)); si no se indican, se leen los libros
+    """
+    if libros is None:
+        rutas = listar_libros(input_folder)
+        libros = ((ruta, resultado) for ruta, _, resultado in leer_libros(rutas))
+    else:
+        rutas = list(libros)
+        libros = libros.items()
+
+    datos_filtrados = []
+    for idx, (ruta, (df_filtrado, hoja, error)) in enumerate(libros, start=1):
+        archivo = os.path.basename(ruta)
+        print(f"Procesando archivo {idx}/{len(rutas)}: {archivo}")
+        if hoja is not None and hoja != HOJA_ASIGNACION:
+            print(f"Pestaña '{HOJA_ASIGNACION}' no encontrada en {archivo}. Usando la primera pestaña.")
+        if error is not None:
+            print(f"No se pudo procesar el archivo {archivo}: {error}")
+            continue
+        datos_filtrados.append(df_filtrado)
 
     if datos_filtrados:
         df_consolidado = pd.concat(datos_filtrados, ignore_index=True)
-        df_consolidado.to_excel(output_file, index=False)
+        if "FECHA DE TRABAJO" in df_consolidado.columns:
+            # Cada fragmento ya viene tipado; se asegura el tipo si la columna falta en alguno
+            df_consolidado["FECHA DE TRABAJO"] = pd.to_datetime(df_consolidado["FECHA DE TRABAJO"], errors='coerce')
+        guardar_parquet(df_consolidado, output_file)
+        if EXPORTAR_EXCEL:
+            write_excel_table(output_file.replace(".parquet", ".xlsx"), df_consolidado, "CONSOLIDADO")
         print(f"Archivo consolidado guardado en: {output_file}")
         return output_file
     else:
@@ -138,20 +311,128 @@ def mover_archivo(output_file, destinos):
         else:
             print(f"El archivo ya se encuentra en {destino}, no se realizó la copia.")
 
+def _ruta_fragmento(cache_dir, ruta):
+    return os.path.join(cache_dir, hashlib.sha1(ruta.encode("utf-8")).hexdigest() + ".parquet")
+
+def version_fragmentos():
+    """
+    Huella de lo que determina el contenido de un fragmento: estados válidos,
+    columnas relevantes, hoja leída y ESQUEMA_FRAGMENTO.
+    """
+    definicion = [ESQUEMA_FRAGMENTO, sorted(ESTADOS_VALIDOS_NORMALIZADOS), COLUMNAS_RELEVANTES, HOJA_ASIGNACION]
+    return hashlib.sha1(json.dumps(definicion, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def cargar_manifiesto(cache_dir=CACHE_DIR):
+    """
+    Manifiesto de la última consolidación (ruta -> tamaño, mtime, hash y hoja),
+    o vacío si no existe o sus fragmentos se generaron con otra versión del filtrado.
+    """
+    try:
+        with open(os.path.join(cache_dir, MANIFIESTO), encoding="utf-8") as f:
+            contenido = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    if not isinstance(contenido, dict) or contenido.get("version") != version_fragmentos():
+        print("El filtrado de los libros cambió desde la última consolidación: se procesarán todos.")
+        return {}
+    return contenido.get("libros", {})
+
+def guardar_manifiesto(manifiesto, cache_dir=CACHE_DIR):
+    ruta = os.path.join(cache_dir, MANIFIESTO)
+    with open(ruta + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"version": version_fragmentos(), "libros": manifiesto}, f, ensure_ascii=False, indent=1)
+    os.replace(ruta + ".tmp", ruta)
+
+def consolidar_carpetas(carpetas, salidas, completo=False, cache_dir=CACHE_DIR):
+    """
+    Consolida las carpetas de asignaciones reutilizando la ejecución anterior.
+
+    Cada libro deja en `cache_dir` su fragmento filtrado (Parquet) y en el
+    manifiesto su tamaño, mtime y hash de contenido. Los libros con el mismo
+    tamaño y mtime no se leen; los que cambiaron se leen y solo se vuelven a
+    interpretar si cambió su contenido. Los fragmentos de libros que ya no
+    están en las carpetas se eliminan. Si cambió la versión del filtrado (ver
+    version_fragmentos), la caché se descarta y se procesan todos los libros.
+
+    Args:
+        carpetas: Carpeta de entrada por clave (CCM, PRR)
+        salidas: Archivo consolidado por clave
+        completo: Ignorar la caché y procesar todos los libros
+    Returns:
+        Archivos consolidados generados por clave (None si no hubo datos)
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    anterior = {} if completo else cargar_manifiesto(cache_dir)
+    rutas = {key: listar_libros(folder) for key, folder in carpetas.items()}
+
+    manifiesto, estados, pendientes = {}, {}, []
+    for ruta in (ruta for lista in rutas.values() for ruta in lista):
+        estado = os.stat(ruta)
+        estados[ruta] = {"tamano": estado.st_size, "mtime": estado.st_mtime_ns}
+        entrada = anterior.get(ruta)
+        if entrada and all(entrada[campo] == valor for campo, valor in estados[ruta].items()) \
+                and os.path.exists(_ruta_fragmento(cache_dir, ruta)):
+            manifiesto[ruta] = entrada
+        else:
+            pendientes.append(ruta)
+    print(f"Libros sin cambios: {len(manifiesto)}. Libros nuevos o modificados: {len(pendientes)}.")
+
+    # Los libros de todas las carpetas se leen juntos, en un solo pool
+    conocidos = {
+        ruta: anterior[ruta]["hash"] for ruta in pendientes
+        if ruta in anterior and os.path.exists(_ruta_fragmento(cache_dir, ruta))
+    }
+    libros = {}
+    for ruta, huella, resultado in leer_libros(pendientes, conocidos=conocidos):
+        if resultado is None:
+            # Mismo contenido con otra fecha de modificación
+            manifiesto[ruta] = dict(anterior[ruta], **estados[ruta])
+            continue
+        df_filtrado, hoja, error = resultado
+        libros[ruta] = resultado
+        if error is None:
+            guardar_parquet(df_filtrado, _ruta_fragmento(cache_dir, ruta))
+            manifiesto[ruta] = dict(estados[ruta], hash=huella, hoja=hoja)
+
+    # Los libros con error no entran al manifiesto: se reintentan en la próxima ejecución
+    for ruta, entrada in manifiesto.items():
+        if ruta not in libros:
+            libros[ruta] = (pd.read_parquet(_ruta_fragmento(cache_dir, ruta)), entrada["hoja"], None)
+
+    vigentes = {os.path.basename(_ruta_fragmento(cache_dir, ruta)) for ruta in manifiesto}
+    for archivo in os.listdir(cache_dir):
+        if archivo.endswith(".parquet") and archivo not in vigentes:
+            os.remove(os.path.join(cache_dir, archivo))
+    guardar_manifiesto(manifiesto, cache_dir)
+
+    generados = {}
+    for key, lista in rutas.items():
+        print(f"\nIniciando procesamiento para {key}...")
+        generados[key] = consolidar_archivos_filtrados(
+            carpetas[key], salidas[key], {ruta: libros[ruta] for ruta in lista}
+        )
+    return generados
+
 # Renombrar la ejecución directa a una función principal
-def ejecutar_consolidacion():
+def ejecutar_consolidacion(completo=False):
+    """
+    Args:
+        completo: Volver a procesar todos los libros sin usar la caché
+    """
     # Verificar archivos que se crearán
     if not confirmar_sobrescritura(output_files):
         print("Proceso de consolidación omitido.")
         return
-        
-    for key in input_folders:
-        print(f"\nIniciando procesamiento para {key}...")
-        output_file = output_files[key]
-        destinos = output_paths[key]
-        archivo_generado = consolidar_archivos_filtrados(input_folders[key], output_file)
+
+    generados = consolidar_carpetas(input_folders, output_files, completo=completo)
+    for key, archivo_generado in generados.items():
         if archivo_generado:
-            mover_archivo(archivo_generado, destinos)
+            mover_archivo(archivo_generado, output_paths[key])
         print(f"Procesamiento para {key} completado.")
 
-# El resto del código permanece igual...
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Consolida los libros de asignación de CCM y PRR")
+    parser.add_argument('--full', action='store_true', help="Ignorar la caché y volver a procesar todos los libros")
+    ejecutar_consolidacion(completo=parser.parse_args().full)
@@ -1,9 +1,9 @@
 import os
+import numpy as np
 import pandas as pd
-from openpyxl import Workbook
-from openpyxl.utils.dataframe import dataframe_to_rows
-from openpyxl.worksheet.table import Table, TableStyleInfo
 from file_utils import confirmar_sobrescritura
+from src.utils.excel_tables import write_excel_table
+from src.utils.parquet_store import EXPORTAR_EXCEL, existe_tabla, guardar_parquet, leer_tabla
 
 # Configuración de rutas relativas
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -17,17 +17,19 @@ archivos_asignaciones = {
     "SOL": os.path.join(carpeta_manejo, "SOL", "ASIGNACIONES.xlsx")
 }
 
+# Consolidados procesados por gestionar_consolidados.py (el Excel queda como respaldo)
 consolidados = {
-    "CCM": os.path.join(carpeta_descargas, "CCM", "Consolidado_CCM.xlsx"),
-    "PRR": os.path.join(carpeta_descargas, "PRR", "Consolidado_PRR.xlsx"),
-    "CCM-ESP": os.path.join(carpeta_descargas, "CCM-ESP", "Consolidado_CCM-ESP.xlsx"),
-    "SOL": os.path.join(carpeta_descargas, "SOL", "Consolidado_SOL.xlsx")
+    "CCM": os.path.join(carpeta_descargas, "CCM", "Consolidado_CCM.parquet"),
+    "PRR": os.path.join(carpeta_descargas, "PRR", "Consolidado_PRR.parquet"),
+    "CCM-ESP": os.path.join(carpeta_descargas, "CCM-ESP", "Consolidado_CCM-ESP.parquet"),
+    "SOL": os.path.join(carpeta_descargas, "SOL", "Consolidado_SOL.parquet")
 }
 
+# Consolidados de asignaciones generados por consolidador.py
 consolidados_filtrados = {
-    "CCM": os.path.join(carpeta_descargas, "CCM", "Consolidado_Filtrado_CCM.xlsx"),
-    "PRR": os.path.join(carpeta_descargas, "PRR", "Consolidado_Filtrado_PRR.xlsx"),
-    "CCM-ESP": os.path.join(carpeta_descargas, "CCM-ESP", "Consolidado_Filtrado_CCM.xlsx"),
+    "CCM": os.path.join(carpeta_descargas, "CCM", "consolidado_filtrado_ccm.parquet"),
+    "PRR": os.path.join(carpeta_descargas, "PRR", "consolidado_filtrado_prr.parquet"),
+    "CCM-ESP": os.path.join(carpeta_descargas, "CCM-ESP", "consolidado_filtrado_ccm.parquet"),
 }
 
 hojas_evaluadores = {
@@ -37,6 +39,83 @@ hojas_evaluadores = {
     "SOL": "CONSOLIDADO_SOL_X_EVAL"
 }
 
+def asignar_evaluadores(df_consolidado, df_asignaciones):
+    """
+    EVALASIGN de cada expediente:
+    - no evaluado: el evaluador de la hoja de asignaciones,
+    - evaluado y con pre concluido: el operador del pre,
+    - en otro caso: vacío.
+    """
+    df_asignaciones = df_asignaciones.copy()
+    df_asignaciones.columns = df_asignaciones.columns.str.strip()
+    # Expediente repetido en la hoja: vale la última fila (como al armar un diccionario)
+    evaluadores = (
+        df_asignaciones.assign(EXPEDIENTE=df_asignaciones["EXPEDIENTE"].astype(str))
+        .drop_duplicates(subset="EXPEDIENTE", keep="last")
+        .set_index("EXPEDIENTE")["EVALUADOR"]
+    )
+    asignado = df_consolidado["NumeroTramite"].astype(str).map(evaluadores).astype(object)
+    operador = (
+        df_consolidado["OperadorPre"].astype(object) if "OperadorPre" in df_consolidado.columns
+        else pd.Series(None, index=df_consolidado.index, dtype=object)
+    )
+
+    evaluado = df_consolidado["Evaluado"]
+    valores = np.select(
+        [evaluado.eq("NO").to_numpy(), (evaluado.eq("SI") & df_consolidado["Pre_Concluido"].eq("SI")).to_numpy()],
+        [asignado.to_numpy(), operador.to_numpy()],
+        default=None
+    )
+    return pd.Series(valores, index=df_consolidado.index, dtype=object)
+
+def ultimo_trabajo_por_expediente(df_filtrado):
+    """
+    Fila con la FECHA DE TRABAJO más reciente de cada expediente (las fechas
+    vacías van al final; en empates, la primera fila del archivo), indexada
+    por EXPEDIENTE.
+    """
+    df_filtrado = df_filtrado.copy()
+    df_filtrado.columns = df_filtrado.columns.str.strip()
+    expedientes = df_filtrado["EXPEDIENTE"].astype(str)
+    fechas = pd.to_datetime(df_filtrado["FECHA DE TRABAJO"], errors='coerce')
+
+    codigos, _ = pd.factorize(expedientes, sort=True)
+    # Orden estable por expediente y fecha descendente, sin fecha al final
+    clave_fecha = -fechas.to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    clave_fecha[fechas.isna().to_numpy()] = np.iinfo(np.int64).max
+    orden = np.lexsort((clave_fecha, codigos))
+    primeros = orden[np.r_[True, codigos[orden][1:] != codigos[orden][:-1]]] if len(orden) else orden
+
+    ultimos = df_filtrado.iloc[primeros][["ESTADO", "DESCRIPCION"]]
+    ultimos["FECHA DE TRABAJO"] = fechas.iloc[primeros].to_numpy()
+    ultimos.index = pd.Index(expedientes.iloc[primeros].to_numpy(), name="EXPEDIENTE")
+    return ultimos
+
+def cruzar_consolidado(df_consolidado, df_asignaciones, df_filtrado=None):
+    """
+    Agrega al consolidado el evaluador asignado (EVALASIGN) y, si hay
+    consolidado de asignaciones, el último ESTADO, DESCRIPCION y FECHA DE
+    TRABAJO de cada expediente.
+    """
+    df_consolidado = df_consolidado.copy()
+    df_consolidado["EVALASIGN"] = asignar_evaluadores(df_consolidado, df_asignaciones)
+
+    if df_filtrado is not None:
+        ultimos = ultimo_trabajo_por_expediente(df_filtrado)
+        # Cruce por el índice de expedientes (equivale a un merge left por NumeroTramite)
+        posiciones = ultimos.index.get_indexer(df_consolidado["NumeroTramite"].astype(str))
+        encontrados = posiciones >= 0
+        for columna in ultimos.columns:
+            valores = ultimos[columna].to_numpy()
+            if columna == "FECHA DE TRABAJO":
+                columna_cruzada = np.full(len(posiciones), np.datetime64('NaT'), dtype=valores.dtype)
+            else:
+                columna_cruzada = np.full(len(posiciones), None, dtype=object)
+            columna_cruzada[encontrados] = valores[posiciones[encontrados]]
+            df_consolidado[columna] = columna_cruzada
+
+    return df_consolidado
+
 def procesar_cruces_combinados():
     for tipo in consolidados.keys():
         try:
@@ -44,71 +123,29 @@ def procesar_cruces_combinados():
             asignaciones_path = archivos_asignaciones[tipo]
             consolidado_filtrado_path = consolidados_filtrados.get(tipo)
             hoja_evaluador = hojas_evaluadores[tipo]
-            output_path = consolidado_path.replace(".xlsx", "_CRUZADO.xlsx")
+            output_path = consolidado_path.replace(".parquet", "_CRUZADO.parquet")
 
-            df_consolidado = pd.read_excel(consolidado_path)
+            df_consolidado = leer_tabla(consolidado_path, consolidado_path.replace(".parquet", ".xlsx"))
             df_asignaciones = pd.read_excel(asignaciones_path, sheet_name=hoja_evaluador)
-            df_asignaciones.columns = df_asignaciones.columns.str.strip()
-
-            df_asignaciones["EXPEDIENTE"] = df_asignaciones["EXPEDIENTE"].astype(str)
-            evaluador_dict = pd.Series(df_asignaciones["EVALUADOR"].values, index=df_asignaciones["EXPEDIENTE"]).to_dict()
-
-            df_consolidado["EVALASIGN"] = df_consolidado.apply(lambda row: calcular_evalasign(row, evaluador_dict), axis=1)
-
-            if tipo != "SOL" and consolidado_filtrado_path and os.path.exists(consolidado_filtrado_path):
-                df_filtrado = pd.read_excel(consolidado_filtrado_path)
-                df_filtrado.columns = df_filtrado.columns.str.strip()
-                df_filtrado["EXPEDIENTE"] = df_filtrado["EXPEDIENTE"].astype(str)
-                
-                for col in ["ESTADO", "DESCRIPCION", "FECHA DE TRABAJO"]:
-                    if df_filtrado[col].dtype == 'object':
-                        df_filtrado[col] = pd.Categorical(df_filtrado[col], ordered=False)
-
-                if "FECHA DE TRABAJO" in df_filtrado.columns:
-                    df_filtrado["FECHA DE TRABAJO"] = pd.to_datetime(df_filtrado["FECHA DE TRABAJO"], errors='coerce')
-                
-                df_filtrado = df_filtrado.sort_values(["EXPEDIENTE", "FECHA DE TRABAJO"], ascending=[True, False])
-                df_filtrado = df_filtrado.drop_duplicates(subset="EXPEDIENTE", keep="first")
-
-                df_consolidado = pd.merge(
-                    df_consolidado,
-                    df_filtrado[["EXPEDIENTE", "ESTADO", "DESCRIPCION", "FECHA DE TRABAJO"]],
-                    left_on="NumeroTramite",
-                    right_on="EXPEDIENTE",
-                    how="left"
-                ).drop(columns=["EXPEDIENTE"], errors="ignore")
-
-            guardar_como_tabla_nueva(output_path, df_consolidado, f"BASE_{tipo}")
+
+            df_filtrado = None
+            if tipo != "SOL" and consolidado_filtrado_path:
+                filtrado = existe_tabla(consolidado_filtrado_path, consolidado_filtrado_path.replace(".parquet", ".xlsx"))
+                if filtrado:
+                    df_filtrado = leer_tabla(filtrado)
+
+            df_consolidado = cruzar_consolidado(df_consolidado, df_asignaciones, df_filtrado)
+            guardar_parquet(df_consolidado, output_path)
+            print(f"Cruce guardado: {output_path}")
+
+            if EXPORTAR_EXCEL:
+                guardar_como_tabla_nueva(output_path.replace(".parquet", ".xlsx"), df_consolidado, f"BASE_{tipo}")
 
         except Exception as e:
             print(f"Error al procesar {tipo}: {str(e)}")
 
-def calcular_evalasign(row, evaluador_dict):
-    numero_tramite = str(row.get("NumeroTramite", ""))
-    if row["Evaluado"] == "NO":
-        return evaluador_dict.get(numero_tramite, None)
-    elif row["Evaluado"] == "SI" and row["Pre_Concluido"] == "SI":
-        return row.get("OperadorPre", None)
-    return None
-
 def guardar_como_tabla_nueva(archivo, df, tabla_nombre):
-    wb = Workbook()
-    ws = wb.active
-    ws.title = tabla_nombre
-
-    for r_idx, row in enumerate(dataframe_to_rows(df, index=False, header=True), start=1):
-        for c_idx, value in enumerate(row, start=1):
-            ws.cell(row=r_idx, column=c_idx, value=value)
-
-    table_ref = f"A1:{chr(64 + df.shape[1])}{df.shape[0] + 1}"
-    table = Table(displayName=tabla_nombre, ref=table_ref)
-    style = TableStyleInfo(
-        name="TableStyleMedium9", showFirstColumn=False,
-        showLastColumn=False, showRowStripes=True, showColumnStripes=True
-    )
-    table.tableStyleInfo = style
-    ws.add_table(table)
-    wb.save(archivo)
+    write_excel_table(archivo, df, tabla_nombre)
 
 if __name__ == "__main__":
     procesar_cruces_combinados()
\ No newline at end of file
@@ -9,6 +9,7 @@ from tabs.assignment_report import render_assignment_report_tab
 import tabs.ranking_report as ranking_report
 from modules.spe.spe_module import SPEModule
 from src.utils.database import get_google_credentials
+from src.utils.excel_utils import begin_export_rerun, export_stats
 import time
 from datetime import datetime, timedelta
 import pytz
@@ -662,6 +663,9 @@ def show_loading_progress(message, action, show_fade_in=True):
 
 def main():
     try:
+        # Las descargas se generan bajo demanda; medir lo que se evita en este rerun
+        begin_export_rerun()
+
         data_loader = st.session_state.data_loader
         if data_loader is None:
             st.error("No se pudo inicializar la conexión a la base de datos.")
@@ -762,7 +766,7 @@ def main():
                 # Definir las pestañas y sus funciones correspondientes
                 tabs_config = [
                     ("Reporte de pendientes", render_pending_reports_tab, [data, selected_module]),
-                    ("Ingreso de Expedientes", render_entry_analysis_tab, [data]),
+                    ("Ingreso de Expedientes", render_entry_analysis_tab, [data, selected_module]),
                     ("Cierre de Expedientes", render_closing_analysis_tab, [data]),
                     ("Reporte por Evaluador", render_evaluator_report_tab, [data]),
                     ("Reporte de Asignaciones", render_assignment_report_tab, [data]),
@@ -806,6 +810,16 @@ def main():
                             _, render_func, args = tabs_config[i]
                             render_func(*args)
 
+                # Resumen de exportaciones diferidas en este rerun
+                rerun_exports = export_stats()['rerun']
+                if rerun_exports['diferidas']:
+                    with st.sidebar:
+                        st.caption(
+                            f"⚡ {rerun_exports['diferidas']} exportaciones diferidas · "
+                            f"~{rerun_exports['segundos_ahorrados']:.1f} s y "
+                            f"{rerun_exports['bytes_ahorrados'] / 1024 / 1024:.1f} MB ahorrados"
+                        )
+
                 # Limpiar caché antiguo si el módulo ha cambiado
                 if st.session_state.get('last_module') != selected_module:
                     old_module = st.session_state.get('last_module')
@@ -14,11 +14,14 @@ def load_consolidated_cached(module_name):
         file_path = find_consolidated_file(folder, module_name)
         
         if file_path:
-            data = pd.read_excel(
-                file_path,
-                engine='openpyxl',
-                dtype_backend='pyarrow'
-            )
+            if file_path.endswith(".parquet"):
+                data = pd.read_parquet(file_path, dtype_backend='pyarrow')
+            else:
+                data = pd.read_excel(
+                    file_path,
+                    engine='openpyxl',
+                    dtype_backend='pyarrow'
+                )
             data = process_loaded_data(data)
             return data
             
@@ -29,14 +32,15 @@ def load_consolidated_cached(module_name):
 
 def find_consolidated_file(folder, module_name):
     """
-    Encontrar archivo consolidado en la carpeta del módulo.
+    Encontrar archivo consolidado en la carpeta del módulo (Parquet antes que Excel).
     """
     if not os.path.exists(folder):
         return None
         
-    for file in os.listdir(folder):
-        if file.startswith(f"Consolidado_{module_name}_CRUZADO") and file.endswith(".xlsx"):
-            return os.path.join(folder, file)
+    for extension in (".parquet", ".xlsx"):
+        for file in os.listdir(folder):
+            if file.startswith(f"Consolidado_{module_name}_CRUZADO") and file.endswith(extension):
+                return os.path.join(folder, file)
     return None
 
 def process_loaded_data(data):
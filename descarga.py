@@ -3,9 +3,35 @@ import requests
 import os
 import glob
 import time
-from concurrent.futures import ThreadPoolExecutor
+import shutil
+import threading
+import multiprocessing
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from requests.adapters import HTTPAdapter
 from requests_ntlm import HttpNtlmAuth
 from file_utils import confirmar_sobrescritura
+from src.utils.excel_tables import write_excel_table
+from src.utils.parquet_store import EXPORTAR_EXCEL, leer_tabla
+
+# Servidor de reportes (SSRS); se puede apuntar a scripts/servidor_ssrs_simulado.py para pruebas
+SSRS_BASE_URL = os.getenv('SSRS_BASE_URL', 'http://172.27.230.27/ReportServer')
+CREDENCIALES_NTLM = ('Yacosta', 'Yoky2024.4')
+# Tamaño de cada bloque escrito a disco durante la descarga
+CHUNK_SIZE = 1024 * 1024
+# Descargas simultáneas contra el servidor de reportes: inicial y límites del ajuste adaptativo
+CONCURRENCIA_INICIAL = 4
+CONCURRENCIA_MINIMA = 1
+CONCURRENCIA_MAXIMA = 8
+# Líneas de encabezado del reporte antes de los nombres de columna
+FILAS_PREAMBULO = 3
+# Dependencias que se conservan en los consolidados
+DEPENDENCIAS_CONSOLIDADO = ['LIMA', 'MIRAFLORES', 'LIMA SUR', 'LIMA NORTE']
+# Procesos para convertir CSV a Parquet (None: uno por CPU)
+PROCESOS_CONSOLIDACION = None
 
 # Configuración de parámetros
 tipos_tramite = {
@@ -33,76 +59,381 @@ def generar_urls_por_partes():
         urls_por_partes[tipo] = []
         for anio in anios:
             for estado in estados_tramite:
-                url = f"http://172.27.230.27/ReportServer?" \
+                url = f"{SSRS_BASE_URL}?" \
                       f"%2FAGV_PTP%2FRPT_INMIGRA_PTP_REGUL_CCM&nidtipoTramite={tipo}&anio={anio}&EstadoTramite={estado}" \
                       f"&rs:ParameterLanguage=&rs:Command=Render&rs:Format=CSV&rc:ItemPath=Tablix1"
                 urls_por_partes[tipo].append((url, anio, estado))
     return urls_por_partes
 
-# Descargar con requests y reintentos
-def descargar_con_reintentos(url, output_path, max_reintentos=3, timeout=600):
+class DescargaIncompleta(Exception):
+    """El servidor cerró la conexión antes de enviar todo el archivo."""
+
+_sesiones = threading.local()
+
+def obtener_sesion():
+    """
+    Sesión HTTP del hilo actual, con autenticación NTLM y conexión keep-alive.
+    Cada worker reutiliza su sesión (y la conexión ya autenticada) entre descargas.
+    """
+    sesion = getattr(_sesiones, 'sesion', None)
+    if sesion is None:
+        sesion = requests.Session()
+        sesion.auth = HttpNtlmAuth(*CREDENCIALES_NTLM)
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+        sesion.mount('http://', adaptador)
+        sesion.mount('https://', adaptador)
+        _sesiones.sesion = sesion
+    return sesion
+
+def _descargar_stream(sesion, url, parcial, timeout):
+    """
+    Descarga `url` en el archivo parcial, continuando desde su tamaño actual con
+    un Range request si el servidor lo permite.
+
+    Returns:
+        Bytes recibidos en esta llamada
+    """
+    descargados = os.path.getsize(parcial) if os.path.exists(parcial) else 0
+    headers = {'Range': f'bytes={descargados}-'} if descargados else {}
+
+    with sesion.get(url, headers=headers, stream=True, timeout=(30, timeout)) as response:
+        if descargados and response.status_code == 416:
+            # El rango pedido ya no es válido (archivo cambió): empezar de cero
+            os.remove(parcial)
+            return _descargar_stream(sesion, url, parcial, timeout)
+        response.raise_for_status()
+
+        reanudar = (
+            descargados > 0 and response.status_code == 206 and
+            response.headers.get('Content-Range', '').startswith(f'bytes {descargados}-')
+        )
+        if not reanudar:
+            descargados = 0
+        esperado = response.headers.get('Content-Length')
+        esperado = int(esperado) if esperado is not None and 'Content-Encoding' not in response.headers else None
+
+        recibidos = 0
+        with open(parcial, 'ab' if reanudar else 'wb') as file:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                file.write(chunk)
+                recibidos += len(chunk)
+
+    if esperado is not None and recibidos < esperado:
+        raise DescargaIncompleta(f"se recibieron {descargados + recibidos:,d} de {descargados + esperado:,d} bytes")
+    return recibidos
+
+# Descargar con reintentos, en streaming y reanudable
+def descargar_con_reintentos(url, output_path, max_reintentos=3, timeout=600, sesion=None, al_fallar=None):
+    """
+    Descarga un reporte escribiendo por bloques en `<output_path>.part` y lo
+    renombra de forma atómica al terminar, de modo que un CSV a medias nunca
+    queda con el nombre final. Si un intento falla a mitad de camino, el
+    siguiente continúa desde lo ya descargado (Range) cuando el servidor lo
+    soporta. Solo se reanuda entre intentos de la misma llamada: un `.part`
+    de una ejecución anterior se descarta, porque SSRS genera el reporte en
+    cada solicitud y sus bytes no continúan los de la nueva.
+
+    Args:
+        al_fallar: Función opcional llamada en cada intento fallido (para el control de concurrencia)
+    """
+    sesion = sesion or obtener_sesion()
+    parcial = output_path + '.part'
+    if os.path.exists(parcial):
+        os.remove(parcial)
     delay = 5  # Espera inicial de 5 segundos
     for intento in range(max_reintentos):
         try:
             print(f"Intento {intento + 1} de {max_reintentos} para: {url}")
-            response = requests.get(
-                url,
-                timeout=timeout,
-                auth=HttpNtlmAuth('Yacosta', 'Yoky2024.4')  # Credenciales NTLM
-            )
-            response.raise_for_status()  # Verifica si hubo errores en la solicitud
-            with open(output_path, 'wb') as file:
-                file.write(response.content)
+            _descargar_stream(sesion, url, parcial, timeout)
+            os.replace(parcial, output_path)
             print(f"Archivo descargado correctamente: {output_path}")
             return True
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, DescargaIncompleta) as e:
             print(f"Error en intento {intento + 1}: {e}")
-            time.sleep(delay)
-            delay *= 2  # Incrementa exponencialmente el tiempo de espera
+            if al_fallar:
+                al_fallar()
+            if intento < max_reintentos - 1:
+                time.sleep(delay)
+                delay *= 2  # Incrementa exponencialmente el tiempo de espera
     print(f"Falló la descarga tras {max_reintentos} intentos: {url}")
     return False
 
-# Descargar en paralelo
-def descargar_en_paralelo(tipo, urls, output_folder, max_workers=7):
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = []
-        for url, anio, estado in urls:
-            output_path = os.path.join(output_folder, f"{anio}_{estado}.csv")
-            if os.path.exists(output_path):
-                print(f"[{tipos_tramite[tipo]}] Archivo ya existe: {output_path}. Saltando...")
-                continue
-            futures.append(executor.submit(descargar_con_reintentos, url, output_path))
-        for future in futures:
-            future.result()  # Espera a que todas las descargas terminen
-
-# Consolidar archivos en Excel
-def consolidate_csv(folder_path, output_filename):
+class ControlConcurrencia:
+    """
+    Límite adaptativo de descargas simultáneas (aumento aditivo, reducción
+    multiplicativa).
+
+    Cada intento fallido reduce el límite a la mitad. Cuando una descarga
+    termina con un rendimiento (bytes/s) muy por debajo del promedio observado,
+    el servidor está saturado y el límite baja en uno; tras una ronda de
+    descargas sanas (tantas como el límite actual) sube en uno.
+    """
+
+    def __init__(self, inicial=CONCURRENCIA_INICIAL, minimo=CONCURRENCIA_MINIMA, maximo=CONCURRENCIA_MAXIMA):
+        self.minimo = minimo
+        self.maximo = maximo
+        self.limite = max(minimo, min(inicial, maximo))
+        self.activos = 0
+        self.limite_maximo_usado = self.limite
+        self._rendimiento_medio = None
+        self._exitos = 0
+        self._cond = threading.Condition()
+
+    def adquirir(self):
+        with self._cond:
+            while self.activos >= self.limite:
+                self._cond.wait()
+            self.activos += 1
+
+    def liberar(self):
+        with self._cond:
+            self.activos -= 1
+            self._cond.notify_all()
+
+    def registrar_error(self):
+        with self._cond:
+            self.limite = max(self.minimo, self.limite // 2)
+            self._exitos = 0
+
+    def registrar_exito(self, bytes_descargados, segundos):
+        rendimiento = bytes_descargados / max(segundos, 1e-6)
+        with self._cond:
+            medio = self._rendimiento_medio
+            self._rendimiento_medio = rendimiento if medio is None else 0.8 * medio + 0.2 * rendimiento
+            if medio is not None and rendimiento < 0.5 * medio:
+                self.limite = max(self.minimo, self.limite - 1)
+                self._exitos = 0
+                return
+            self._exitos += 1
+            if self._exitos >= self.limite and self.limite < self.maximo:
+                self.limite += 1
+                self._exitos = 0
+                self.limite_maximo_usado = max(self.limite_maximo_usado, self.limite)
+                self._cond.notify_all()
+
+
+class PlanificadorDescargas:
+    """
+    Cola única de descargas (tipo, año, estado) para todos los tipos de trámite.
+
+    Las descargas comparten un pool acotado cuyo uso efectivo regula
+    ControlConcurrencia, de modo que una partición lenta no detiene a las demás.
+    En cuanto llega la última partición de un tipo, su consolidación se lanza
+    en un hilo aparte mientras continúan las descargas del resto.
+    """
+
+    def __init__(self, output_folders, control=None, consolidar=None):
+        self.output_folders = output_folders
+        self.control = control or ControlConcurrencia()
+        self.consolidar = consolidar or (
+            lambda tipo, folder: consolidate_csv(folder, f"Consolidado_{tipos_tramite[tipo]}.xlsx")
+        )
+        self._lock = threading.Lock()
+        self._pendientes = {}
+        self._consolidaciones = []
+        self.bytes_por_tipo = {}
+        self.archivos_por_tipo = {}
+        self.fallidos = []
+        self.consolidaciones_fallidas = []
+
+    def _descargar(self, executor_consolidacion, tipo, url, output_path):
+        self.control.adquirir()
+        inicio = time.monotonic()
+        try:
+            ok = descargar_con_reintentos(url, output_path, al_fallar=self.control.registrar_error)
+        finally:
+            self.control.liberar()
+        with self._lock:
+            if ok:
+                tamano = os.path.getsize(output_path)
+                self.control.registrar_exito(tamano, time.monotonic() - inicio)
+                self.bytes_por_tipo[tipo] = self.bytes_por_tipo.get(tipo, 0) + tamano
+                self.archivos_por_tipo[tipo] = self.archivos_por_tipo.get(tipo, 0) + 1
+            else:
+                self.fallidos.append((tipos_tramite[tipo], os.path.basename(output_path)))
+            self._pendientes[tipo] -= 1
+            ultimo = self._pendientes[tipo] == 0
+        if ultimo:
+            self._lanzar_consolidacion(executor_consolidacion, tipo)
+
+    def _lanzar_consolidacion(self, executor_consolidacion, tipo):
+        print(f"\n[{tipos_tramite[tipo]}] Descargas completas. Consolidando...")
+        self._consolidaciones.append(
+            (tipo, executor_consolidacion.submit(self.consolidar, tipo, self.output_folders[tipo]))
+        )
+
+    def ejecutar(self, urls_por_tipo):
+        """
+        Descarga todas las particiones faltantes y consolida cada tipo.
+
+        Args:
+            urls_por_tipo: Diccionario tipo -> lista de (url, anio, estado) faltantes
+        """
+        self.inicio = time.monotonic()
+        trabajos = []
+        for tipo, urls in urls_por_tipo.items():
+            folder = self.output_folders[tipo]
+            for url, anio, estado in urls:
+                trabajos.append((tipo, url, os.path.join(folder, f"{anio}_{estado}.csv")))
+            self._pendientes[tipo] = len(urls)
+
+        # La consolidación usa un solo hilo: es intensiva en memoria y no debe competir consigo misma
+        with ThreadPoolExecutor(max_workers=1) as executor_consolidacion:
+            for tipo, pendientes in self._pendientes.items():
+                if pendientes == 0:
+                    print(f"Todos los archivos CSV ya existen para {tipos_tramite[tipo]}.")
+                    self._lanzar_consolidacion(executor_consolidacion, tipo)
+            with ThreadPoolExecutor(max_workers=self.control.maximo) as executor:
+                futures = [
+                    executor.submit(self._descargar, executor_consolidacion, tipo, url, output_path)
+                    for tipo, url, output_path in trabajos
+                ]
+                for future in futures:
+                    future.result()
+            for tipo, future in self._consolidaciones:
+                if future.result() is None:
+                    self.consolidaciones_fallidas.append(tipos_tramite[tipo])
+        self.segundos = time.monotonic() - self.inicio
+        return self
+
+    def reporte(self):
+        """Resumen de rendimiento de la ejecución (MB/s, archivos/min)."""
+        minutos = max(self.segundos, 1e-6) / 60
+        total_bytes = sum(self.bytes_por_tipo.values())
+        total_archivos = sum(self.archivos_por_tipo.values())
+        lineas = ["\nResumen de descargas:"]
+        for tipo, archivos in self.archivos_por_tipo.items():
+            lineas.append(
+                f"- {tipos_tramite[tipo]}: {archivos} archivos, {self.bytes_por_tipo[tipo] / 1024 ** 2:,.1f} MB"
+            )
+        lineas.append(
+            f"Total: {total_archivos} archivos, {total_bytes / 1024 ** 2:,.1f} MB en {self.segundos:,.1f} s "
+            f"({total_bytes / 1024 ** 2 / max(self.segundos, 1e-6):,.2f} MB/s, "
+            f"{total_archivos / minutos:,.1f} archivos/min)"
+        )
+        lineas.append(
+            f"Concurrencia final: {self.control.limite} (máxima alcanzada: {self.control.limite_maximo_usado})"
+        )
+        if self.fallidos:
+            lineas.append(f"Descargas fallidas ({len(self.fallidos)}):")
+            lineas.extend(f"  - {tipo}/{archivo}" for tipo, archivo in self.fallidos)
+        if self.consolidaciones_fallidas:
+            lineas.append(
+                "Consolidaciones no actualizadas (se conserva la anterior): "
+                + ", ".join(self.consolidaciones_fallidas)
+            )
+        return "\n".join(lineas)
+
+# Convertir un CSV del reporte a Parquet (se ejecuta en un proceso aparte)
+def csv_a_parquet(csv_path, parquet_path):
+    """
+    Lee el CSV por bloques con el lector de pyarrow, descarta las filas de
+    otras dependencias en cada bloque y escribe los bloques restantes a un
+    archivo Parquet, sin cargar el CSV completo en memoria.
+
+    Todas las columnas se leen como texto (vacío = nulo): el esquema es el
+    mismo en todos los archivos y el tipado queda para los pasos siguientes.
+
+    Returns:
+        (filas leídas, filas escritas)
+    """
+    read_options = pa_csv.ReadOptions(skip_rows=FILAS_PREAMBULO, block_size=8 * 1024 * 1024)
+    parse_options = pa_csv.ParseOptions(newlines_in_values=True)
+    # Primera lectura solo para los nombres de columna
+    with pa_csv.open_csv(csv_path, read_options=read_options, parse_options=parse_options) as lector:
+        columnas = lector.schema.names
+    convert_options = pa_csv.ConvertOptions(
+        column_types={columna: pa.string() for columna in columnas},
+        strings_can_be_null=True
+    )
+    valores = pa.array(DEPENDENCIAS_CONSOLIDADO)
+    leidas = escritas = 0
+    with pa_csv.open_csv(csv_path, read_options=read_options, parse_options=parse_options,
+                         convert_options=convert_options) as lector, \
+            pq.ParquetWriter(parquet_path, lector.schema) as escritor:
+        for lote in lector:
+            leidas += lote.num_rows
+            if 'Dependencia' in columnas:
+                lote = lote.filter(pc.is_in(lote.column('Dependencia'), value_set=valores))
+            if lote.num_rows:
+                escritor.write_batch(lote)
+                escritas += lote.num_rows
+    return leidas, escritas
+
+# Consolidar los CSV de un tipo en un dataset Parquet particionado por año
+def consolidate_csv(folder_path, output_filename, exportar_excel=EXPORTAR_EXCEL, max_procesos=PROCESOS_CONSOLIDACION):
+    """
+    Convierte los CSV `<anio>_<estado>.csv` de la carpeta en el dataset
+    `<Consolidado_X>/anio=<anio>/<anio>_<estado>.parquet`, un archivo por CSV,
+    en procesos en paralelo. El dataset se arma en una carpeta temporal y
+    reemplaza al anterior solo si todos los CSV se convirtieron; si alguno
+    falla, se conserva el dataset anterior.
+
+    Args:
+        output_filename: Nombre del consolidado (ej. Consolidado_CCM.xlsx); sin extensión es el dataset
+        exportar_excel: Además, escribir el consolidado en Excel con ese nombre
+    Returns:
+        Ruta del dataset, o None si no se pudo consolidar
+    """
     try:
-        csv_files = glob.glob(os.path.join(folder_path, "*.csv"))
+        csv_files = sorted(glob.glob(os.path.join(folder_path, "*.csv")))
         if not csv_files:
             print(f"No se encontraron archivos CSV en {folder_path}.")
             return
 
-        consolidated_data = []
+        nombre = os.path.splitext(output_filename)[0]
+        dataset_path = os.path.join(folder_path, nombre)
+        temporal = dataset_path + ".tmp"
+        shutil.rmtree(temporal, ignore_errors=True)
+
+        tareas = {}
         for file in csv_files:
-            try:
-                print(f"Procesando: {file}")
-                df = pd.read_csv(file, skiprows=3, sep=",", low_memory=False)
-                if 'Dependencia' in df.columns:
-                    df = df[df['Dependencia'].isin(['LIMA', 'MIRAFLORES', 'LIMA SUR', 'LIMA NORTE'])]
-                consolidated_data.append(df)
-            except Exception as e:
-                print(f"Error al procesar {file}: {e}")
-
-        if consolidated_data:
-            final_df = pd.concat(consolidated_data, ignore_index=True)
-            output_file = os.path.join(folder_path, output_filename)
-            final_df.to_excel(output_file, index=False)
-            print(f"Consolidado guardado en: {output_file}")
+            base = os.path.splitext(os.path.basename(file))[0]
+            anio = base.split("_")[0]
+            destino = os.path.join(temporal, f"anio={anio}")
+            os.makedirs(destino, exist_ok=True)
+            tareas[file] = os.path.join(destino, f"{base}.parquet")
+
+        procesos = min(max_procesos or os.cpu_count() or 1, len(tareas))
+        if procesos > 1:
+            # spawn: esta función corre en un hilo del planificador de descargas
+            executor = ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context('spawn'))
         else:
-            print(f"No se generó ningún consolidado para {folder_path}.")
+            # Con un solo proceso no vale la pena el costo de arrancarlo
+            executor = ThreadPoolExecutor(max_workers=1)
+        escritas = 0
+        fallidos = []
+        with executor:
+            futures = {file: executor.submit(csv_a_parquet, file, destino) for file, destino in tareas.items()}
+            for file, future in futures.items():
+                try:
+                    leidas, filas = future.result()
+                    escritas += filas
+                    print(f"Procesado: {file} ({filas:,d} de {leidas:,d} filas)")
+                except Exception as e:
+                    print(f"Error al procesar {file}: {e}")
+                    fallidos.append(os.path.basename(file))
+
+        if fallidos:
+            shutil.rmtree(temporal, ignore_errors=True)
+            print(
+                f"No se actualizó {dataset_path}: fallaron {len(fallidos)} de {len(tareas)} CSV "
+                f"({', '.join(fallidos)}). Se conserva el consolidado anterior."
+            )
+            return None
+
+        shutil.rmtree(dataset_path, ignore_errors=True)
+        os.replace(temporal, dataset_path)
+        print(f"Consolidado guardado en: {dataset_path} ({escritas:,d} filas)")
+
+        if exportar_excel:
+            output_file = os.path.join(folder_path, output_filename)
+            write_excel_table(output_file, leer_tabla(dataset_path), nombre)
+            print(f"Exportado a Excel: {output_file}")
+        return dataset_path
     except Exception as e:
         print(f"Error al consolidar archivos: {e}")
+        return None
 
 # Descargar y consolidar archivos
 def descargar_y_consolidar():
@@ -110,7 +441,7 @@ def descargar_y_consolidar():
     
     # Verificar archivos consolidados finales que se crearán
     archivos_consolidados = {
-        tipo: os.path.join(folder, f"Consolidado_{tipos_tramite[tipo]}.xlsx")
+        tipo: os.path.join(folder, f"Consolidado_{tipos_tramite[tipo]}")
         for tipo, folder in output_folders.items()
     }
     
@@ -151,25 +482,18 @@ def descargar_y_consolidar():
         return
     
     urls_por_partes = generar_urls_por_partes()
+    urls_faltantes = {}
     for tipo, urls in urls_por_partes.items():
-        print(f"\nIniciando descargas en paralelo para {tipos_tramite[tipo]}...")
-        
-        # Verificar qué archivos CSV faltan
+        # Descargar solo los archivos CSV faltantes
         folder = output_folders[tipo]
         archivos_existentes = {os.path.basename(f) for f in glob.glob(os.path.join(folder, "*.csv"))}
-        
-        # Filtrar URLs para descargar solo los archivos faltantes
-        urls_faltantes = []
-        for url, anio, estado in urls:
-            nombre_archivo = f"{anio}_{estado}.csv"
-            if nombre_archivo not in archivos_existentes:
-                urls_faltantes.append((url, anio, estado))
-        
-        if not urls_faltantes:
-            print(f"Todos los archivos CSV ya existen para {tipos_tramite[tipo]}.")
-        else:
-            print(f"Descargando {len(urls_faltantes)} archivos faltantes para {tipos_tramite[tipo]}...")
-            descargar_en_paralelo(tipo, urls_faltantes, folder, max_workers=5)
-        
-        # Consolidar todos los CSV (tanto existentes como nuevos)
-        consolidate_csv(folder, f"Consolidado_{tipos_tramite[tipo]}.xlsx")
+        urls_faltantes[tipo] = [
+            (url, anio, estado) for url, anio, estado in urls
+            if f"{anio}_{estado}.csv" not in archivos_existentes
+        ]
+        if urls_faltantes[tipo]:
+            print(f"{tipos_tramite[tipo]}: {len(urls_faltantes[tipo])} archivos por descargar.")
+
+    # Una sola cola para todos los tipos; cada tipo se consolida al terminar sus descargas
+    planificador = PlanificadorDescargas(output_folders).ejecutar(urls_faltantes)
+    print(planificador.reporte())
@@ -133,7 +133,7 @@ def verificar_rutas():
     print_styled("\nVerificando archivos:", style="info")
     for carpeta in ['CCM', 'PRR', 'CCM-ESP', 'SOL']:
         ruta = os.path.join(descargas_dir, carpeta)
-        archivo = os.path.join(ruta, f"Consolidado_{carpeta}_CRUZADO.xlsx")
+        archivo = os.path.join(ruta, f"Consolidado_{carpeta}_CRUZADO.parquet")
         print_styled(f"- {archivo}: {'✅ Existe' if os.path.exists(archivo) else '❌ No existe'}", style="info")
 
 def main():
@@ -1,7 +1,39 @@
 import os
 import pandas as pd
-from openpyxl import load_workbook, Workbook
-from openpyxl.worksheet.table import Table, TableStyleInfo
+from openpyxl import load_workbook
+from src.utils.excel_sheets import ContenidoHoja, reemplazar_hojas
+
+def actualizar_asignaciones(archivo_asignaciones, datos_filtrados, nombre_hoja):
+    """
+    Escribe los pendientes filtrados en ASIGNACIONES.xlsx.
+
+    REPORTADO_SIM conserva su encabezado y queda solo con los pendientes; la
+    hoja `nombre_hoja` se reemplaza por IDENTIFICADOS + pendientes como
+    tabla. Solo se reescriben esas dos hojas, el resto del libro se copia tal
+    cual.
+
+    Args:
+        datos_filtrados: Pares [expediente, evaluador]
+    """
+    # Solo lectura: se interpreta únicamente la hoja IDENTIFICADOS
+    wb_asignaciones = load_workbook(archivo_asignaciones, read_only=True)
+    try:
+        datos_identificados = [
+            [row[0], row[1]]
+            for row in wb_asignaciones["IDENTIFICADOS"].iter_rows(min_row=2, values_only=True)
+            if len(row) > 1 and row[0] and row[1]  # Solo si hay datos en ambas columnas
+        ]
+    finally:
+        wb_asignaciones.close()
+
+    reemplazar_hojas(archivo_asignaciones, {
+        "REPORTADO_SIM": ContenidoHoja(datos_filtrados),
+        nombre_hoja: ContenidoHoja(
+            datos_identificados + datos_filtrados,
+            encabezados=["EXPEDIENTE", "EVALUADOR"],
+            tabla=nombre_hoja.replace("-", "_"),
+        ),
+    })
 
 def procesar_carpeta(carpeta, nombre_hoja):
     """
@@ -49,54 +81,7 @@ def procesar_carpeta(carpeta, nombre_hoja):
 
         print(f"Registros filtrados en {carpeta}: {len(datos_filtrados)}")
 
-        # Trabajar con el archivo de asignaciones
-        wb_asignaciones = load_workbook(archivo_asignaciones)
-        
-        # Limpiar REPORTADO_SIM
-        if "REPORTADO_SIM" in wb_asignaciones.sheetnames:
-            ws_reportado = wb_asignaciones["REPORTADO_SIM"]
-            for row in ws_reportado.iter_rows(min_row=2):
-                for cell in row:
-                    cell.value = None
-
-        # Escribir datos filtrados en REPORTADO_SIM
-        ws_reportado = wb_asignaciones["REPORTADO_SIM"]
-        for i, (exp, eval) in enumerate(datos_filtrados, start=2):
-            ws_reportado.cell(row=i, column=1, value=exp)
-            ws_reportado.cell(row=i, column=2, value=eval)
-
-        # Leer datos de IDENTIFICADOS
-        ws_identificados = wb_asignaciones["IDENTIFICADOS"]
-        datos_identificados = []
-        for row in ws_identificados.iter_rows(min_row=2, values_only=True):
-            if row[0] and row[1]:  # Solo si hay datos en ambas columnas
-                datos_identificados.append([row[0], row[1]])
-
-        # Crear o reemplazar hoja CONSOLIDADO
-        if nombre_hoja in wb_asignaciones.sheetnames:
-            del wb_asignaciones[nombre_hoja]
-        ws_consolidado = wb_asignaciones.create_sheet(nombre_hoja)
-
-        # Escribir encabezados
-        ws_consolidado.cell(row=1, column=1, value="EXPEDIENTE")
-        ws_consolidado.cell(row=1, column=2, value="EVALUADOR")
-
-        # Combinar y escribir datos
-        datos_consolidados = datos_identificados + datos_filtrados
-        for i, (exp, eval) in enumerate(datos_consolidados, start=2):
-            ws_consolidado.cell(row=i, column=1, value=exp)
-            ws_consolidado.cell(row=i, column=2, value=eval)
-
-        # Crear tabla
-        tab = Table(displayName=nombre_hoja.replace("-", "_"),
-                   ref=f"A1:B{len(datos_consolidados) + 1}")
-        style = TableStyleInfo(name="TableStyleMedium9", showFirstColumn=False,
-                             showLastColumn=False, showRowStripes=True, showColumnStripes=True)
-        tab.tableStyleInfo = style
-        ws_consolidado.add_table(tab)
-
-        # Guardar cambios
-        wb_asignaciones.save(archivo_asignaciones)
+        actualizar_asignaciones(archivo_asignaciones, datos_filtrados, nombre_hoja)
         print(f"Consolidado creado en {carpeta}.")
 
     except Exception as e:
@@ -19,8 +19,16 @@ from sklearn.pipeline import make_pipeline
 from sklearn.linear_model import Ridge
 from statsmodels.nonparametric.smoothers_lowess import lowess
 from prophet import Prophet
-from src.utils.excel_utils import create_excel_download
-from statsmodels.tsa.seasonal import seasonal_decompose
+from src.utils.excel_utils import deferred_excel_download, deferred_download, huella_datos
+from src.utils.cache import data_version, session_cached
+from src.services.spe_dataset import SPEDataset
+from src.services.pivot_engine import PivotEngine
+from src.services.productivity_table import MonthlyProductivity
+from src.services.rankings_repository import RankingsRepository, build_ranking_matrix, ranking_column, COLUMNAS_RANKING
+from src.utils.paginated_table import render_paginated_table
+from src.utils.business_days import business_calendar
+from src.services.model_jobs import render_model_job, job_key
+from src.services.forecast_models import monthly_forecast
 import os
 from dotenv import load_dotenv
 
@@ -42,6 +50,10 @@ class SPEModule:
         'BENEFICIARIO': 'NOMBRES_BENEFICIARIO'
     }
 
+    # Ventanas (días) del ranking de expedientes trabajados; None muestra todo el historial
+    RANKING_VENTANAS = [15, 30, 60, 90, 180, 365, None]
+    RANKING_VENTANA_DEFECTO = 30
+
     def __init__(self):
         """Inicializar módulo SPE."""
         self.credentials = get_google_credentials()
@@ -57,12 +69,25 @@ class SPEModule:
         """Getter para el diccionario de columnas."""
         return self._columnas
 
+    @property
+    def columnas_fecha(self):
+        """Columnas de fecha de la hoja que se tipan al cargarla."""
+        return [self.columnas['FECHA_TRABAJO'], self.columnas['FECHA_ASIGNACION'], self.columnas['FECHA_INGRESO']]
+
+    def _dataset(self, raw):
+        """Dataset tipado de la hoja, construido una vez por carga y guardado en session_state."""
+        dataset = st.session_state.get('spe_dataset')
+        if dataset is None or dataset.raw is not raw:
+            dataset = SPEDataset(raw, self.columnas_fecha)
+            st.session_state.spe_dataset = dataset
+        return dataset
+
     def load_data(self):
-        """Cargar datos desde Google Sheets."""
+        """Cargar datos desde Google Sheets (con las columnas de fecha ya parseadas)."""
         try:
             # Si los datos ya están en session_state y no se solicitó recarga, usarlos
             if st.session_state.spe_data is not None:
-                return st.session_state.spe_data
+                return self._dataset(st.session_state.spe_data).data
 
             if self.credentials is None:
                 st.error("No se pudo inicializar el cliente de Google Sheets")
@@ -72,7 +97,7 @@ class SPEModule:
             # Cargar datos y guardarlos en session_state
             data = pd.DataFrame(sheet.get_all_records())
             st.session_state.spe_data = data
-            return data
+            return self._dataset(data).data
         except Exception as e:
             st.error(f"Error al cargar datos de Google Sheets: {str(e)}")
             return None
@@ -144,25 +169,6 @@ class SPEModule:
         fecha_actual = pd.Timestamp.now(tz='America/Lima')
         fecha_ayer = (fecha_actual - pd.Timedelta(days=1)).date()
 
-        # Convertir fecha de trabajo a datetime considerando timezone
-        try:
-            data[COLUMNAS['FECHA_TRABAJO']] = pd.to_datetime(
-                data[COLUMNAS['FECHA_TRABAJO']], 
-                format='mixed',
-                dayfirst=True,
-                errors='coerce'
-            )
-            
-            # Guardar las fechas inválidas antes de eliminarlas
-            fechas_invalidas = data[
-                (data[COLUMNAS['FECHA_TRABAJO']].isna()) & 
-                (data[COLUMNAS['FECHA_TRABAJO']].astype(str) != '')
-            ]
-            
-        except Exception as e:
-            st.error(f"Error al procesar fechas: {str(e)}")
-            return
-
         # Obtener última fecha registrada
         ultima_fecha_db = self._get_last_date_from_db(collection)
         ultima_fecha = ultima_fecha_db.date() if ultima_fecha_db else None
@@ -185,67 +191,35 @@ class SPEModule:
             (data[COLUMNAS['EVALUADOR']] != '')
         ].copy()
 
-        # Obtener datos históricos de MongoDB
-        registros_historicos = list(collection.find({
-            "modulo": "SPE",
-            "fecha": {"$lt": fecha_actual}
-        }).sort("fecha", -1))
-
-        # Preparar DataFrame histórico
-        df_historico = pd.DataFrame()
-        fechas_guardadas = set()
-
-        # Procesar registros históricos
-        if registros_historicos:
-            for registro in registros_historicos:
-                fecha = pd.Timestamp(registro['fecha'])
-                fechas_guardadas.add(fecha.date())
-                fecha_str = fecha.strftime('%d/%m')
-                df_temp = pd.DataFrame(registro['datos'])
-                if not df_temp.empty:
-                    evaluador_col = 'EVALUADOR' if 'EVALUADOR' in df_temp.columns else 'evaluador'
-                    df_pivot = pd.DataFrame({
-                        'EVALUADOR': df_temp[evaluador_col].tolist(),
-                        fecha_str: df_temp['cantidad'].tolist()
-                    })
-                    if df_historico.empty:
-                        df_historico = df_pivot
-                    else:
-                        df_historico = df_historico.merge(
-                            df_pivot, on='EVALUADOR', how='outer'
-                        )
+        # Ventana de días a mostrar en el ranking (incluye hoy)
+        dias_ranking = st.selectbox(
+            "Días a mostrar",
+            options=self.RANKING_VENTANAS,
+            index=self.RANKING_VENTANAS.index(self.RANKING_VENTANA_DEFECTO),
+            format_func=lambda d: "Todo el historial" if d is None else f"Últimos {d} días",
+            key="spe_ranking_dias"
+        )
+        desde = fecha_actual.date() - timedelta(days=dias_ranking - 1) if dias_ranking else None
 
-        # Agregar datos de hoy si existen
+        # Rankings guardados (ya aplanados por MongoDB) más los conteos de hoy
+        repo = RankingsRepository(collection)
+        registros = [repo.read("SPE", desde, fecha_ayer)]
         if not datos_hoy.empty:
-            datos_hoy_agrupados = datos_hoy.groupby(COLUMNAS['EVALUADOR']).size().reset_index(name='cantidad')
-            fecha_hoy_str = fecha_actual.strftime('%d/%m')
-            df_hoy = pd.DataFrame({
-                'EVALUADOR': datos_hoy_agrupados[COLUMNAS['EVALUADOR']].tolist(),
-                fecha_hoy_str: datos_hoy_agrupados['cantidad'].tolist()
-            })
-            
-            if df_historico.empty:
-                df_historico = df_hoy
-            else:
-                df_historico = df_historico.merge(df_hoy, on='EVALUADOR', how='outer')
+            registros.append(
+                datos_hoy.groupby(COLUMNAS['EVALUADOR']).size()
+                .rename_axis('evaluador').reset_index(name='cantidad')
+                .assign(fecha=pd.Timestamp(fecha_actual.date()))
+            )
+        registros = [r for r in registros if not r.empty]
+        df_historico = build_ranking_matrix(
+            pd.concat(registros, ignore_index=True) if registros else pd.DataFrame(columns=COLUMNAS_RANKING),
+            columna_evaluador='EVALUADOR'
+        )
 
         # Mostrar tabla de ranking
         if not df_historico.empty:
-            df_historico = df_historico.fillna(0)
-            
-            # Ordenar columnas cronológicamente
-            cols_fecha = [col for col in df_historico.columns if col != 'EVALUADOR']
-            cols_ordenadas = ['EVALUADOR'] + sorted(
-                cols_fecha,
-                key=lambda x: pd.to_datetime(x + f"/{datetime.now().year}", format='%d/%m/%Y')
-            )
-            
-            df_historico = df_historico[cols_ordenadas]
-            df_historico['Total'] = df_historico.iloc[:, 1:].sum(axis=1)
-            df_historico = df_historico.sort_values('Total', ascending=False)
-
             # Aplicar estilo para resaltar la columna de hoy y formatear números
-            fecha_hoy_str = fecha_actual.strftime('%d/%m')
+            fecha_hoy_str = ranking_column(df_historico, fecha_actual)
             def style_dataframe(df):
                 return df.style.apply(
                     lambda col: ['background-color: #90EE90' if col.name == fecha_hoy_str else '' for _ in range(len(col))]
@@ -259,7 +233,7 @@ class SPEModule:
             )
 
             # Agregar botón de descarga formateado
-            excel_data_ranking = create_excel_download(
+            excel_data_ranking = deferred_excel_download(
                 df_historico,
                 "ranking_expedientes.xlsx",
                 "Ranking_Expedientes",
@@ -277,10 +251,7 @@ class SPEModule:
             if ultima_fecha_db:
                 if st.button("🔄 Resetear último día", key="resetear_fecha"):
                     try:
-                        collection.delete_many({
-                            "modulo": "SPE",
-                            "fecha": ultima_fecha_db
-                        })
+                        RankingsRepository(collection).delete_day("SPE", ultima_fecha_db)
                         st.success("✅ Última fecha eliminada correctamente")
                         st.rerun()
                     except Exception as e:
@@ -304,20 +275,23 @@ class SPEModule:
                     
                     if selected_dates and st.button("💾 Guardar datos seleccionados"):
                         try:
-                            for fecha in selected_dates:
-                                datos_dia = datos_por_guardar[
-                                    datos_por_guardar[COLUMNAS['FECHA_TRABAJO']].dt.date == fecha
-                                ]
-                                datos_agrupados = datos_dia.groupby(COLUMNAS['EVALUADOR']).size().reset_index(name='cantidad')
-                                
-                                nuevo_registro = {
-                                    "fecha": pd.Timestamp(fecha),
-                                    "datos": datos_agrupados.to_dict('records'),
-                                    "modulo": "SPE"
-                                }
-                                collection.insert_one(nuevo_registro)
+                            # Conteos por (fecha, evaluador) de todas las fechas elegidas
+                            datos_seleccionados = datos_por_guardar[
+                                datos_por_guardar[COLUMNAS['FECHA_TRABAJO']].dt.date.isin(selected_dates)
+                            ]
+                            conteos = datos_seleccionados.groupby([
+                                datos_seleccionados[COLUMNAS['FECHA_TRABAJO']].dt.normalize().rename('fecha'),
+                                datos_seleccionados[COLUMNAS['EVALUADOR']].rename('evaluador')
+                            ]).size().reset_index(name='cantidad')
+
+                            resultado = RankingsRepository(collection).write(
+                                "SPE", conteos, clave_evaluador=COLUMNAS['EVALUADOR']
+                            )
                             
-                            st.success("✅ Datos guardados correctamente")
+                            st.success(
+                                f"✅ Datos guardados correctamente: {resultado['insertados']} fechas nuevas, "
+                                f"{resultado['actualizados']} actualizadas"
+                            )
                             st.rerun()
                         except Exception as e:
                             st.error(f"Error al guardar los datos: {str(e)}")
@@ -380,7 +354,7 @@ class SPEModule:
         )
 
         # Agregar botón de descarga formateado
-        excel_data_evaluador = create_excel_download(
+        excel_data_evaluador = deferred_excel_download(
             pivot_table,
             "pendientes_evaluador.xlsx",
             "Pendientes_Evaluador",
@@ -433,7 +407,7 @@ class SPEModule:
         )
 
         # Agregar botón de descarga formateado
-        excel_data_estado = create_excel_download(
+        excel_data_estado = deferred_excel_download(
             pivot_table_estado,
             "pendientes_estado.xlsx",
             "Pendientes_Estado",
@@ -459,25 +433,31 @@ class SPEModule:
             fig_estado.update_traces(textposition='outside')
             st.plotly_chart(fig_estado, use_container_width=True)
 
-        # BOTÓN DE DESCARGA AL FINAL
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            pivot_table.to_excel(writer, sheet_name='Expedientes_Por_Evaluador')
-            pivot_table_estado.to_excel(writer, sheet_name='Expedientes_Por_Estado')
-            
-            detalle = data_filtrada[[
-                COLUMNAS['EXPEDIENTE'], 
-                COLUMNAS['EVALUADOR'], 
-                COLUMNAS['ETAPA'],
-                COLUMNAS['ESTADO'],
-                COLUMNAS['FECHA_TRABAJO']
-            ]].sort_values([COLUMNAS['EVALUADOR'], COLUMNAS['FECHA_TRABAJO']])
-            detalle.to_excel(writer, sheet_name='Detalle_Expedientes', index=False)
-        output.seek(0)
+        # BOTÓN DE DESCARGA AL FINAL (el archivo se arma al hacer clic)
+        def generar_reporte_completo():
+            output = BytesIO()
+            with pd.ExcelWriter(output, engine='openpyxl') as writer:
+                pivot_table.to_excel(writer, sheet_name='Expedientes_Por_Evaluador')
+                pivot_table_estado.to_excel(writer, sheet_name='Expedientes_Por_Estado')
+                
+                detalle = data_filtrada[[
+                    COLUMNAS['EXPEDIENTE'], 
+                    COLUMNAS['EVALUADOR'], 
+                    COLUMNAS['ETAPA'],
+                    COLUMNAS['ESTADO'],
+                    COLUMNAS['FECHA_TRABAJO']
+                ]].sort_values([COLUMNAS['EVALUADOR'], COLUMNAS['FECHA_TRABAJO']])
+                detalle.to_excel(writer, sheet_name='Detalle_Expedientes', index=False)
+            return output.getvalue()
 
         st.download_button(
             label="Descargar Reporte Completo",
-            data=output,
+            data=deferred_download(
+                generar_reporte_completo,
+                (data_version(data_filtrada), 'reporte_expedientes_pendientes'),
+                celdas=data_filtrada.shape[0] * 5,
+                huella=lambda: huella_datos(data_filtrada)
+            ),
             file_name=f"reporte_expedientes_pendientes.xlsx",
             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
         )
@@ -495,52 +475,29 @@ class SPEModule:
             9: 'Septiembre', 10: 'Octubre', 11: 'Noviembre', 12: 'Diciembre'
         }
 
-        # Convertir fecha de trabajo a datetime de manera más flexible
-        try:
-            data[COLUMNAS['FECHA_TRABAJO']] = pd.to_datetime(
-                data[COLUMNAS['FECHA_TRABAJO']], 
-                format='mixed',  # Usar formato mixto para mayor flexibilidad
-                dayfirst=True,   # Indicar que el día va primero
-                errors='coerce'
-            )
-        except Exception as e:
-            st.error(f"Error al procesar fechas: {str(e)}")
-            return
-
         # Obtener mes anterior y mes actual
         fecha_actual = pd.Timestamp.now()
         mes_anterior = (fecha_actual - pd.DateOffset(months=1))
         
-        # Función auxiliar para procesar datos por mes
-        def procesar_datos_mes(fecha, datos):
-            nombre_mes = MESES[fecha.month]
-            
-            # Filtrar registros del mes
-            datos_mes = datos[
-                (datos[COLUMNAS['FECHA_TRABAJO']].dt.month == fecha.month) &
-                (datos[COLUMNAS['FECHA_TRABAJO']].dt.year == fecha.year)
-            ].copy()
-
-            # Agrupar por evaluador
-            stats = datos_mes.groupby(COLUMNAS['EVALUADOR']).agg({
-                COLUMNAS['EXPEDIENTE']: 'count',  # Total expedientes
-                COLUMNAS['FECHA_TRABAJO']: lambda x: x.dt.date.nunique()  # Días únicos trabajados
-            }).reset_index()
-
-            # Renombrar columnas
-            stats.columns = ['EVALUADOR', 'CANT_EXPEDIENTES', 'DIAS_TRABAJADOS']
-
-            # Calcular promedio
-            stats['PROMEDIO'] = (stats['CANT_EXPEDIENTES'] / stats['DIAS_TRABAJADOS']).round(0)
+        # Tabla de productividad de todos los meses, construida una vez por dataset
+        productividad = session_cached(
+            "spe_productividad_mensual",
+            data,
+            lambda df: MonthlyProductivity(
+                df, COLUMNAS['FECHA_TRABAJO'], COLUMNAS['EVALUADOR'], COLUMNAS['EXPEDIENTE']
+            )
+        )
 
-            # Ordenar y agregar ranking
-            stats_ordenado = stats.sort_values('CANT_EXPEDIENTES', ascending=False)
-            stats_ordenado.index = range(1, len(stats_ordenado) + 1)
+        def procesar_datos_mes(fecha):
+            return productividad.month(fecha.year, fecha.month), MESES[fecha.month]
 
-            return stats_ordenado, nombre_mes
+        def tendencia_diaria(fecha, hasta=None):
+            return productividad.daily(fecha.year, fecha.month, hasta).rename(
+                columns={'fecha': COLUMNAS['FECHA_TRABAJO']}
+            )
 
         # Procesar mes anterior
-        stats_mes_anterior, nombre_mes_anterior = procesar_datos_mes(mes_anterior, data)
+        stats_mes_anterior, nombre_mes_anterior = procesar_datos_mes(mes_anterior)
 
         # Mostrar tabla mes anterior
         st.subheader(f"Expedientes Trabajados - {nombre_mes_anterior} {mes_anterior.year}")
@@ -551,7 +508,7 @@ class SPEModule:
         )
 
         # Agregar botón de descarga formateado
-        excel_data_anterior = create_excel_download(
+        excel_data_anterior = deferred_excel_download(
             stats_mes_anterior,
             f"trabajados_{nombre_mes_anterior}.xlsx",
             f"Trabajados_{nombre_mes_anterior}",
@@ -566,10 +523,7 @@ class SPEModule:
         )
 
         # Gráfico de tendencia diaria mes anterior
-        datos_diarios_anterior = data[
-            (data[COLUMNAS['FECHA_TRABAJO']].dt.month == mes_anterior.month) &
-            (data[COLUMNAS['FECHA_TRABAJO']].dt.year == mes_anterior.year)
-        ].groupby(COLUMNAS['FECHA_TRABAJO']).size().reset_index(name='cantidad')
+        datos_diarios_anterior = tendencia_diaria(mes_anterior)
 
         promedio_diario_anterior = datos_diarios_anterior['cantidad'].mean()
 
@@ -599,7 +553,7 @@ class SPEModule:
         st.plotly_chart(fig_tendencia_anterior, use_container_width=True)
 
         # Procesar mes actual
-        stats_mes_actual, nombre_mes_actual = procesar_datos_mes(fecha_actual, data)
+        stats_mes_actual, nombre_mes_actual = procesar_datos_mes(fecha_actual)
 
         # Mostrar tabla mes actual
         st.subheader(f"Expedientes Trabajados - {nombre_mes_actual} {fecha_actual.year}")
@@ -610,7 +564,7 @@ class SPEModule:
         )
 
         # Agregar botón de descarga formateado
-        excel_data_actual = create_excel_download(
+        excel_data_actual = deferred_excel_download(
             stats_mes_actual,
             f"trabajados_{nombre_mes_actual}.xlsx",
             f"Trabajados_{nombre_mes_actual}",
@@ -625,12 +579,7 @@ class SPEModule:
         )
 
         # Gráfico de tendencia diaria mes actual
-        fecha_actual_sin_hora = fecha_actual.date()
-        datos_diarios_actual = data[
-            (data[COLUMNAS['FECHA_TRABAJO']].dt.month == fecha_actual.month) &
-            (data[COLUMNAS['FECHA_TRABAJO']].dt.year == fecha_actual.year) &
-            (data[COLUMNAS['FECHA_TRABAJO']].dt.date <= fecha_actual_sin_hora)
-        ].groupby(COLUMNAS['FECHA_TRABAJO']).size().reset_index(name='cantidad')
+        datos_diarios_actual = tendencia_diaria(fecha_actual, hasta=fecha_actual)
 
         promedio_diario_actual = datos_diarios_actual['cantidad'].mean()
 
@@ -751,26 +700,18 @@ class SPEModule:
         # Preparar datos para todos los meses de 2024
         meses_2024 = []
         for mes in range(1, fecha_actual.month + 1):
-            fecha_mes = pd.Timestamp(2024, mes, 1)
-            stats_mes, nombre_mes = procesar_datos_mes(fecha_mes, data)
-            
-            # Calcular métricas de trabajo realizado
-            datos_mes = data[
-                (data[COLUMNAS['FECHA_TRABAJO']].dt.month == mes) &
-                (data[COLUMNAS['FECHA_TRABAJO']].dt.year == 2024)
-            ]
-            
-            dias_trabajados = datos_mes[COLUMNAS['FECHA_TRABAJO']].dt.date.nunique()
-            total_trabajado = len(datos_mes)
+            resumen = productividad.summary(2024, mes)
+            total_trabajado = resumen['total']
+            dias_trabajados = resumen['dias']
             promedio_diario = total_trabajado / dias_trabajados if dias_trabajados > 0 else 0
             
             meses_2024.append({
-                'Mes': nombre_mes,
+                'Mes': MESES[mes],
                 'Expedientes_Trabajados': total_trabajado,
                 'Días_Trabajados': dias_trabajados,
                 'Promedio_Diario': promedio_diario,
-                'Cant_Evaluadores': len(stats_mes),
-                'Promedio_Por_Evaluador': total_trabajado / len(stats_mes) if len(stats_mes) > 0 else 0
+                'Cant_Evaluadores': resumen['evaluadores'],
+                'Promedio_Por_Evaluador': total_trabajado / resumen['evaluadores'] if resumen['evaluadores'] > 0 else 0
             })
 
         df_comparativo = pd.DataFrame(meses_2024)
@@ -783,7 +724,7 @@ class SPEModule:
         }), use_container_width=True)
 
         # Agregar botón de descarga formateado
-        excel_data_comparativo = create_excel_download(
+        excel_data_comparativo = deferred_excel_download(
             df_comparativo,
             "comparativo_mensual_2024.xlsx",
             "Comparativo_Mensual_2024",
@@ -849,41 +790,47 @@ class SPEModule:
 
         st.plotly_chart(fig_tendencia_mensual, use_container_width=True)
 
-        # Botón de descarga con ambos reportes
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            # Mes anterior
-            stats_mes_anterior.to_excel(
-                writer, 
-                sheet_name=f'Estadisticas_{nombre_mes_anterior}_{mes_anterior.year}'
-            )
+        # Botón de descarga con ambos reportes (el archivo se arma al hacer clic)
+        def generar_reporte_trabajados():
+            output = BytesIO()
+            with pd.ExcelWriter(output, engine='openpyxl') as writer:
+                # Mes anterior
+                stats_mes_anterior.to_excel(
+                    writer, 
+                    sheet_name=f'Estadisticas_{nombre_mes_anterior}_{mes_anterior.year}'
+                )
             
-            # Mes actual
-            stats_mes_actual.to_excel(
-                writer, 
-                sheet_name=f'Estadisticas_{nombre_mes_actual}_{fecha_actual.year}'
-            )
+                # Mes actual
+                stats_mes_actual.to_excel(
+                    writer, 
+                    sheet_name=f'Estadisticas_{nombre_mes_actual}_{fecha_actual.year}'
+                )
             
-            # Detalles
-            detalle = data[
-                (data[COLUMNAS['FECHA_TRABAJO']].dt.month.isin([mes_anterior.month, fecha_actual.month])) &
-                (data[COLUMNAS['FECHA_TRABAJO']].dt.year.isin([mes_anterior.year, fecha_actual.year]))
-            ][[
-                COLUMNAS['EXPEDIENTE'],
-                COLUMNAS['EVALUADOR'],
-                COLUMNAS['FECHA_TRABAJO']
-            ]].sort_values([COLUMNAS['EVALUADOR'], COLUMNAS['FECHA_TRABAJO']])
+                # Detalles
+                detalle = data[
+                    (data[COLUMNAS['FECHA_TRABAJO']].dt.month.isin([mes_anterior.month, fecha_actual.month])) &
+                    (data[COLUMNAS['FECHA_TRABAJO']].dt.year.isin([mes_anterior.year, fecha_actual.year]))
+                ][[
+                    COLUMNAS['EXPEDIENTE'],
+                    COLUMNAS['EVALUADOR'],
+                    COLUMNAS['FECHA_TRABAJO']
+                ]].sort_values([COLUMNAS['EVALUADOR'], COLUMNAS['FECHA_TRABAJO']])
             
-            detalle.to_excel(
-                writer, 
-                sheet_name='Detalle_Expedientes',
-                index=False
-            )
-        output.seek(0)
+                detalle.to_excel(
+                    writer, 
+                    sheet_name='Detalle_Expedientes',
+                    index=False
+                )
+            return output.getvalue()
 
         st.download_button(
             label=f"Descargar Reporte {nombre_mes_anterior}-{nombre_mes_actual} {fecha_actual.year}",
-            data=output,
+            data=deferred_download(
+                generar_reporte_trabajados,
+                (data_version(data), 'reporte_trabajados', nombre_mes_anterior, nombre_mes_actual, fecha_actual.year),
+                celdas=stats_mes_anterior.size + stats_mes_actual.size,
+                huella=lambda: (huella_datos(stats_mes_anterior), huella_datos(stats_mes_actual))
+            ),
             file_name=f"reporte_trabajados_{nombre_mes_anterior}_{nombre_mes_actual}_{fecha_actual.year}.xlsx",
             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
         )
@@ -1007,7 +954,14 @@ class SPEModule:
             # Botón para aplicar filtros
             col1, col2 = st.columns([1, 11])
             with col1:
-                filtrar = st.button("🔍 Filtrar", key="apply_filters", type="primary")
+                if st.button("🔍 Filtrar", key="apply_filters", type="primary"):
+                    st.session_state['spe_filtros_aplicados'] = data_version(data)
+            # El análisis queda activo tras el filtrado para que la paginación
+            # del detalle (que provoca un rerun) no lo oculte, pero solo para
+            # los datos con los que se filtró: al recargarlos se descarta
+            filtrar = st.session_state.get('spe_filtros_aplicados') == data_version(data)
+            if not filtrar:
+                st.session_state.pop('spe_filtros_aplicados', None)
             
             # Mostrar mensaje si no se ha filtrado
             if not filtrar:
@@ -1017,50 +971,47 @@ class SPEModule:
             # Si se presionó el botón de filtrar, continuar con el procesamiento
             if filtrar:
                 with st.spinner('Aplicando filtros...'):
-                    # Aplicar filtros de fecha solo si se han seleccionado
-                    data_filtrada = data.copy()
-                    
-                    if fecha_asig_inicio and fecha_asig_fin:
-                        data_filtrada = data_filtrada[
-                            (data_filtrada[COLUMNAS['FECHA_ASIGNACION']].dt.date >= fecha_asig_inicio) &
-                            (data_filtrada[COLUMNAS['FECHA_ASIGNACION']].dt.date <= fecha_asig_fin)
-                        ]
-                    
-                    if fecha_ing_inicio and fecha_ing_fin:
-                        data_filtrada = data_filtrada[
-                            (data_filtrada[COLUMNAS['FECHA_INGRESO']].dt.date >= fecha_ing_inicio) &
-                            (data_filtrada[COLUMNAS['FECHA_INGRESO']].dt.date <= fecha_ing_fin)
-                        ]
-                    
-                    if fecha_trab_inicio and fecha_trab_fin:
-                        data_filtrada = data_filtrada[
-                            (data_filtrada[COLUMNAS['FECHA_TRABAJO']].dt.date >= fecha_trab_inicio) &
-                            (data_filtrada[COLUMNAS['FECHA_TRABAJO']].dt.date <= fecha_trab_fin)
-                        ]
-
-                    # Aplicar filtros adicionales
-                    if evaluadores_seleccionados and 'TODOS LOS EVALUADORES' not in evaluadores_seleccionados:
-                        data_filtrada = data_filtrada[data_filtrada[COLUMNAS['EVALUADOR']].isin(evaluadores_seleccionados)]
-                    if procesos_seleccionados:
-                        data_filtrada = data_filtrada[data_filtrada[COLUMNAS['PROCESO']].isin(procesos_seleccionados)]
-                    if etapas_seleccionadas:
-                        data_filtrada = data_filtrada[data_filtrada[COLUMNAS['ETAPA']].isin(etapas_seleccionadas)]
-                    if estados_seleccionados:
-                        data_filtrada = data_filtrada[data_filtrada[COLUMNAS['ESTADO']].isin(estados_seleccionados)]
+                    # Motor de tablas dinámicas del dataset (códigos por dimensión calculados una vez)
+                    motor = session_cached(
+                        "spe_pivot_engine",
+                        data,
+                        lambda df: PivotEngine(
+                            df,
+                            dimensiones=[COLUMNAS[col] for col in ['EVALUADOR', 'PROCESO', 'ETAPA', 'ESTADO']],
+                            columna_valor=COLUMNAS['EXPEDIENTE'],
+                            columnas_fecha=[COLUMNAS[col] for col in ['FECHA_ASIGNACION', 'FECHA_INGRESO', 'FECHA_TRABAJO']],
+                            columna_orden=COLUMNAS['FECHA_TRABAJO']
+                        )
+                    )
+
+                    # Filtros de fecha (solo si se eligieron ambos extremos) y adicionales
+                    fechas = {
+                        COLUMNAS['FECHA_ASIGNACION']: (fecha_asig_inicio, fecha_asig_fin),
+                        COLUMNAS['FECHA_INGRESO']: (fecha_ing_inicio, fecha_ing_fin),
+                        COLUMNAS['FECHA_TRABAJO']: (fecha_trab_inicio, fecha_trab_fin),
+                    }
+                    filtros = {
+                        COLUMNAS['EVALUADOR']: (
+                            evaluadores_seleccionados
+                            if 'TODOS LOS EVALUADORES' not in evaluadores_seleccionados else []
+                        ),
+                        COLUMNAS['PROCESO']: procesos_seleccionados,
+                        COLUMNAS['ETAPA']: etapas_seleccionadas,
+                        COLUMNAS['ESTADO']: estados_seleccionados,
+                    }
 
                     # Crear tabla dinámica
                     if columnas_filas and columnas_columnas:
                         try:
-                            pivot_table = pd.pivot_table(
-                                data_filtrada,
-                                values=COLUMNAS['EXPEDIENTE'],
-                                index=[COLUMNAS[col] for col in columnas_filas],
-                                columns=[COLUMNAS[col] for col in columnas_columnas],
-                                aggfunc='nunique',  # Cambio a nunique para contar expedientes únicos
-                                fill_value=0,
-                                margins=True,
-                                margins_name='Total'
+                            pivot_table = motor.pivot(
+                                [COLUMNAS[col] for col in columnas_filas],
+                                [COLUMNAS[col] for col in columnas_columnas],
+                                filtros,
+                                fechas
                             )
+                            if pivot_table.empty:
+                                st.warning("No hay expedientes que cumplan los filtros seleccionados")
+                                return
 
                             # Mostrar resultados
                             st.subheader("Resultados del Análisis")
@@ -1070,7 +1021,7 @@ class SPEModule:
                             st.dataframe(pivot_table, use_container_width=True)
                             
                             # Botón para descargar tabla dinámica
-                            excel_data_pivot = create_excel_download(
+                            excel_data_pivot = deferred_excel_download(
                                 pivot_table,
                                 "tabla_dinamica.xlsx",
                                 "Tabla_Dinamica",
@@ -1089,13 +1040,13 @@ class SPEModule:
                                 'EXPEDIENTE', 'FECHA_ASIGNACION', 'PROCESO', 'FECHA_INGRESO',
                                 'EVALUADOR', 'ETAPA', 'ESTADO', 'FECHA_TRABAJO', 'BENEFICIARIO'
                             ]
-                            detalle_expedientes = data_filtrada[[COLUMNAS[col] for col in columnas_detalle]].sort_values(
-                                COLUMNAS['FECHA_TRABAJO']
+                            detalle_expedientes = motor.detalle(
+                                [COLUMNAS[col] for col in columnas_detalle], filtros, fechas
                             )
-                            st.dataframe(detalle_expedientes, use_container_width=True)
+                            render_paginated_table(detalle_expedientes, key="spe_detalle_expedientes", hide_index=False)
 
                             # Botón para descargar detalle
-                            excel_data_detalle = create_excel_download(
+                            excel_data_detalle = deferred_excel_download(
                                 detalle_expedientes,
                                 "detalle_expedientes.xlsx",
                                 "Detalle_Expedientes",
@@ -1136,25 +1087,6 @@ class SPEModule:
         """Renderizar análisis predictivo."""
         st.header("Análisis de Ingresos")
 
-        try:
-            # Crear una copia del DataFrame para no modificar el original
-            data_copy = data.copy()
-            
-            # Convertir fecha de ingreso a datetime usando la referencia de clase
-            data_copy[self.columnas['FECHA_INGRESO']] = pd.to_datetime(
-                data_copy[self.columnas['FECHA_INGRESO']], 
-                format='mixed',
-                dayfirst=True,
-                errors='coerce'
-            )
-            
-            # Usar data_copy en lugar de data para el resto del análisis
-            data = data_copy
-
-        except Exception as e:
-            st.error(f"Error al procesar fechas: {str(e)}")
-            return
-
         fecha_actual = pd.Timestamp.now()
 
         # 1. ANÁLISIS DE ÚLTIMOS 30 DÍAS
@@ -1227,14 +1159,16 @@ class SPEModule:
             self.columnas['FECHA_INGRESO']: ['min', 'max']
         }).reset_index()
 
-        # Calcular promedio por día hábil para cada semana
-        ingresos_semanales['dias_habiles'] = ingresos_semanales[self.columnas['FECHA_INGRESO']]['max'].apply(
-            lambda x: len(pd.bdate_range(
-                ingresos_semanales[self.columnas['FECHA_INGRESO']]['min'].iloc[0],
-                x
-            ))
+        # Calcular promedio por día hábil para cada semana (todas las semanas en una llamada)
+        calendario = business_calendar()
+        ingresos_semanales['dias_habiles'] = calendario.count(
+            ingresos_semanales[self.columnas['FECHA_INGRESO']]['min'],
+            ingresos_semanales[self.columnas['FECHA_INGRESO']]['max']
+        )
+        # Semanas sin días hábiles (solo feriados o fin de semana) cuentan como un día
+        ingresos_semanales['promedio_diario'] = (
+            ingresos_semanales[self.columnas['EXPEDIENTE']]['count'] / ingresos_semanales['dias_habiles'].clip(lower=1)
         )
-        ingresos_semanales['promedio_diario'] = ingresos_semanales[self.columnas['EXPEDIENTE']]['count'] / ingresos_semanales['dias_habiles']
 
         # Mostrar estadísticas semanales
         promedio_semanal = ingresos_semanales[self.columnas['EXPEDIENTE']]['count'].mean()
@@ -1266,11 +1200,9 @@ class SPEModule:
 
             if not ingresos_mensuales.empty:
                 # Calcular días transcurridos
-                ingresos_mensuales['dias_transcurridos'] = ingresos_mensuales.apply(
-                    lambda row: len(pd.bdate_range(
-                        row[(self.columnas['FECHA_INGRESO'], 'min')],
-                        row[(self.columnas['FECHA_INGRESO'], 'max')]
-                    )), axis=1
+                ingresos_mensuales['dias_transcurridos'] = calendario.count(
+                    ingresos_mensuales[(self.columnas['FECHA_INGRESO'], 'min')],
+                    ingresos_mensuales[(self.columnas['FECHA_INGRESO'], 'max')]
                 )
 
                 # Calcular promedio diario
@@ -1282,15 +1214,8 @@ class SPEModule:
                 # Proyección del mes actual
                 mes_actual = ingresos_mensuales.iloc[-1]
                 
-                # Obtener primer y último día del mes actual
-                primer_dia_mes = pd.Timestamp(fecha_actual.year, fecha_actual.month, 1)
-                if fecha_actual.month == 12:
-                    ultimo_dia_mes = pd.Timestamp(fecha_actual.year + 1, 1, 1) - pd.Timedelta(days=1)
-                else:
-                    ultimo_dia_mes = pd.Timestamp(fecha_actual.year, fecha_actual.month + 1, 1) - pd.Timedelta(days=1)
-                
-                # Calcular días hábiles
-                dias_habiles_mes = len(pd.bdate_range(primer_dia_mes, ultimo_dia_mes))
+                # Días hábiles del mes actual completo
+                dias_habiles_mes = int(calendario.month_business_days(fecha_actual))
                 proyeccion_mes = float(mes_actual['promedio_diario']) * dias_habiles_mes
 
                 # Mostrar proyección
@@ -1335,67 +1260,64 @@ class SPEModule:
 
         # 4. PREDICCIONES
         st.subheader("🔮 Predicciones")
-        
-        try:
-            # Verificar si tenemos suficientes datos para análisis estacional
-            if len(ingresos_mensuales) >= 24:
-                # Calcular tendencia y estacionalidad
-                decomposition = seasonal_decompose(
-                    ingresos_mensuales['promedio_diario'],
-                    period=12,
-                    extrapolate_trend='freq'
-                )
-                
-                # Predicción para próximo mes usando descomposición
-                tendencia_valor = decomposition.trend.iloc[-1]
-                estacionalidad = decomposition.seasonal.iloc[-1]
-                prediccion_proximo_mes = (tendencia_valor + estacionalidad) * dias_habiles_mes
-            else:
-                # Usar un método más simple cuando no hay suficientes datos
-                # Calcular tendencia usando los últimos 3 meses
-                ultimos_meses = ingresos_mensuales.tail(3)
-                tendencia = np.polyfit(range(len(ultimos_meses)), 
-                                     ultimos_meses['promedio_diario'], 
-                                     1)[0]
-                
-                ultimo_promedio = ultimos_meses['promedio_diario'].iloc[-1]
-                prediccion_proximo_mes = (ultimo_promedio + tendencia) * dias_habiles_mes
-
-            # Mostrar predicción
-            variacion = ((prediccion_proximo_mes - proyeccion_mes) / proyeccion_mes * 100)
-            st.metric(
-                "Predicción próximo mes",
-                f"{int(prediccion_proximo_mes)} expedientes",
-                f"{variacion:+.1f}% vs. mes actual"
-            )
-
-            # Recomendaciones basadas en el análisis
-            st.subheader("💡 Recomendaciones")
-            
-            recomendaciones = []
-            
-            # Análisis de tendencia
-            if tendencia > 0:
-                recomendaciones.append("• La tendencia es creciente. Se recomienda preparar recursos adicionales.")
-            else:
-                recomendaciones.append("• La tendencia es decreciente. Se puede optimizar la asignación de recursos.")
 
-            # Análisis de variabilidad
-            if max_diario > promedio_diario * 1.5:
-                recomendaciones.append("• Se detectan picos significativos de ingresos. Se recomienda mantener un buffer de capacidad.")
+        if ingresos_mensuales.empty:
+            st.warning("No hay suficientes datos para realizar predicciones confiables.")
+            return
 
-            # Análisis de patrones
-            if tendencia_semanal < 0 and tendencia > 0:
-                recomendaciones.append("• Las tendencias diaria y semanal difieren. Se sugiere monitorear cambios de patrón.")
+        # El ajuste (descomposición estacional o tendencia) corre en segundo plano
+        promedios = ingresos_mensuales['promedio_diario'].to_numpy(dtype=float)
+
+        def mostrar_prediccion(modelo):
+            try:
+                prediccion_proximo_mes = modelo['prediccion']
+                # Con descomposición estacional se conserva la tendencia diaria
+                tendencia_modelo = tendencia if modelo['tendencia'] is None else modelo['tendencia']
+
+                # Mostrar predicción
+                variacion = ((prediccion_proximo_mes - proyeccion_mes) / proyeccion_mes * 100)
+                st.metric(
+                    "Predicción próximo mes",
+                    f"{int(prediccion_proximo_mes)} expedientes",
+                    f"{variacion:+.1f}% vs. mes actual"
+                )
 
-            # Análisis de capacidad
-            capacidad_requerida = int(prediccion_proximo_mes / dias_habiles_mes)
-            recomendaciones.append(f"• Capacidad diaria recomendada: {capacidad_requerida} expedientes/día")
+                # Recomendaciones basadas en el análisis
+                st.subheader("💡 Recomendaciones")
 
-            # Mostrar recomendaciones
-            for rec in recomendaciones:
-                st.write(rec)
+                recomendaciones = []
 
-        except Exception as e:
-            st.error(f"Error en las predicciones: {str(e)}")
-            st.warning("No hay suficientes datos para realizar predicciones confiables.")
\ No newline at end of file
+                # Análisis de tendencia
+                if tendencia_modelo > 0:
+                    recomendaciones.append("• La tendencia es creciente. Se recomienda preparar recursos adicionales.")
+                else:
+                    recomendaciones.append("• La tendencia es decreciente. Se puede optimizar la asignación de recursos.")
+
+                # Análisis de variabilidad
+                if max_diario > promedio_diario * 1.5:
+                    recomendaciones.append("• Se detectan picos significativos de ingresos. Se recomienda mantener un buffer de capacidad.")
+
+                # Análisis de patrones
+                if tendencia_semanal < 0 and tendencia_modelo > 0:
+                    recomendaciones.append("• Las tendencias diaria y semanal difieren. Se sugiere monitorear cambios de patrón.")
+
+                # Análisis de capacidad
+                capacidad_requerida = int(prediccion_proximo_mes / dias_habiles_mes)
+                recomendaciones.append(f"• Capacidad diaria recomendada: {capacidad_requerida} expedientes/día")
+
+                # Mostrar recomendaciones
+                for rec in recomendaciones:
+                    st.write(rec)
+
+            except Exception as e:
+                st.error(f"Error en las predicciones: {str(e)}")
+                st.warning("No hay suficientes datos para realizar predicciones confiables.")
+
+        render_model_job(
+            job_key(promedios, dias_habiles_mes, 'spe_prediccion_mensual'),
+            monthly_forecast,
+            (promedios, dias_habiles_mes),
+            mostrar_prediccion,
+            grupo='spe_prediccion_mensual',
+            mensaje="⏳ Calculando predicciones en segundo plano..."
+        )
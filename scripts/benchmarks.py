@@ -0,0 +1,651 @@
+"""
+Benchmarks de las rutas de cálculo del dashboard.
+
+Cada benchmark genera datos sintéticos con la forma de los consolidados,
+compara la implementación anterior con la actual, verifica que ambas den el
+mismo resultado y reporta los tiempos.
+
+Uso (desde la raíz del proyecto):
+    python -m scripts.benchmarks asignaciones --filas 1000000
+    python -m scripts.benchmarks ranking_spe --dias 365
+    python -m scripts.benchmarks etl_parquet --filas 50000 --repeticiones 1
+    python -m scripts.benchmarks cruces --filas 500000
+    python -m scripts.benchmarks excel_tabla --filas 100000 --repeticiones 1
+    python -m scripts.benchmarks consolidador --libros 300 --repeticiones 1
+    python -m scripts.benchmarks consolidador_incremental --libros 300 --repeticiones 1
+    python -m scripts.benchmarks reportes --filas 100000 --repeticiones 1
+    python -m scripts.benchmarks --lista
+"""
+import argparse
+import os
+import tempfile
+import time
+import warnings
+import numpy as np
+import pandas as pd
+
+def _medir(func, *args, repeticiones=3, **kwargs):
+    """Ejecuta `func` varias veces y retorna (mejor tiempo en segundos, resultado)."""
+    mejor = float('inf')
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = func(*args, **kwargs)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor, resultado
+
+def _reportar(nombre, filas, tiempo_anterior, tiempo_actual):
+    print(f"\n📊 {nombre} ({filas:,d} filas)")
+    print(f"   Implementación anterior: {tiempo_anterior:8.3f} s")
+    print(f"   Implementación actual:   {tiempo_actual:8.3f} s")
+    print(f"   Aceleración:             {tiempo_anterior / max(tiempo_actual, 1e-9):8.1f}x")
+
+# ---------------------------------------------------------------------------
+# Reporte de asignaciones
+# ---------------------------------------------------------------------------
+
+def _datos_asignaciones(filas, dias_historia=400, semilla=0):
+    rng = np.random.default_rng(semilla)
+    hoy = pd.Timestamp.now().normalize()
+    evaluadores = np.array([f"EVALUADOR {i}" for i in range(80)] + ['', None], dtype=object)
+    return pd.DataFrame({
+        'FechaExpendiente': hoy - pd.to_timedelta(rng.integers(0, dias_historia, filas), unit='D'),
+        'EVALASIGN': evaluadores[rng.integers(0, len(evaluadores), filas)],
+    })
+
+def _asignaciones_anterior(data, dias=15):
+    """Implementación previa (groupby.apply + apply por fila), como referencia."""
+    data = data.copy()
+    data['EVALASIGN'] = data['EVALASIGN'].fillna('')
+    recent_data = data[data['FechaExpendiente'] >= pd.Timestamp.now() - pd.DateOffset(days=dias)]
+    assignment_data = recent_data.groupby('FechaExpendiente').apply(
+        lambda x: pd.Series({
+            'TotalExpedientes': len(x),
+            'CantidadAsignados': len(x[x['EVALASIGN'] != '']),
+            'CantidadSinAsignar': len(x[x['EVALASIGN'] == ''])
+        })
+    ).reset_index()
+    assignment_data['% Sin Asignar'] = assignment_data.apply(
+        lambda row: f"{(row['CantidadSinAsignar'] / row['TotalExpedientes'] * 100):.2f}%"
+        if row['TotalExpedientes'] > 0 else "0.00%",
+        axis=1
+    )
+    assignment_data['FechaExpendiente'] = assignment_data['FechaExpendiente'].dt.strftime('%d/%m/%Y')
+    return assignment_data
+
+def bench_asignaciones(args):
+    """Reporte de asignaciones: agregación diaria de asignados / sin asignar."""
+    from tabs.assignment_report import process_assignment_data
+
+    data = _datos_asignaciones(args.filas)
+    for dias in args.dias:
+        t_anterior, anterior = _medir(_asignaciones_anterior, data, dias=dias, repeticiones=args.repeticiones)
+        t_actual, actual = _medir(process_assignment_data, data, dias=dias, repeticiones=args.repeticiones)
+        pd.testing.assert_frame_equal(
+            anterior.reset_index(drop=True), actual.reset_index(drop=True), check_dtype=False
+        )
+        _reportar(f"Asignaciones, ventana de {dias} días", len(data), t_anterior, t_actual)
+
+# ---------------------------------------------------------------------------
+# Ranking histórico de SPE
+# ---------------------------------------------------------------------------
+
+def _documentos_ranking(dias, evaluadores=60, semilla=0):
+    """Un documento de rankings por día, como los guarda el módulo SPE."""
+    rng = np.random.default_rng(semilla)
+    hoy = pd.Timestamp.now().normalize()
+    nombres = [f"EVALUADOR {i}" for i in range(evaluadores)]
+    documentos = []
+    for dia in range(dias, 0, -1):
+        presentes = rng.choice(nombres, size=rng.integers(evaluadores // 2, evaluadores), replace=False)
+        documentos.append({
+            'modulo': 'SPE',
+            'fecha': (hoy - pd.Timedelta(days=dia)).to_pydatetime(),
+            'datos': [{'EVALUADOR': e, 'cantidad': int(c)} for e, c in zip(presentes, rng.integers(1, 40, len(presentes)))],
+        })
+    return documentos
+
+def _ranking_anterior(documentos):
+    """Implementación previa: un merge por fecha y orden de columnas por texto dd/mm."""
+    df_historico = pd.DataFrame()
+    for registro in sorted(documentos, key=lambda d: d['fecha'], reverse=True):
+        fecha_str = pd.Timestamp(registro['fecha']).strftime('%d/%m')
+        df_temp = pd.DataFrame(registro['datos'])
+        df_pivot = pd.DataFrame({'EVALUADOR': df_temp['EVALUADOR'].tolist(), fecha_str: df_temp['cantidad'].tolist()})
+        df_historico = df_pivot if df_historico.empty else df_historico.merge(df_pivot, on='EVALUADOR', how='outer')
+    df_historico = df_historico.fillna(0)
+    cols_fecha = [col for col in df_historico.columns if col != 'EVALUADOR']
+    cols_ordenadas = ['EVALUADOR'] + sorted(
+        cols_fecha, key=lambda x: pd.to_datetime(x + f"/{pd.Timestamp.now().year}", format='%d/%m/%Y')
+    )
+    df_historico = df_historico[cols_ordenadas]
+    df_historico['Total'] = df_historico.iloc[:, 1:].sum(axis=1)
+    return df_historico.sort_values('Total', ascending=False)
+
+def _ranking_actual(documentos):
+    """Filas (fecha, evaluador, cantidad) como las entrega RankingsRepository.read + un pivot."""
+    from src.services.rankings_repository import build_ranking_matrix, COLUMNAS_RANKING
+
+    registros = pd.DataFrame.from_records(
+        ((d['fecha'], fila['EVALUADOR'], fila['cantidad']) for d in documentos for fila in d['datos']),
+        columns=COLUMNAS_RANKING
+    )
+    return build_ranking_matrix(registros)
+
+def bench_ranking_spe(args):
+    """Ranking histórico de SPE: matriz evaluador × fecha desde documentos diarios."""
+    for dias in args.dias:
+        documentos = _documentos_ranking(dias)
+        filas = sum(len(d['datos']) for d in documentos)
+        with warnings.catch_warnings():
+            # El merge por fecha fragmenta el DataFrame; es parte del costo medido
+            warnings.simplefilter('ignore', pd.errors.PerformanceWarning)
+            t_anterior, anterior = _medir(_ranking_anterior, documentos, repeticiones=args.repeticiones)
+        t_actual, actual = _medir(_ranking_actual, documentos, repeticiones=args.repeticiones)
+
+        # Mismos valores por evaluador y fecha (el orden anterior de columnas falla al cruzar de año)
+        anterior = anterior.set_index('EVALUADOR').sort_index()
+        actual = actual.set_index('EVALUADOR').sort_index()
+        pd.testing.assert_frame_equal(anterior[actual.columns], actual, check_dtype=False)
+        _reportar(f"Ranking SPE, {dias} documentos diarios", filas, t_anterior, t_actual)
+
+# ---------------------------------------------------------------------------
+# Artefactos del ETL: Excel vs Parquet
+# ---------------------------------------------------------------------------
+
+_ESTADOS_TRAMITE = np.array(['PENDIENTE', 'APROBADO', 'DENEGADO', 'ANULADO', 'DESISTIDO'], dtype=object)
+
+def _consolidado_descarga(filas, semilla=0):
+    """Consolidado de la descarga con las columnas que usan los pasos siguientes (todo texto)."""
+    rng = np.random.default_rng(semilla)
+    fechas = pd.Timestamp('2024-12-31') - pd.to_timedelta(rng.integers(0, 1500, filas), unit='D')
+    con_pre = rng.random(filas) < 0.5
+    con_fin = rng.random(filas) < 0.3
+    evaluadores = np.array([f"EVALUADOR {i}" for i in range(80)], dtype=object)
+    def _texto(valores, mascara=None):
+        valores = pd.Series(valores, dtype=object)
+        return valores if mascara is None else valores.where(mascara, None)
+    return pd.DataFrame({
+        'NumeroTramite': [f"LM{i:010d}" for i in range(filas)],
+        'Dependencia': _texto(np.array(['LIMA', 'MIRAFLORES', 'LIMA SUR', 'LIMA NORTE'], dtype=object)[rng.integers(0, 4, filas)]),
+        'FechaExpendiente': _texto(fechas.strftime('%d/%m/%Y')),
+        'Anio': _texto(fechas.year.astype(str)),
+        'Mes': _texto(fechas.month.astype(str)),
+        'EstadoTramite': _texto(_ESTADOS_TRAMITE[rng.integers(0, len(_ESTADOS_TRAMITE), filas)]),
+        'EstadoPre': _texto(np.where(con_pre, 'PRE APROBADO', None), con_pre),
+        'OperadorPre': _texto(evaluadores[rng.integers(0, len(evaluadores), filas)], con_pre),
+        'FechaPre': _texto(fechas.strftime('%d/%m/%Y'), con_pre),
+        'FechaEtapaAprobacionMasivaFin': _texto(fechas.strftime('%d/%m/%Y'), con_fin),
+        'Observacion': _texto(np.full(filas, 'SIN OBSERVACIONES', dtype=object)),
+    })
+
+def _asignaciones_etl(consolidado, semilla=0):
+    """Hoja de asignaciones por evaluador y consolidado de asignaciones (consolidador.py)."""
+    rng = np.random.default_rng(semilla)
+    expedientes = consolidado['NumeroTramite'].to_numpy()
+    evaluadores = np.array([f"EVALUADOR {i}" for i in range(80)], dtype=object)
+    asignados = rng.choice(expedientes, size=len(expedientes) // 2, replace=False)
+    asignaciones = pd.DataFrame({'EXPEDIENTE': asignados, 'EVALUADOR': evaluadores[rng.integers(0, 80, len(asignados))]})
+    trabajados = rng.choice(expedientes, size=len(expedientes) // 3)
+    filtrado = pd.DataFrame({
+        'EXPEDIENTE': trabajados,
+        'ESTADO': rng.choice(['PRE APROBADO', 'PRE DENEGADO', 'APROBADO'], size=len(trabajados)),
+        'DESCRIPCION': rng.choice(np.array([None, 'REVISAR', 'OK'], dtype=object), size=len(trabajados)),
+        'FECHA DE TRABAJO': pd.Timestamp('2024-12-31') - pd.to_timedelta(rng.integers(0, 400, len(trabajados)), unit='D'),
+    })
+    return asignaciones, filtrado
+
+def _tabla_openpyxl_anterior(archivo, df, tabla_nombre):
+    """Escritura previa de los consolidados: celda por celda con openpyxl (hasta la columna Z)."""
+    from openpyxl import Workbook
+    from openpyxl.utils.dataframe import dataframe_to_rows
+    from openpyxl.worksheet.table import Table, TableStyleInfo
+
+    wb = Workbook()
+    ws = wb.active
+    ws.title = tabla_nombre
+    for r_idx, row in enumerate(dataframe_to_rows(df, index=False, header=True), start=1):
+        for c_idx, value in enumerate(row, start=1):
+            ws.cell(row=r_idx, column=c_idx, value=value)
+    table = Table(displayName=tabla_nombre, ref=f"A1:{chr(64 + df.shape[1])}{df.shape[0] + 1}")
+    table.tableStyleInfo = TableStyleInfo(
+        name="TableStyleMedium9", showFirstColumn=False,
+        showLastColumn=False, showRowStripes=True, showColumnStripes=True
+    )
+    ws.add_table(table)
+    wb.save(archivo)
+
+def _gestionar_anterior(df):
+    """Transformación previa de gestionar_consolidados.py: fechas devueltas como texto dd/mm/aaaa."""
+    if len(df.columns) > 0 and str(df.columns[0]).startswith("Textbox4"):
+        df = df.drop(columns=[df.columns[0]])
+    for columna in ["FechaExpendiente", "FechaEtapaAprobacionMasivaFin", "FechaPre"]:
+        df[columna] = pd.to_datetime(df[columna], errors='coerce', dayfirst=True).dt.strftime('%d/%m/%Y')
+    df["Pre_Concluido"] = (
+        (df["EstadoTramite"] != "PENDIENTE") | ((df["EstadoTramite"] == "PENDIENTE") & df["EstadoPre"].notna())
+    ).map({True: "SI", False: "NO"})
+    df["Evaluado"] = (
+        (df["EstadoTramite"] != "PENDIENTE") |
+        ((df["EstadoTramite"] == "PENDIENTE") & (df["FechaEtapaAprobacionMasivaFin"].notna() | df["EstadoPre"].notna()))
+    ).map({True: "SI", False: "NO"})
+    return df
+
+def _para_mongo(df):
+    """Registros tal como los sube MongoUploader (fechas dd/mm/aaaa, nulos como None)."""
+    from src.utils.mongo_uploader import MongoUploader
+    return MongoUploader.clean_data_for_mongo(None, df)
+
+def bench_etl_parquet(args):
+    """ETL: cada paso leyendo y escribiendo Excel vs Parquet tipado."""
+    from gestionar_consolidados import procesar_consolidado
+    from cruces import cruzar_consolidado
+    from src.utils.parquet_store import guardar_parquet, leer_tabla
+
+    crudo = _consolidado_descarga(args.filas)
+    asignaciones, filtrado = _asignaciones_etl(crudo)
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = lambda nombre: os.path.join(carpeta, nombre)
+        # Entradas de cada cadena: el Excel de la descarga con tipos inferidos (como pd.read_csv) y el dataset Parquet
+        pd.DataFrame({c: pd.to_numeric(crudo[c]) if c in ('Anio', 'Mes') else crudo[c] for c in crudo}).to_excel(
+            ruta('Consolidado.xlsx'), index=False
+        )
+        os.makedirs(ruta('Consolidado/anio=2024'))
+        guardar_parquet(crudo, ruta('Consolidado/anio=2024/2024_A.parquet'))
+        filtrado.to_excel(ruta('filtrado.xlsx'), index=False)
+        guardar_parquet(filtrado, ruta('filtrado.parquet'))
+
+        pasos = {
+            'gestionar_consolidados': (
+                lambda: _tabla_openpyxl_anterior(ruta('Consolidado_gestion.xlsx'), _gestionar_anterior(pd.read_excel(ruta('Consolidado.xlsx'))), 'BASE_CCM'),
+                lambda: guardar_parquet(procesar_consolidado(leer_tabla(ruta('Consolidado'))), ruta('Consolidado.parquet')),
+            ),
+            'cruces': (
+                lambda: _tabla_openpyxl_anterior(ruta('CRUZADO.xlsx'), cruzar_consolidado(
+                    pd.read_excel(ruta('Consolidado_gestion.xlsx')), asignaciones, pd.read_excel(ruta('filtrado.xlsx'))
+                ), 'BASE_CCM'),
+                lambda: guardar_parquet(cruzar_consolidado(
+                    leer_tabla(ruta('Consolidado.parquet')), asignaciones, leer_tabla(ruta('filtrado.parquet'))
+                ), ruta('CRUZADO.parquet')),
+            ),
+            'MongoUploader (lectura)': (
+                lambda: _para_mongo(pd.read_excel(ruta('CRUZADO.xlsx'))),
+                lambda: _para_mongo(leer_tabla(ruta('CRUZADO.parquet'))),
+            ),
+            'dashboard (carga)': (
+                lambda: pd.read_excel(ruta('CRUZADO.xlsx')),
+                lambda: leer_tabla(ruta('CRUZADO.parquet')),
+            ),
+        }
+        total_anterior = total_actual = 0.0
+        resultados = {}
+        for nombre, (anterior, actual) in pasos.items():
+            t_anterior, resultados['anterior'] = _medir(anterior, repeticiones=args.repeticiones)
+            t_actual, resultados['actual'] = _medir(actual, repeticiones=args.repeticiones)
+            total_anterior += t_anterior
+            total_actual += t_actual
+            _reportar(f"ETL, {nombre}", len(crudo), t_anterior, t_actual)
+
+            if nombre == 'MongoUploader (lectura)':
+                # Los documentos que llegan a MongoDB son los mismos por ambas cadenas
+                pd.testing.assert_frame_equal(
+                    resultados['anterior'].astype(object).where(resultados['anterior'].notna(), None),
+                    resultados['actual'].astype(object).where(resultados['actual'].notna(), None),
+                    check_dtype=False
+                )
+        _reportar("ETL, cadena completa", len(crudo), total_anterior, total_actual)
+
+# ---------------------------------------------------------------------------
+# Cruces (EVALASIGN y último trabajo por expediente)
+# ---------------------------------------------------------------------------
+
+def _cruces_anterior(df_consolidado, df_asignaciones, df_filtrado):
+    """Implementación previa de cruces.py: apply por fila y sort + drop_duplicates + merge."""
+    df_consolidado = df_consolidado.copy()
+    df_asignaciones = df_asignaciones.copy()
+    df_asignaciones.columns = df_asignaciones.columns.str.strip()
+    df_asignaciones["EXPEDIENTE"] = df_asignaciones["EXPEDIENTE"].astype(str)
+    evaluador_dict = pd.Series(df_asignaciones["EVALUADOR"].values, index=df_asignaciones["EXPEDIENTE"]).to_dict()
+
+    def calcular_evalasign(row):
+        numero_tramite = str(row.get("NumeroTramite", ""))
+        if row["Evaluado"] == "NO":
+            return evaluador_dict.get(numero_tramite, None)
+        elif row["Evaluado"] == "SI" and row["Pre_Concluido"] == "SI":
+            return row.get("OperadorPre", None)
+        return None
+
+    df_consolidado["EVALASIGN"] = df_consolidado.apply(calcular_evalasign, axis=1)
+
+    df_filtrado = df_filtrado.copy()
+    df_filtrado.columns = df_filtrado.columns.str.strip()
+    df_filtrado["EXPEDIENTE"] = df_filtrado["EXPEDIENTE"].astype(str)
+    for col in ["ESTADO", "DESCRIPCION", "FECHA DE TRABAJO"]:
+        if df_filtrado[col].dtype == 'object':
+            df_filtrado[col] = pd.Categorical(df_filtrado[col], ordered=False)
+    df_filtrado["FECHA DE TRABAJO"] = pd.to_datetime(df_filtrado["FECHA DE TRABAJO"], errors='coerce')
+    df_filtrado = df_filtrado.sort_values(["EXPEDIENTE", "FECHA DE TRABAJO"], ascending=[True, False])
+    df_filtrado = df_filtrado.drop_duplicates(subset="EXPEDIENTE", keep="first")
+    return pd.merge(
+        df_consolidado,
+        df_filtrado[["EXPEDIENTE", "ESTADO", "DESCRIPCION", "FECHA DE TRABAJO"]],
+        left_on="NumeroTramite",
+        right_on="EXPEDIENTE",
+        how="left"
+    ).drop(columns=["EXPEDIENTE"], errors="ignore")
+
+def _sin_nulos_distintos(df):
+    """Iguala None / NaN / NaT y categorías para comparar valores."""
+    df = df.astype({c: object for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)})
+    return df.astype(object).where(df.notna(), None)
+
+def bench_cruces(args):
+    """Cruces: EVALASIGN vectorizado y último trabajo por expediente."""
+    from gestionar_consolidados import procesar_consolidado
+    from cruces import cruzar_consolidado
+
+    consolidado = procesar_consolidado(_consolidado_descarga(args.filas))
+    asignaciones, filtrado = _asignaciones_etl(consolidado)
+    rng = np.random.default_rng(1)
+    # Casos borde: expedientes repetidos en la hoja con otro evaluador, fechas vacías y empates
+    repetidos = asignaciones.sample(frac=0.05, random_state=1).assign(EVALUADOR='EVALUADOR REPETIDO')
+    asignaciones = pd.concat([asignaciones, repetidos], ignore_index=True)
+    filtrado.loc[rng.random(len(filtrado)) < 0.05, 'FECHA DE TRABAJO'] = pd.NaT
+    empates = filtrado.sample(frac=0.05, random_state=2).assign(ESTADO='EMPATE')
+    filtrado = pd.concat([filtrado, empates], ignore_index=True)
+
+    t_anterior, anterior = _medir(_cruces_anterior, consolidado, asignaciones, filtrado, repeticiones=args.repeticiones)
+    t_actual, actual = _medir(cruzar_consolidado, consolidado, asignaciones, filtrado, repeticiones=args.repeticiones)
+    pd.testing.assert_frame_equal(_sin_nulos_distintos(anterior), _sin_nulos_distintos(actual))
+    _reportar("Cruces (EVALASIGN + último trabajo)", len(consolidado), t_anterior, t_actual)
+
+# ---------------------------------------------------------------------------
+# Exportación de tablas a Excel
+# ---------------------------------------------------------------------------
+
+def bench_excel_tabla(args):
+    """Exportación a Excel: openpyxl celda por celda vs xlsxwriter por columnas tipadas."""
+    from gestionar_consolidados import procesar_consolidado
+    from src.utils.excel_tables import write_excel_table
+
+    df = procesar_consolidado(_consolidado_descarga(args.filas))
+    with tempfile.TemporaryDirectory() as carpeta:
+        anterior, actual = os.path.join(carpeta, 'anterior.xlsx'), os.path.join(carpeta, 'actual.xlsx')
+        t_anterior, _ = _medir(_tabla_openpyxl_anterior, anterior, df, 'BASE_CCM', repeticiones=args.repeticiones)
+        t_actual, _ = _medir(write_excel_table, actual, df, 'BASE_CCM', repeticiones=args.repeticiones)
+        # Mismo contenido al leer ambos archivos
+        pd.testing.assert_frame_equal(
+            _sin_nulos_distintos(pd.read_excel(anterior)), _sin_nulos_distintos(pd.read_excel(actual))
+        )
+    _reportar(f"Tabla de Excel, {df.shape[1]} columnas", len(df), t_anterior, t_actual)
+
+# ---------------------------------------------------------------------------
+# Consolidación de libros de asignación
+# ---------------------------------------------------------------------------
+
+def _generar_libros(carpeta, libros, filas_por_libro=150, semilla=0):
+    """Libros de asignación como los de las carpetas compartidas (hojas, encabezados y celdas variados)."""
+    import xlsxwriter
+    from consolidador import estados_validos
+
+    rng = np.random.default_rng(semilla)
+    estados = estados_validos + ['OTRO ESTADO', ' pre aprobado ', None, 7]
+    for n in range(libros):
+        libro = xlsxwriter.Workbook(os.path.join(carpeta, f"ASIGNACION_{n:04d}.xlsx"))
+        if n % 5 == 0:
+            libro.add_worksheet('RESUMEN').write(0, 0, 'Resumen')
+        # Uno de cada siete libros no tiene la hoja ASIGNACION
+        hoja = libro.add_worksheet('ASIGNACION' if n % 7 else 'Hoja1')
+        fila = int(rng.integers(0, 3))  # filas vacías antes del encabezado
+        encabezado = ['EXPEDIENTE', ' estado ', 'DESCRIPCION (OPCIONAL)' if n % 2 else 'DESCRIPCION', None, 'FECHA DE TRABAJO', 'OTRA']
+        if n % 13 == 12:
+            encabezado = ['N°', 'NOMBRE']  # sin columnas relevantes
+        hoja.write_row(fila, 0, encabezado)
+        formato_fecha = libro.add_format({'num_format': 'dd/mm/yyyy'})
+        # Uno de cada once libros solo tiene el encabezado
+        for i in range(0 if n % 11 == 10 else filas_por_libro):
+            fila += 1
+            azar = rng.random()
+            expediente = f"LM{n:04d}{i:06d}" if azar < 0.9 else (f"XX{i}" if azar < 0.95 else i)
+            descripcion = ['OK', None, i][i % 3]
+            hoja.write_row(fila, 0, [expediente, estados[rng.integers(0, len(estados))], descripcion, 'x', None, i])
+            hoja.write_datetime(fila, 4, (pd.Timestamp('2024-01-01') + pd.Timedelta(days=int(rng.integers(0, 300)))).to_pydatetime(), formato_fecha)
+        libro.close()
+    return carpeta
+
+def _extraer_relevante_anterior(df, archivo_origen):
+    """extraer_relevante previo: filtros fila a fila con apply."""
+    from consolidador import estados_validos, normalizar_estado
+
+    df.columns = [col.strip().upper() if isinstance(col, str) else str(col).strip() for col in df.columns]
+    columnas_necesarias = ["EXPEDIENTE", "ESTADO", "DESCRIPCION (OPCIONAL)", "DESCRIPCION", "FECHA DE TRABAJO"]
+    columnas_presentes = [col for col in columnas_necesarias if col in df.columns]
+    df_filtrado = df[columnas_presentes].copy()
+    if "DESCRIPCION (OPCIONAL)" in df_filtrado:
+        df_filtrado.rename(columns={"DESCRIPCION (OPCIONAL)": "DESCRIPCION"}, inplace=True)
+    if "EXPEDIENTE" in df_filtrado:
+        df_filtrado = df_filtrado[df_filtrado["EXPEDIENTE"].apply(lambda x: isinstance(x, str) and x.startswith("LM"))]
+    if "ESTADO" in df_filtrado:
+        df_filtrado["ESTADO"] = df_filtrado["ESTADO"].apply(normalizar_estado)
+        df_filtrado = df_filtrado[df_filtrado["ESTADO"].isin([estado.upper() for estado in estados_validos])]
+    df_filtrado["ARCHIVO_ORIGEN"] = archivo_origen
+    return df_filtrado
+
+def _consolidar_anterior(carpeta):
+    """Lectura previa de consolidador.py: un libro a la vez, hoja completa, reintentando con la primera hoja."""
+    datos_filtrados = []
+    for archivo in sorted(os.listdir(carpeta)):
+        archivo_path = os.path.join(carpeta, archivo)
+        if archivo.endswith((".xlsx", ".xlsm")) and not archivo.startswith("~$"):
+            try:
+                df = pd.read_excel(archivo_path, sheet_name="ASIGNACION", header=None)
+            except Exception:
+                df = pd.read_excel(archivo_path, sheet_name=0, header=None)
+            for i in range(3):
+                if not df.iloc[i].isnull().all():
+                    df.columns = df.iloc[i]
+                    df = df[i + 1:].reset_index(drop=True)
+                    break
+            datos_filtrados.append(_extraer_relevante_anterior(df, archivo))
+    return pd.concat(datos_filtrados, ignore_index=True)
+
+def _consolidar_actual(carpeta):
+    from consolidador import leer_libros, listar_libros
+
+    return pd.concat([df for _, _, (df, _, _) in leer_libros(listar_libros(carpeta))], ignore_index=True)
+
+def bench_consolidador(args):
+    """Consolidador: lectura secuencial de hojas completas vs en paralelo, por columnas y con filtros vectorizados."""
+    with tempfile.TemporaryDirectory() as carpeta:
+        _generar_libros(carpeta, args.libros)
+        t_anterior, anterior = _medir(_consolidar_anterior, carpeta, repeticiones=args.repeticiones)
+        t_actual, actual = _medir(_consolidar_actual, carpeta, repeticiones=args.repeticiones)
+        # Cada libro se tipa al leerlo (fechas y textos), como en su fragmento de caché
+        from consolidador import tipar_fragmento
+        pd.testing.assert_frame_equal(_sin_nulos_distintos(tipar_fragmento(anterior)), _sin_nulos_distintos(actual))
+    _reportar(f"Consolidador, {args.libros} libros", len(actual), t_anterior, t_actual)
+
+def _consolidar_carpeta(carpeta, salida, cache_dir, completo):
+    import contextlib
+    import io
+    from consolidador import consolidar_carpetas
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        consolidar_carpetas({'CCM': carpeta}, {'CCM': salida}, completo=completo, cache_dir=cache_dir)
+    return pd.read_parquet(salida)
+
+def bench_consolidador_incremental(args):
+    """Consolidador: reconstrucción completa vs incremental tras cambiar unos pocos libros."""
+    import shutil
+
+    with tempfile.TemporaryDirectory() as base:
+        carpeta, nuevos, cache_dir = (os.path.join(base, d) for d in ('libros', 'nuevos', 'cache'))
+        for d in (carpeta, nuevos):
+            os.makedirs(d)
+        _generar_libros(carpeta, args.libros)
+        _generar_libros(nuevos, 2, semilla=1)
+        _consolidar_carpeta(carpeta, os.path.join(base, 'inicial.parquet'), cache_dir, completo=True)
+
+        # Un libro modificado, uno solo "tocado" (mismo contenido), uno eliminado y uno nuevo
+        shutil.copy(os.path.join(nuevos, 'ASIGNACION_0000.xlsx'), os.path.join(carpeta, 'ASIGNACION_0001.xlsx'))
+        os.utime(os.path.join(carpeta, 'ASIGNACION_0002.xlsx'), (time.time(), time.time()))
+        os.remove(os.path.join(carpeta, 'ASIGNACION_0003.xlsx'))
+        shutil.copy(os.path.join(nuevos, 'ASIGNACION_0001.xlsx'), os.path.join(carpeta, 'ASIGNACION_9999.xlsx'))
+
+        t_completo, completo = _medir(
+            _consolidar_carpeta, carpeta, os.path.join(base, 'completo.parquet'), os.path.join(base, 'cache_completo'), True,
+            repeticiones=args.repeticiones)
+        t_incremental, incremental = _medir(
+            _consolidar_carpeta, carpeta, os.path.join(base, 'incremental.parquet'), cache_dir, False,
+            repeticiones=args.repeticiones)
+        pd.testing.assert_frame_equal(completo, incremental)
+        fragmentos = [f for f in os.listdir(cache_dir) if f.endswith('.parquet')]
+        assert len(fragmentos) == args.libros, "quedaron fragmentos de libros eliminados"
+    _reportar(f"Consolidador incremental, {args.libros} libros (4 cambios)", len(incremental), t_completo, t_incremental)
+
+# ---------------------------------------------------------------------------
+# Manejo de reportes (ASIGNACIONES.xlsx)
+# ---------------------------------------------------------------------------
+
+def _pendientes_filtrados(filas, semilla=0):
+    rng = np.random.default_rng(semilla)
+    prefijos = np.array(['LM', 'LS', 'MR', 'LN'])[rng.integers(0, 4, filas)]
+    evaluadores = np.array([f"EVALUADOR {i:03d}" for i in range(150)] + [' CON ESPACIOS ', 'O&M <X>'])
+    return [
+        [f"{prefijo}{n:09d}", evaluadores[rng.integers(0, len(evaluadores))]]
+        for n, prefijo in enumerate(prefijos)
+    ]
+
+def _asignaciones_xlsx(ruta, filas, nombre_hoja):
+    """ASIGNACIONES.xlsx con los datos de la corrida anterior: IDENTIFICADOS, REPORTADO_SIM, consolidado y fórmulas."""
+    import xlsxwriter
+
+    anteriores = _pendientes_filtrados(filas, semilla=1)
+    libro = xlsxwriter.Workbook(ruta)
+    resumen = libro.add_worksheet('RESUMEN')
+    resumen.write_row(0, 0, ['REPORTADOS', 'IDENTIFICADOS'])
+    resumen.write_formula(1, 0, '=COUNTA(REPORTADO_SIM!A:A)-1')
+    resumen.write_formula(1, 1, '=COUNTA(IDENTIFICADOS!A:A)-1')
+    identificados = libro.add_worksheet('IDENTIFICADOS')
+    identificados.write_row(0, 0, ['EXPEDIENTE', 'EVALUADOR'])
+    for i, (expediente, evaluador) in enumerate(anteriores[:filas // 20], start=1):
+        # Algunas filas sin evaluador (se omiten al consolidar)
+        identificados.write_row(i, 0, [expediente, evaluador if i % 10 else None])
+    reportado = libro.add_worksheet('REPORTADO_SIM')
+    reportado.write_row(0, 0, ['EXPEDIENTE', 'EVALUADOR', 'OBSERVACION'])
+    for i, (expediente, evaluador) in enumerate(anteriores, start=1):
+        reportado.write_row(i, 0, [expediente, evaluador, 'REVISAR' if i % 7 == 0 else None])
+    consolidado = libro.add_worksheet(nombre_hoja)
+    consolidado.add_table(0, 0, len(anteriores), 1, {
+        'name': nombre_hoja.replace('-', '_'), 'style': 'Table Style Medium 9',
+        'data': anteriores, 'columns': [{'header': 'EXPEDIENTE'}, {'header': 'EVALUADOR'}],
+    })
+    libro.close()
+    return ruta
+
+def _reportes_anterior(archivo_asignaciones, datos_filtrados, nombre_hoja):
+    """Escritura previa de manejo_reportes: libro completo con openpyxl, celda por celda."""
+    from openpyxl import load_workbook
+    from openpyxl.worksheet.table import Table, TableStyleInfo
+
+    wb_asignaciones = load_workbook(archivo_asignaciones)
+    if "REPORTADO_SIM" in wb_asignaciones.sheetnames:
+        ws_reportado = wb_asignaciones["REPORTADO_SIM"]
+        for row in ws_reportado.iter_rows(min_row=2):
+            for cell in row:
+                cell.value = None
+    ws_reportado = wb_asignaciones["REPORTADO_SIM"]
+    for i, (exp, eval) in enumerate(datos_filtrados, start=2):
+        ws_reportado.cell(row=i, column=1, value=exp)
+        ws_reportado.cell(row=i, column=2, value=eval)
+    ws_identificados = wb_asignaciones["IDENTIFICADOS"]
+    datos_identificados = []
+    for row in ws_identificados.iter_rows(min_row=2, values_only=True):
+        if row[0] and row[1]:
+            datos_identificados.append([row[0], row[1]])
+    if nombre_hoja in wb_asignaciones.sheetnames:
+        del wb_asignaciones[nombre_hoja]
+    ws_consolidado = wb_asignaciones.create_sheet(nombre_hoja)
+    ws_consolidado.cell(row=1, column=1, value="EXPEDIENTE")
+    ws_consolidado.cell(row=1, column=2, value="EVALUADOR")
+    datos_consolidados = datos_identificados + datos_filtrados
+    for i, (exp, eval) in enumerate(datos_consolidados, start=2):
+        ws_consolidado.cell(row=i, column=1, value=exp)
+        ws_consolidado.cell(row=i, column=2, value=eval)
+    tab = Table(displayName=nombre_hoja.replace("-", "_"), ref=f"A1:B{len(datos_consolidados) + 1}")
+    tab.tableStyleInfo = TableStyleInfo(name="TableStyleMedium9", showFirstColumn=False,
+                                        showLastColumn=False, showRowStripes=True, showColumnStripes=True)
+    ws_consolidado.add_table(tab)
+    wb_asignaciones.save(archivo_asignaciones)
+
+def _contenido_libro(ruta):
+    """Valores de cada hoja (sin filas ni celdas vacías al final) y tablas, por nombre de hoja."""
+    from openpyxl import load_workbook
+
+    libro = load_workbook(ruta)
+    contenido = {}
+    for hoja in libro.worksheets:
+        filas = [list(fila) for fila in hoja.iter_rows(values_only=True)]
+        for fila in filas:
+            while fila and fila[-1] is None:
+                fila.pop()
+        while filas and not filas[-1]:
+            filas.pop()
+        tablas = sorted((tabla.displayName, tabla.ref, tabla.tableStyleInfo.name) for tabla in hoja.tables.values())
+        contenido[hoja.title] = (filas, tablas)
+    return contenido
+
+def _sobre_copia(func, plantilla, destino, *args):
+    import shutil
+
+    shutil.copy(plantilla, destino)
+    func(destino, *args)
+    return destino
+
+def bench_reportes(args):
+    """Manejo de reportes: libro completo con openpyxl vs reemplazo de las hojas REPORTADO_SIM y consolidado."""
+    from manejo_reportes import actualizar_asignaciones
+
+    nombre_hoja = "CONSOLIDADO_CCM_X_EVAL"
+    datos_filtrados = _pendientes_filtrados(args.filas)
+    with tempfile.TemporaryDirectory() as carpeta:
+        plantilla = _asignaciones_xlsx(os.path.join(carpeta, 'plantilla.xlsx'), args.filas, nombre_hoja)
+        t_anterior, anterior = _medir(
+            _sobre_copia, _reportes_anterior, plantilla, os.path.join(carpeta, 'anterior.xlsx'),
+            datos_filtrados, nombre_hoja, repeticiones=args.repeticiones)
+        t_actual, actual = _medir(
+            _sobre_copia, actualizar_asignaciones, plantilla, os.path.join(carpeta, 'actual.xlsx'),
+            datos_filtrados, nombre_hoja, repeticiones=args.repeticiones)
+        assert _contenido_libro(anterior) == _contenido_libro(actual), "los libros no coinciden"
+    _reportar(f"Manejo de reportes, ASIGNACIONES con {args.filas:,d} pendientes", len(datos_filtrados), t_anterior, t_actual)
+
+BENCHMARKS = {
+    'asignaciones': bench_asignaciones,
+    'ranking_spe': bench_ranking_spe,
+    'etl_parquet': bench_etl_parquet,
+    'cruces': bench_cruces,
+    'excel_tabla': bench_excel_tabla,
+    'consolidador': bench_consolidador,
+    'consolidador_incremental': bench_consolidador_incremental,
+    'reportes': bench_reportes,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks del dashboard")
+    parser.add_argument('benchmark', nargs='?', choices=sorted(BENCHMARKS), help="Benchmark a ejecutar")
+    parser.add_argument('--lista', action='store_true', help="Listar los benchmarks disponibles")
+    parser.add_argument('--filas', type=int, default=1_000_000, help="Filas de los datos sintéticos")
+    parser.add_argument('--repeticiones', type=int, default=3, help="Repeticiones por medición")
+    parser.add_argument('--dias', type=int, nargs='+', default=[15, 90, 365], help="Ventanas (días) a medir")
+    parser.add_argument('--libros', type=int, default=300, help="Libros de asignación a generar")
+    args = parser.parse_args()
+
+    if args.lista or not args.benchmark:
+        for nombre, func in sorted(BENCHMARKS.items()):
+            print(f"{nombre:20s} {func.__doc__.strip().splitlines()[0]}")
+        return
+
+    BENCHMARKS[args.benchmark](args)
+
+if __name__ == "__main__":
+    main()
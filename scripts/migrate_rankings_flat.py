@@ -0,0 +1,163 @@
+"""
+Migra los rankings del esquema anidado ({modulo, fecha, datos: [...]}) al
+esquema aplanado (un documento por modulo, fecha y evaluador).
+
+La migración es idempotente: cada fila se escribe con upsert sobre la clave
+única (modulo, fecha, evaluador). Al terminar cada módulo se comparan filas y
+totales entre ambos esquemas y, si coinciden, se marca el módulo como migrado
+para que las lecturas pasen a usar el esquema aplanado.
+
+Antes de migrar, los documentos anidados repetidos por (modulo, fecha) se
+fusionan en uno y el índice (modulo, fecha) se reemplaza por uno único. El
+arranque de la aplicación no elimina índices; este cambio se hace solo aquí.
+
+Uso (desde la raíz del proyecto):
+    python -m scripts.migrate_rankings_flat
+    python -m scripts.migrate_rankings_flat --modulo CCM --modulo PRR
+"""
+import argparse
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import OperationFailure
+from src.utils.database import get_mongodb_connection
+from src.services.rankings_repository import (
+    RANKINGS_INDEX, RANKINGS_INDEX_NAME, RankingsRepository, _a_datetime
+)
+from config.settings import MONGODB_CONFIG
+
+TAMANO_LOTE = 5000
+
+def _fusionar_datos(documentos):
+    """Arreglo `datos` con las cantidades de los documentos sumadas por evaluador."""
+    cantidades = {}
+    sin_cantidad = []
+    for documento in documentos:
+        for elemento in documento.get('datos') or []:
+            # Los registros de SPE usan la clave EVALUADOR
+            clave = 'evaluador' if 'evaluador' in elemento else 'EVALUADOR'
+            try:
+                cantidad = int(elemento.get('cantidad'))
+            except (TypeError, ValueError):
+                sin_cantidad.append(elemento)
+                continue
+            llave = (clave, elemento.get(clave))
+            cantidades[llave] = cantidades.get(llave, 0) + cantidad
+    return [
+        {clave: evaluador, "cantidad": cantidad} for (clave, evaluador), cantidad in cantidades.items()
+    ] + sin_cantidad
+
+def fusionar_duplicados(rankings):
+    """
+    Deja un solo documento por (modulo, fecha) en el esquema anidado, con las
+    cantidades sumadas por evaluador (como ya las suman las lecturas).
+
+    Returns:
+        Cantidad de documentos eliminados
+    """
+    grupos = rankings.aggregate([
+        {"$group": {"_id": {"modulo": "$modulo", "fecha": "$fecha"}, "ids": {"$push": "$_id"}, "n": {"$sum": 1}}},
+        {"$match": {"n": {"$gt": 1}}},
+    ], allowDiskUse=True)
+    eliminados = 0
+    for grupo in grupos:
+        documentos = list(rankings.find({"_id": {"$in": grupo["ids"]}}).sort("_id", ASCENDING))
+        rankings.update_one({"_id": documentos[0]["_id"]}, {"$set": {"datos": _fusionar_datos(documentos)}})
+        eliminados += rankings.delete_many({"_id": {"$in": [d["_id"] for d in documentos[1:]]}}).deleted_count
+    return eliminados
+
+def asegurar_indice_unico(rankings):
+    """
+    Reemplaza el índice (modulo, fecha) sin unique por el único, después de
+    fusionar los duplicados. Si la creación falla (un duplicado escrito durante
+    el cambio), se restaura el índice sin unique para no dejar las lecturas
+    sin índice.
+
+    Returns:
+        True si el índice quedó único
+    """
+    indice = rankings.index_information().get(RANKINGS_INDEX_NAME)
+    if indice is not None and indice.get('unique'):
+        return True
+    eliminados = fusionar_duplicados(rankings)
+    if eliminados:
+        print(f"🔁 {eliminados:,d} documentos (modulo, fecha) duplicados fusionados")
+    if indice is not None:
+        rankings.drop_index(RANKINGS_INDEX_NAME)
+    try:
+        rankings.create_index(RANKINGS_INDEX, name=RANKINGS_INDEX_NAME, unique=True)
+    except OperationFailure as e:
+        rankings.create_index(RANKINGS_INDEX, name=RANKINGS_INDEX_NAME)
+        print(f"❌ No se pudo crear el índice único (modulo, fecha): {e}")
+        return False
+    return True
+
+def _leer_anidado(repo, module):
+    """Filas (fecha, evaluador, cantidad) del esquema anidado, consolidando duplicados."""
+    df = repo._to_frame(repo.collection.aggregate(repo.pipeline(module), allowDiskUse=True))
+    df = df.dropna(subset=['evaluador', 'cantidad'])
+    return df.groupby(['fecha', 'evaluador'], as_index=False, sort=True)['cantidad'].sum()
+
+def migrar_modulo(repo, module, tamano_lote=TAMANO_LOTE):
+    """
+    Copia un módulo al esquema aplanado y lo marca como migrado si la
+    verificación coincide.
+
+    Returns:
+        True si el módulo quedó migrado
+    """
+    filas = _leer_anidado(repo, module)
+    operaciones = [
+        UpdateOne(
+            {"modulo": module, "fecha": _a_datetime(fecha), "evaluador": evaluador},
+            {"$set": {"cantidad": int(cantidad)}},
+            upsert=True
+        )
+        for fecha, evaluador, cantidad in filas.itertuples(index=False, name=None)
+    ]
+    for inicio in range(0, len(operaciones), tamano_lote):
+        repo.flat.bulk_write(operaciones[inicio:inicio + tamano_lote], ordered=False)
+
+    # Verificación: filas y total de expedientes de ambos esquemas
+    filas_planas = repo.flat.count_documents({"modulo": module})
+    total_plano = next(repo.flat.aggregate([
+        {"$match": {"modulo": module}},
+        {"$group": {"_id": None, "total": {"$sum": "$cantidad"}}}
+    ]), {"total": 0})["total"]
+    total_anidado = int(filas['cantidad'].sum())
+
+    if filas_planas != len(filas) or total_plano != total_anidado:
+        print(
+            f"❌ {module}: verificación fallida "
+            f"(filas {len(filas):,d} vs {filas_planas:,d}, total {total_anidado:,d} vs {total_plano:,d})"
+        )
+        return False
+
+    repo.mark_migrated(module, filas_planas)
+    print(f"✅ {module}: {filas_planas:,d} filas migradas ({total_plano:,d} expedientes)")
+    return True
+
+def migrate_rankings(modulos=None):
+    """Migra los módulos indicados (o todos los presentes en la colección)."""
+    client = get_mongodb_connection()
+    try:
+        rankings = client[MONGODB_CONFIG['database']][MONGODB_CONFIG['collections']['rankings']]
+        repo = RankingsRepository(rankings)
+        repo.ensure_indexes()
+        asegurar_indice_unico(rankings)
+
+        modulos = modulos or sorted(m for m in rankings.distinct("modulo") if m)
+        resultados = {module: migrar_modulo(repo, module) for module in modulos}
+
+        fallidos = [m for m, ok in resultados.items() if not ok]
+        if fallidos:
+            print(f"\n⚠️ Módulos sin migrar: {', '.join(fallidos)}")
+        else:
+            print("\n✅ Migración completada")
+        return resultados
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migra los rankings al esquema aplanado")
+    parser.add_argument('--modulo', action='append', help="Módulo a migrar (repetible); por defecto todos")
+    args = parser.parse_args()
+    migrate_rankings(args.modulo)
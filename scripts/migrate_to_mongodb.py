@@ -1,4 +1,5 @@
 from src.utils.mongo_uploader import MongoUploader
+from src.utils.parquet_store import existe_tabla
 from config.settings import MODULES, MODULE_FOLDERS
 import pandas as pd
 import os
@@ -13,7 +14,8 @@ def migrate_data():
         for module, folder in MODULE_FOLDERS.items():
             if module != 'SPE':
                 print(f"\nProcesando módulo: {module}")
-                file_path = os.path.join(folder, f"Consolidado_{module}_CRUZADO.xlsx")
+                base = os.path.join(folder, f"Consolidado_{module}_CRUZADO")
+                file_path = existe_tabla(f"{base}.parquet", f"{base}.xlsx") or f"{base}.parquet"
                 
                 if os.path.exists(file_path):
                     collection_name = f"consolidado_{module.lower()}"
@@ -0,0 +1,162 @@
+"""
+Servidor HTTP local que imita la exportación CSV del ReportServer (SSRS) para
+probar descarga.py sin acceso a la red interna.
+
+Genera CSVs deterministas por (nidtipoTramite, anio, EstadoTramite) con las
+3 líneas de encabezado del reporte, soporta Range requests y keep-alive, y
+puede inyectar fallas: respuestas 500 y conexiones cortadas a mitad del cuerpo.
+
+Uso (desde la raíz del proyecto):
+    python -m scripts.servidor_ssrs_simulado --puerto 8765 --filas 200000 --prob-error 0.1 --prob-corte 0.2
+    SSRS_BASE_URL=http://127.0.0.1:8765/ReportServer python descarga.py
+"""
+import argparse
+import random
+import threading
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+DEPENDENCIAS = ['LIMA', 'MIRAFLORES', 'LIMA SUR', 'LIMA NORTE', 'AREQUIPA', 'CUSCO', 'PIURA', 'TACNA']
+COLUMNAS = ['NumeroTramite', 'Dependencia', 'FechaExpendiente', 'EstadoTramite', 'Evaluador', 'Observacion']
+
+class ConfiguracionServidor:
+    def __init__(self, filas=50000, prob_error=0.0, prob_corte=0.0, semilla=0):
+        self.filas = filas
+        self.prob_error = prob_error
+        self.prob_corte = prob_corte
+        self.azar = random.Random(semilla)
+        self.lock = threading.Lock()
+        self.solicitudes = 0
+
+    def sortear(self, probabilidad):
+        with self.lock:
+            return self.azar.random() < probabilidad
+
+
+@lru_cache(maxsize=64)
+def generar_csv(tipo, anio, estado, filas):
+    """CSV del reporte para una combinación de parámetros (mismo contenido en cada llamada)."""
+    azar = random.Random(f"{tipo}-{anio}-{estado}")
+    lineas = [
+        'Textbox1',
+        f'Reporte de trámites {tipo} {anio} {estado}',
+        '',
+        ','.join(COLUMNAS),
+    ]
+    for i in range(filas):
+        lineas.append(','.join([
+            f'LM{anio}{i:08d}',
+            azar.choice(DEPENDENCIAS),
+            f'{azar.randint(1, 28):02d}/{azar.randint(1, 12):02d}/{anio}',
+            estado,
+            f'EVALUADOR {azar.randint(1, 60)}',
+            'SIN OBSERVACIONES',
+        ]))
+    return ('\r\n'.join(lineas) + '\r\n').encode('utf-8-sig')
+
+
+class ManejadorSSRS(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    config = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        config = self.config
+        with config.lock:
+            config.solicitudes += 1
+        parametros = parse_qs(urlparse(self.path).query)
+        try:
+            tipo = parametros['nidtipoTramite'][0]
+            anio = parametros['anio'][0]
+            estado = parametros['EstadoTramite'][0]
+        except KeyError:
+            self._responder_error(400, b'Faltan parametros del reporte')
+            return
+
+        if config.sortear(config.prob_error):
+            self._responder_error(500, b'Error interno simulado')
+            return
+
+        contenido = generar_csv(tipo, anio, estado, config.filas)
+        total = len(contenido)
+        inicio = self._inicio_rango(total)
+        if inicio is None:
+            self.send_response(416)
+            self.send_header('Content-Range', f'bytes */{total}')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        cuerpo = contenido[inicio:]
+        self.send_response(206 if inicio else 200)
+        self.send_header('Content-Type', 'text/csv; charset=utf-8')
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        if inicio:
+            self.send_header('Content-Range', f'bytes {inicio}-{total - 1}/{total}')
+        self.end_headers()
+
+        if config.sortear(config.prob_corte) and len(cuerpo) > 1:
+            # Enviar solo una parte y cortar la conexión
+            self.wfile.write(cuerpo[:random.randint(1, len(cuerpo) - 1)])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(cuerpo)
+
+    def _inicio_rango(self, total):
+        """Byte inicial pedido en el header Range (0 si no hay), o None si no es satisfacible."""
+        rango = self.headers.get('Range', '')
+        if not rango.startswith('bytes='):
+            return 0
+        inicio = rango[len('bytes='):].split('-', 1)[0]
+        if not inicio.isdigit():
+            return 0
+        inicio = int(inicio)
+        return inicio if inicio < total else None
+
+    def _responder_error(self, codigo, mensaje):
+        self.send_response(codigo)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(mensaje)))
+        self.end_headers()
+        self.wfile.write(mensaje)
+
+
+def crear_servidor(puerto=8765, host='127.0.0.1', **opciones):
+    """Servidor listo para serve_forever(); puerto=0 elige uno libre."""
+    config = ConfiguracionServidor(**opciones)
+    manejador = type('Manejador', (ManejadorSSRS,), {'config': config})
+    servidor = ThreadingHTTPServer((host, puerto), manejador)
+    servidor.daemon_threads = True
+    servidor.config = config
+    return servidor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor SSRS simulado para pruebas de descarga.")
+    parser.add_argument('--puerto', type=int, default=8765)
+    parser.add_argument('--filas', type=int, default=50000, help="Filas por reporte")
+    parser.add_argument('--prob-error', type=float, default=0.0, help="Probabilidad de responder 500")
+    parser.add_argument('--prob-corte', type=float, default=0.0, help="Probabilidad de cortar el cuerpo")
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args()
+
+    servidor = crear_servidor(
+        args.puerto, filas=args.filas, prob_error=args.prob_error,
+        prob_corte=args.prob_corte, semilla=args.semilla
+    )
+    print(f"Servidor SSRS simulado en http://127.0.0.1:{args.puerto}/ReportServer")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
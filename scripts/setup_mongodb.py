@@ -1,6 +1,8 @@
+from datetime import datetime, timedelta
 from pymongo import MongoClient, ASCENDING
 from src.utils.database import get_mongodb_connection
-from config.settings import MONGODB_COLLECTIONS
+from src.services.rankings_repository import RankingsRepository, RANKINGS_INDEX_NAME, FLAT_INDEX_NAME
+from config.settings import MONGODB_COLLECTIONS, MONGODB_CONFIG
 
 def setup_mongodb_indexes():
     """Configura índices necesarios en MongoDB."""
@@ -16,12 +18,9 @@ def setup_mongodb_indexes():
             collection.create_index([("NumeroTramite", ASCENDING)])
             print(f"✅ Índices creados para {collection_name}")
 
-        # Índices para rankings
-        rankings = db.rankings
-        rankings.create_index([
-            ("modulo", ASCENDING),
-            ("fecha", ASCENDING)
-        ], unique=True)
+        # Índices para rankings (viven en expedientes_db)
+        rankings = client[MONGODB_CONFIG['database']][MONGODB_CONFIG['collections']['rankings']]
+        RankingsRepository(rankings).ensure_indexes()
         print("✅ Índices creados para rankings")
 
     except Exception as e:
@@ -29,5 +28,35 @@ def setup_mongodb_indexes():
     finally:
         client.close()
 
+def verify_rankings_plan(module='CCM', dias=15):
+    """
+    Verifica con explain que la lectura por ventana de rankings usa el índice
+    (modulo, fecha) del esquema que corresponda al módulo (anidado o aplanado)
+    y no recorre la colección completa.
+
+    Returns:
+        True si el plan usa IXSCAN sobre un índice compuesto y no tiene COLLSCAN
+    """
+    client = get_mongodb_connection()
+    try:
+        rankings = client[MONGODB_CONFIG['database']][MONGODB_CONFIG['collections']['rankings']]
+        repo = RankingsRepository(rankings)
+        hasta = datetime.now().date()
+        desde = hasta - timedelta(days=dias)
+
+        esperado = FLAT_INDEX_NAME if repo.is_migrated(module) else RANKINGS_INDEX_NAME
+        etapas, indices = repo.plan_stages(repo.explain(module, desde, hasta))
+        usa_indice = 'IXSCAN' in etapas and esperado in indices
+        sin_collscan = 'COLLSCAN' not in etapas
+
+        if usa_indice and sin_collscan:
+            print(f"✅ Lectura de rankings usa el índice {esperado} (etapas: {', '.join(etapas)})")
+        else:
+            print(f"❌ Lectura de rankings sin índice (etapas: {', '.join(etapas)}; índices: {indices})")
+        return usa_indice and sin_collscan
+    finally:
+        client.close()
+
 if __name__ == "__main__":
-    setup_mongodb_indexes() 
\ No newline at end of file
+    setup_mongodb_indexes()
+    verify_rankings_plan()
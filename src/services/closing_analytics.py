@@ -0,0 +1,171 @@
+import numpy as np
+import pandas as pd
+
+# Umbral de cierres para considerar válido un sábado o domingo
+MIN_CIERRES_FIN_DE_SEMANA = 10
+
+class ClosingAnalytics:
+    """
+    Motor de análisis de cierres construido una sola vez por dataset.
+
+    Precalcula una matriz densa evaluador × día con la cantidad de cierres y la
+    suma de días de cierre, cubriendo el período más largo que ofrece la pestaña.
+    Cualquier período ("últimos N días", "durante el último mes") se resuelve
+    recortando columnas de esa matriz, sin volver a agrupar el DataFrame.
+    """
+
+    def __init__(self, data: pd.DataFrame, max_dias: int = 31, hoy: pd.Timestamp = None):
+        self.data = data
+        # Momento de referencia de los períodos (inyectable para fijar la fecha)
+        self.ahora = hoy or pd.Timestamp.now()
+        self.hoy = self.ahora.normalize()
+        self.inicio = min(self.hoy.replace(day=1), self.hoy - pd.Timedelta(days=max_dias))
+
+        fecha_pre = pd.to_datetime(data['FechaPre'], errors='coerce')
+        fecha_exp = pd.to_datetime(data['FechaExpendiente'], errors='coerce')
+        dias_pre = fecha_pre.dt.normalize().to_numpy()
+
+        # Filas cerradas dentro de la ventana, ordenadas por fecha de cierre. Las
+        # que no tienen FechaExpendiente cuentan como cierre, sin tiempo de cierre
+        en_ventana = fecha_pre.notna().to_numpy() & (dias_pre >= self.inicio.to_datetime64())
+        posiciones = np.flatnonzero(en_ventana)
+        orden = np.argsort(dias_pre[posiciones], kind='stable')
+        self._posiciones = posiciones[orden]
+        self._dias_filas = dias_pre[self._posiciones]
+        tiempos = fecha_pre.to_numpy()[self._posiciones] - fecha_exp.to_numpy()[self._posiciones]
+        self._con_tiempo = ~np.isnat(tiempos)
+        self._tiempo_filas = np.where(
+            self._con_tiempo, tiempos.astype('timedelta64[D]').astype(np.int64), 0
+        )
+
+        fin = self.hoy
+        if len(self._dias_filas):
+            fin = max(fin, pd.Timestamp(self._dias_filas[-1]))
+        self.dias = pd.date_range(self.inicio, fin, freq='D')
+        self._habiles = self.dias.dayofweek.to_numpy() < 5
+
+        # Matriz densa evaluador × día (los evaluadores nulos quedan fuera)
+        codigos, self.evaluadores = pd.factorize(data['EVALASIGN'].to_numpy()[self._posiciones])
+        con_evaluador = codigos >= 0
+        codigo_dia = (
+            (self._dias_filas[con_evaluador] - self.inicio.to_datetime64()) // np.timedelta64(1, 'D')
+        ).astype(np.int64)
+        celdas = codigos[con_evaluador] * len(self.dias) + codigo_dia
+        forma = (len(self.evaluadores), len(self.dias))
+        tamano = forma[0] * forma[1]
+        self.conteos = np.bincount(celdas, minlength=tamano).reshape(forma)
+        self.tiempos = np.bincount(
+            celdas, weights=self._tiempo_filas[con_evaluador], minlength=tamano
+        ).reshape(forma)
+        self.conteos_con_tiempo = np.bincount(
+            celdas, weights=self._con_tiempo[con_evaluador], minlength=tamano
+        ).reshape(forma)
+
+    def primer_dia(self, periodo) -> pd.Timestamp:
+        """Primer día incluido en el período ('month' o cantidad de días)."""
+        if periodo == "month":
+            return self.hoy.replace(day=1)
+        # FechaPre >= ahora - N días equivale a tomar desde el día siguiente al umbral
+        return (self.ahora - pd.DateOffset(days=periodo)).ceil('D')
+
+    def _columnas(self, periodo) -> slice:
+        desde = max(self.primer_dia(periodo), self.inicio)
+        return slice(self.dias.searchsorted(desde), len(self.dias))
+
+    def matriz(self, periodo) -> pd.DataFrame:
+        """
+        Matriz de cierres por evaluador y día, con tendencia y promedio de días válidos,
+        ordenada por promedio descendente.
+        """
+        columnas = self._columnas(periodo)
+        conteos = self.conteos[:, columnas]
+        dias = self.dias[columnas]
+
+        filas = conteos.sum(axis=1) > 0
+        conteos = conteos[filas]
+        con_cierres = conteos.sum(axis=0) > 0
+
+        pendientes = self._pendientes(conteos)
+        tendencia = np.where(pendientes > 0, "⬆️", np.where(pendientes < 0, "⬇️", "➡️"))
+
+        matriz = pd.DataFrame(
+            conteos[:, con_cierres],
+            index=pd.Index(self.evaluadores[filas], name='EVALASIGN'),
+            columns=dias[con_cierres].strftime('%d/%m')
+        )
+        matriz['Tendencia'] = tendencia
+        matriz['Promedio'] = self._promedio_dias_validos(conteos, self._habiles[columnas])
+        return matriz.sort_values(by='Promedio', ascending=False)
+
+    def promedio_dias_validos(self, periodo) -> pd.DataFrame:
+        """Promedio de cierres por día válido para cada evaluador del período."""
+        columnas = self._columnas(periodo)
+        conteos = self.conteos[:, columnas]
+        promedio = self._promedio_dias_validos(conteos, self._habiles[columnas])
+        validos = ~np.isnan(promedio)
+        return pd.DataFrame({
+            'EVALASIGN': self.evaluadores[validos],
+            'PromedioDíasCierre': promedio[validos]
+        })
+
+    def tiempos_promedio(self, periodo) -> pd.DataFrame:
+        """
+        Tiempo promedio (días entre ingreso y cierre) por evaluador del período;
+        NaN si ninguno de sus cierres tiene FechaExpendiente.
+        """
+        columnas = self._columnas(periodo)
+        filas = self.conteos[:, columnas].sum(axis=1) > 0
+        cantidad = self.conteos_con_tiempo[:, columnas].sum(axis=1)[filas]
+        suma = self.tiempos[:, columnas].sum(axis=1)[filas]
+        return pd.DataFrame({
+            'EVALASIGN': self.evaluadores[filas],
+            'TiempoPromedio': np.divide(suma, cantidad, out=np.full(len(suma), np.nan), where=cantidad > 0)
+        })
+
+    def filas(self, periodo) -> pd.DataFrame:
+        """Expedientes cerrados en el período, con la columna TiempoCierre calculada."""
+        desde = np.datetime64(max(self.primer_dia(periodo), self.inicio))
+        corte = np.searchsorted(self._dias_filas, desde, side='left')
+        filas = self.data.iloc[self._posiciones[corte:]].copy()
+        filas['FechaPre'] = pd.to_datetime(filas['FechaPre'], errors='coerce')
+        filas['FechaExpendiente'] = pd.to_datetime(filas['FechaExpendiente'], errors='coerce')
+        tiempos = self._tiempo_filas[corte:]
+        con_tiempo = self._con_tiempo[corte:]
+        filas['TiempoCierre'] = tiempos if con_tiempo.all() else np.where(con_tiempo, tiempos, np.nan)
+        return filas
+
+    @staticmethod
+    def _pendientes(conteos: np.ndarray) -> np.ndarray:
+        """
+        Pendiente por mínimos cuadrados de cada fila, calculada en lote e
+        ignorando los días sin cierres.
+        """
+        mascara = conteos > 0
+        x = np.arange(conteos.shape[1], dtype=float)
+        n = mascara.sum(axis=1)
+        sx = mascara @ x
+        sxx = mascara @ (x * x)
+        sy = conteos.sum(axis=1)
+        sxy = conteos @ x
+        denominador = n * sxx - sx * sx
+        numerador = n * sxy - sx * sy
+        return np.divide(
+            numerador, denominador,
+            out=np.zeros(len(conteos), dtype=float),
+            where=denominador > 0
+        )
+
+    @staticmethod
+    def _promedio_dias_validos(conteos: np.ndarray, habiles: np.ndarray) -> np.ndarray:
+        """
+        Cierres por día válido: lunes a viernes con cierres, o fines de semana
+        con más de MIN_CIERRES_FIN_DE_SEMANA cierres. NaN si no hay días válidos.
+        """
+        validos = (conteos > 0) & (habiles[np.newaxis, :] | (conteos > MIN_CIERRES_FIN_DE_SEMANA))
+        dias = validos.sum(axis=1)
+        total = np.where(validos, conteos, 0).sum(axis=1)
+        return np.divide(
+            total, dias,
+            out=np.full(len(conteos), np.nan),
+            where=dias > 0
+        )
@@ -11,6 +11,7 @@ from config.settings import (
     CACHE_TTL
 )
 from dotenv import load_dotenv
+from src.services.rankings_repository import RankingsRepository
 import logging
 import time
 import redis
@@ -259,6 +260,10 @@ class DataLoader:
                         collection.create_index(index, background=True)
                         logger.info(f"Índice {index_name} creado en {collection_name}")
                         
+
+            # Índice compuesto (modulo, fecha) para las lecturas por ventana de rankings
+            RankingsRepository(_self.get_rankings_collection()).ensure_indexes()
+                        
         except Exception as e:
             logger.error(f"Error al crear índices: {str(e)}")
 
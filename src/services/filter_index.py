@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+
+class _ColumnIndex:
+    """Índice invertido de una columna: valor -> lista ordenada de filas."""
+
+    def __init__(self, serie: pd.Series):
+        self.codigos, uniques = pd.factorize(serie.to_numpy(), use_na_sentinel=True)
+        self.valores = list(uniques)
+        self._codigo_por_valor = {valor: codigo for codigo, valor in enumerate(self.valores)}
+        # Filas agrupadas por código; los nulos (-1) quedan al inicio y se descartan
+        orden = np.argsort(self.codigos, kind='stable')
+        self.conteos = np.bincount(self.codigos[self.codigos >= 0], minlength=len(self.valores))
+        inicio_validos = len(orden) - int(self.conteos.sum())
+        self._orden = orden[inicio_validos:]
+        self._offsets = np.concatenate(([0], np.cumsum(self.conteos)))
+
+    def codigos_de(self, valores) -> np.ndarray:
+        return np.array(
+            [self._codigo_por_valor[v] for v in valores if v in self._codigo_por_valor],
+            dtype=np.int64
+        )
+
+    def tamano(self, codigos: np.ndarray) -> int:
+        return int(self.conteos[codigos].sum())
+
+    def filas(self, codigos: np.ndarray) -> np.ndarray:
+        """Unión de las listas de filas de los códigos indicados."""
+        partes = [self._orden[self._offsets[c]:self._offsets[c + 1]] for c in codigos]
+        return np.concatenate(partes) if partes else np.empty(0, dtype=np.int64)
+
+    def contiene(self, filas: np.ndarray, codigos: np.ndarray) -> np.ndarray:
+        """Máscara de las filas cuyo valor está entre los códigos indicados."""
+        # La última posición corresponde a los nulos (código -1) y siempre es False
+        permitido = np.zeros(len(self.valores) + 1, dtype=bool)
+        permitido[codigos] = True
+        return permitido[self.codigos[filas]]
+
+
+class FilterIndex:
+    """
+    Motor de filtrado basado en índices invertidos.
+
+    Mantiene, por cada columna categórica, la lista de filas de cada valor y un
+    índice ordenado por fecha. Una consulta parte del criterio más selectivo y
+    descarta candidatos con búsquedas por código, de modo que el costo depende
+    del tamaño del resultado y no del tamaño del módulo. Solo las filas que
+    cumplen todos los criterios se materializan en un DataFrame.
+    """
+
+    def __init__(self, data: pd.DataFrame, columnas, columna_fecha='FechaExpendiente'):
+        self.data = data
+        self.indices = {col: _ColumnIndex(data[col]) for col in columnas if col in data.columns}
+
+        self.columna_fecha = columna_fecha
+        self._fechas = None
+        if columna_fecha in data.columns:
+            fechas = data[columna_fecha]
+            if not pd.api.types.is_datetime64_any_dtype(fechas):
+                fechas = pd.to_datetime(fechas, format='%d/%m/%Y', errors='coerce')
+            valores = fechas.to_numpy(dtype='datetime64[ns]')
+            validas = np.flatnonzero(~np.isnat(valores))
+            orden = validas[np.argsort(valores[validas], kind='stable')]
+            self._fechas = valores
+            self._orden_fechas = orden
+            self._fechas_ordenadas = valores[orden]
+
+    def valores(self, columna):
+        """Valores distintos (no nulos) de una columna indexada."""
+        return self.indices[columna].valores
+
+    def consultar(self, filtros=None, fecha_desde=None, fecha_hasta=None) -> np.ndarray:
+        """
+        Resuelve una combinación de filtros y retorna las posiciones de las filas
+        que la cumplen, en el orden original del DataFrame.
+
+        Args:
+            filtros: Diccionario columna -> valores permitidos. Los filtros vacíos o None se ignoran.
+            fecha_desde: Fecha mínima (inclusive) de la columna de fecha
+            fecha_hasta: Fecha máxima (inclusive) de la columna de fecha
+        """
+        criterios = []
+        for columna, valores in (filtros or {}).items():
+            if valores is None or len(valores) == 0:
+                continue
+            indice = self.indices[columna]
+            codigos = indice.codigos_de(valores)
+            criterios.append((indice.tamano(codigos), 'columna', indice, codigos))
+
+        limites = None
+        if (fecha_desde is not None or fecha_hasta is not None) and self._fechas is not None:
+            desde = np.datetime64(pd.Timestamp(fecha_desde), 'ns') if fecha_desde is not None else None
+            # Fecha hasta inclusiva: se compara contra el inicio del día siguiente
+            hasta = (
+                np.datetime64(pd.Timestamp(fecha_hasta) + pd.Timedelta(days=1), 'ns')
+                if fecha_hasta is not None else None
+            )
+            inicio = np.searchsorted(self._fechas_ordenadas, desde, side='left') if desde is not None else 0
+            fin = (
+                np.searchsorted(self._fechas_ordenadas, hasta, side='left')
+                if hasta is not None else len(self._fechas_ordenadas)
+            )
+            limites = (desde, hasta, int(inicio), int(max(inicio, fin)))
+            criterios.append((limites[3] - limites[2], 'fecha', None, None))
+
+        if not criterios:
+            return np.arange(len(self.data))
+
+        # Empezar por el criterio más selectivo
+        criterios.sort(key=lambda c: c[0])
+        _, tipo, indice, codigos = criterios[0]
+        if tipo == 'fecha':
+            filas = self._orden_fechas[limites[2]:limites[3]]
+        else:
+            filas = indice.filas(codigos)
+
+        for _, tipo, indice, codigos in criterios[1:]:
+            if len(filas) == 0:
+                break
+            if tipo == 'fecha':
+                desde, hasta = limites[0], limites[1]
+                fechas = self._fechas[filas]
+                mascara = ~np.isnat(fechas)
+                if desde is not None:
+                    mascara &= fechas >= desde
+                if hasta is not None:
+                    mascara &= fechas < hasta
+                filas = filas[mascara]
+            else:
+                filas = filas[indice.contiene(filas, codigos)]
+
+        return np.sort(filas)
+
+    def materializar(self, filas: np.ndarray, columnas=None) -> pd.DataFrame:
+        """Construye el DataFrame solo con las filas (y columnas) indicadas."""
+        if columnas is None:
+            return self.data.iloc[filas]
+        return self.data.iloc[filas, [self.data.columns.get_loc(c) for c in columnas]]
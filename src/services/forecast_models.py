@@ -0,0 +1,53 @@
+"""
+Ajustes de modelos de pronóstico.
+
+Funciones puras (sin Streamlit) para que puedan ejecutarse en los procesos de
+ModelJobRunner: reciben arreglos y retornan diccionarios serializables.
+"""
+import numpy as np
+import pandas as pd
+
+def polynomial_forecast(valores, horizonte=30, grado=2):
+    """
+    Regresión polinomial sobre una serie diaria y predicción de los
+    `horizonte` días siguientes.
+    """
+    from sklearn.linear_model import LinearRegression
+    from sklearn.preprocessing import PolynomialFeatures
+
+    valores = np.asarray(valores, dtype=float)
+    X = np.arange(len(valores)).reshape(-1, 1)
+    poly = PolynomialFeatures(degree=grado)
+    model = LinearRegression()
+    model.fit(poly.fit_transform(X), valores)
+
+    X_future = np.arange(len(valores), len(valores) + horizonte).reshape(-1, 1)
+    return {'predicciones': model.predict(poly.transform(X_future))}
+
+def monthly_forecast(promedios, dias_habiles_mes, periodo=12):
+    """
+    Predicción de ingresos del próximo mes a partir del promedio diario mensual.
+
+    Con al menos dos ciclos completos usa descomposición estacional (tendencia +
+    estacionalidad); con menos, la tendencia lineal de los últimos 3 meses.
+    """
+    from statsmodels.tsa.seasonal import seasonal_decompose
+
+    promedios = pd.Series(np.asarray(promedios, dtype=float))
+    if len(promedios) >= 2 * periodo:
+        decomposition = seasonal_decompose(promedios, period=periodo, extrapolate_trend='freq')
+        tendencia_valor = decomposition.trend.iloc[-1]
+        estacionalidad = decomposition.seasonal.iloc[-1]
+        return {
+            'metodo': 'estacional',
+            'prediccion': float((tendencia_valor + estacionalidad) * dias_habiles_mes),
+            'tendencia': None
+        }
+
+    ultimos_meses = promedios.tail(3)
+    tendencia = np.polyfit(range(len(ultimos_meses)), ultimos_meses, 1)[0]
+    return {
+        'metodo': 'tendencia',
+        'prediccion': float((ultimos_meses.iloc[-1] + tendencia) * dias_habiles_mes),
+        'tendencia': float(tendencia)
+    }
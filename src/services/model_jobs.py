@@ -0,0 +1,204 @@
+import hashlib
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+import streamlit as st
+
+# Procesos que ajustan modelos a la vez (compartidos por todas las sesiones)
+MAX_WORKERS = 2
+# Trabajos aceptados sin terminar (en ejecución + en cola); los demás se rechazan
+MAX_PENDING = 8
+# Segundos máximos por ajuste antes de abortarlo
+DEFAULT_TIMEOUT = 120
+# Resultados terminados que se conservan
+MAX_RESULTS = 64
+
+PENDIENTE, LISTO, ERROR, RECHAZADO = 'pendiente', 'listo', 'error', 'rechazado'
+
+def job_key(*partes):
+    """Clave estable de un trabajo a partir de sus entradas (arreglos, números, textos)."""
+    h = hashlib.sha1()
+    for parte in partes:
+        if isinstance(parte, np.ndarray):
+            h.update(np.ascontiguousarray(parte).tobytes())
+            h.update(str(parte.dtype).encode())
+        else:
+            h.update(repr(parte).encode())
+        h.update(b'|')
+    return h.hexdigest()
+
+
+class _Job:
+    def __init__(self, future, grupo, timeout):
+        self.future = future
+        self.grupo = grupo
+        self.timeout = timeout
+        self.inicio = time.monotonic()
+        self.estado = PENDIENTE
+        self.resultado = None
+        self.error = None
+        # Falló por el reinicio del pool (no por el propio ajuste): se puede reenviar
+        self.reintentable = False
+
+
+class ModelJobRunner:
+    """
+    Ejecuta ajustes de modelos en un ProcessPoolExecutor fuera del hilo del
+    script de Streamlit.
+
+    Los trabajos se identifican por una clave derivada de sus entradas: enviar
+    la misma clave otra vez no repite el ajuste (ni reintenta uno que falló o
+    superó su timeout). Por cada grupo (ej. el pronóstico de un módulo) se
+    conserva el último resultado correcto, que la interfaz muestra mientras el
+    trabajo nuevo termina. Un trabajo que supera
+    su timeout se aborta reiniciando el pool (los trabajos que compartían el
+    pool quedan en error y se reintentan en el siguiente envío).
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, max_pending=MAX_PENDING):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._executor = None
+        self._jobs = OrderedDict()
+        self._ultimos = {}
+
+    def _pool(self):
+        if self._executor is None:
+            # spawn: el servidor de Streamlit tiene hilos activos y fork no es seguro
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._executor
+
+    def _reiniciar_pool(self):
+        executor, self._executor = self._executor, None
+        if executor is None:
+            return
+        procesos = list((getattr(executor, '_processes', None) or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        for proceso in procesos:
+            proceso.terminate()
+
+    def submit(self, clave, func, *args, grupo=None, timeout=DEFAULT_TIMEOUT):
+        """
+        Envía un ajuste si la clave no está ya en curso o terminada.
+
+        Returns:
+            Estado del trabajo (pendiente, listo, error o rechazado si la cola está llena)
+        """
+        with self._lock:
+            job = self._jobs.get(clave)
+            if job is not None and not (job.estado == ERROR and job.reintentable):
+                return self._actualizar(clave, job)
+            pendientes = sum(1 for j in self._jobs.values() if j.estado == PENDIENTE)
+            if pendientes >= self.max_pending:
+                return RECHAZADO
+            try:
+                future = self._pool().submit(func, *args)
+            except BrokenProcessPool:
+                self._reiniciar_pool()
+                future = self._pool().submit(func, *args)
+            self._jobs[clave] = _Job(future, grupo, timeout)
+            self._jobs.move_to_end(clave)
+            self._purgar()
+            return PENDIENTE
+
+    def _actualizar(self, clave, job):
+        """Refleja en el trabajo el estado de su future (y aplica el timeout)."""
+        if job.estado != PENDIENTE:
+            return job.estado
+        if job.future.done():
+            try:
+                job.resultado = job.future.result()
+                job.estado = LISTO
+                if job.grupo is not None:
+                    self._ultimos[job.grupo] = job.resultado
+            except Exception as e:
+                job.error = str(e) or type(e).__name__
+                job.estado = ERROR
+                job.reintentable = isinstance(e, BrokenProcessPool)
+        elif job.timeout and time.monotonic() - job.inicio > job.timeout:
+            job.error = f"El ajuste superó el tiempo máximo de {job.timeout} s"
+            job.estado = ERROR
+            if not job.future.cancel():
+                self._reiniciar_pool()
+        return job.estado
+
+    def _purgar(self):
+        terminados = [c for c, j in self._jobs.items() if j.estado != PENDIENTE]
+        for clave in terminados[:max(0, len(self._jobs) - MAX_RESULTS)]:
+            del self._jobs[clave]
+
+    def status(self, clave):
+        """(estado, resultado o mensaje de error) de un trabajo."""
+        with self._lock:
+            job = self._jobs.get(clave)
+            if job is None:
+                return None, None
+            estado = self._actualizar(clave, job)
+            return estado, job.resultado if estado == LISTO else job.error
+
+    def latest(self, grupo):
+        """Último resultado correcto del grupo (de cualquier clave), o None."""
+        with self._lock:
+            return self._ultimos.get(grupo)
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+def get_model_job_runner() -> ModelJobRunner:
+    """Runner compartido por el proceso (sobrevive a st.cache_resource.clear())."""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = ModelJobRunner()
+        return _runner
+
+def render_model_job(clave, func, args, render, grupo=None, timeout=DEFAULT_TIMEOUT,
+                     intervalo=1.0, mensaje="⏳ Calculando el modelo en segundo plano..."):
+    """
+    Envía el ajuste y muestra su resultado sin bloquear la sesión.
+
+    Si el resultado ya está disponible se muestra de inmediato. Si no, se
+    muestra el último resultado del grupo (o un aviso) dentro de un fragmento
+    que consulta el trabajo cada `intervalo` segundos y vuelve a ejecutar la
+    página cuando el ajuste termina.
+
+    Args:
+        render: Función que recibe el resultado y lo dibuja
+    """
+    runner = get_model_job_runner()
+    estado = runner.submit(clave, func, *args, grupo=grupo, timeout=timeout)
+    sondear = estado in (PENDIENTE, RECHAZADO)
+
+    @st.fragment(run_every=intervalo if sondear else None)
+    def _vista():
+        estado, valor = runner.status(clave)
+        if estado is None:
+            # Rechazado por cola llena: reintentar en la siguiente consulta
+            estado = runner.submit(clave, func, *args, grupo=grupo, timeout=timeout)
+            estado, valor = runner.status(clave) if estado != RECHAZADO else (RECHAZADO, None)
+        if estado in (LISTO, ERROR) and sondear:
+            # Terminó: ejecutar la página completa para mostrar el resultado y dejar de consultar
+            st.rerun()
+        if estado == LISTO:
+            render(valor)
+            return
+        if estado == ERROR:
+            st.warning(f"No se pudo calcular el modelo: {valor}")
+            return
+        previo = runner.latest(grupo) if grupo is not None else None
+        if previo is not None:
+            st.caption("Mostrando el resultado anterior mientras se actualiza el modelo...")
+            render(previo)
+        else:
+            st.info(mensaje)
+
+    _vista()
@@ -0,0 +1,179 @@
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+MARGINS_NAME = 'Total'
+
+def _factorizar(serie: pd.Series):
+    """Códigos ordenados de una columna (-1 para nulos) y sus etiquetas."""
+    try:
+        return pd.factorize(serie, sort=True, use_na_sentinel=True)
+    except TypeError:
+        # Tipos mezclados: ordenar por la representación de texto
+        codigos, etiquetas = pd.factorize(serie, use_na_sentinel=True)
+        orden = np.argsort(np.asarray(etiquetas, dtype=str), kind='stable')
+        rango = np.empty(len(orden), dtype=np.int64)
+        rango[orden] = np.arange(len(orden))
+        return np.where(codigos >= 0, rango[np.maximum(codigos, 0)], -1), etiquetas[orden]
+
+
+class PivotEngine:
+    """
+    Tablas dinámicas (conteo de valores únicos con totales) sobre un dataset fijo.
+
+    Los códigos de cada dimensión y de la columna de valores se calculan una sola
+    vez. Cada tabla se resuelve con enteros: se deduplican las ternas
+    (fila, columna, valor) y de ese núcleo salen la tabla y sus totales, sin una
+    segunda pasada sobre los datos. Los resultados se guardan por especificación
+    normalizada (filtros + dimensiones), de modo que volver a una combinación ya
+    vista es inmediato.
+    """
+
+    def __init__(self, data: pd.DataFrame, dimensiones, columna_valor, columnas_fecha=(),
+                 columna_orden=None, max_resultados=32):
+        self.data = data
+        self._codigos = {}
+        self._etiquetas = {}
+        for columna in dimensiones:
+            self._codigos[columna], self._etiquetas[columna] = _factorizar(data[columna])
+        self._valores, _ = pd.factorize(data[columna_valor], use_na_sentinel=True)
+        self._n_valores = int(self._valores.max()) + 1 if len(self._valores) else 0
+        self._fechas = {
+            columna: data[columna].to_numpy().astype('datetime64[D]')
+            for columna in columnas_fecha if columna in data.columns
+        }
+        self._orden = (
+            np.argsort(data[columna_orden].to_numpy(), kind='stable') if columna_orden else None
+        )
+        self._max_resultados = max_resultados
+        self._cache = OrderedDict()
+
+    @staticmethod
+    def normalizar(filtros=None, fechas=None):
+        """Clave estable de una combinación de filtros (sin filtros vacíos)."""
+        filtros = tuple(sorted(
+            (columna, tuple(sorted(map(str, valores))))
+            for columna, valores in (filtros or {}).items() if valores
+        ))
+        fechas = tuple(sorted(
+            (columna, rango) for columna, rango in (fechas or {}).items()
+            if rango and rango[0] is not None and rango[1] is not None
+        ))
+        return filtros, fechas
+
+    def _memo(self, clave, calcular):
+        if clave in self._cache:
+            self._cache.move_to_end(clave)
+            return self._cache[clave]
+        resultado = calcular()
+        self._cache[clave] = resultado
+        while len(self._cache) > self._max_resultados:
+            self._cache.popitem(last=False)
+        return resultado
+
+    def filas(self, filtros=None, fechas=None) -> np.ndarray:
+        """
+        Posiciones de las filas que cumplen los filtros.
+
+        Args:
+            filtros: Diccionario dimensión -> valores permitidos
+            fechas: Diccionario columna de fecha -> (desde, hasta), ambos inclusive
+        """
+        filtros_norm, fechas_norm = self.normalizar(filtros, fechas)
+        return self._memo(('filas', filtros_norm, fechas_norm), lambda: self._filtrar(filtros, fechas_norm))
+
+    def _filtrar(self, filtros, fechas_norm):
+        mascara = np.ones(len(self.data), dtype=bool)
+        for columna, valores in (filtros or {}).items():
+            if not valores:
+                continue
+            etiquetas = self._etiquetas[columna]
+            # Posición extra al final para los nulos (código -1), nunca permitida
+            permitido = np.append(pd.Index(etiquetas).isin(list(valores)), False)
+            mascara &= permitido[self._codigos[columna]]
+        for columna, (desde, hasta) in fechas_norm:
+            dias = self._fechas[columna]
+            mascara &= (dias >= np.datetime64(desde, 'D')) & (dias <= np.datetime64(hasta, 'D'))
+        return np.flatnonzero(mascara)
+
+    def detalle(self, columnas, filtros=None, fechas=None) -> pd.DataFrame:
+        """Filas filtradas con las columnas indicadas, en el orden precalculado."""
+        filtros_norm, fechas_norm = self.normalizar(filtros, fechas)
+
+        def calcular():
+            posiciones = self.filas(filtros, fechas)
+            if self._orden is not None:
+                seleccion = np.zeros(len(self.data), dtype=bool)
+                seleccion[posiciones] = True
+                posiciones = self._orden[seleccion[self._orden]]
+            return self.data.iloc[posiciones, [self.data.columns.get_loc(c) for c in columnas]]
+
+        return self._memo(('detalle', tuple(columnas), filtros_norm, fechas_norm), calcular)
+
+    def pivot(self, filas, columnas, filtros=None, fechas=None) -> pd.DataFrame:
+        """
+        Equivalente a pd.pivot_table(..., aggfunc='nunique', fill_value=0,
+        margins=True, margins_name='Total') sobre las filas filtradas.
+        """
+        filtros_norm, fechas_norm = self.normalizar(filtros, fechas)
+        clave = ('pivot', tuple(filas), tuple(columnas), filtros_norm, fechas_norm)
+        return self._memo(clave, lambda: self._pivot(filas, columnas, self.filas(filtros, fechas)))
+
+    def _claves(self, dimensiones, posiciones):
+        """Código combinado (base mixta, orden lexicográfico) de varias dimensiones."""
+        clave = np.zeros(len(posiciones), dtype=np.int64)
+        for columna in dimensiones:
+            clave = clave * len(self._etiquetas[columna]) + self._codigos[columna][posiciones]
+        return clave
+
+    def _indice(self, dimensiones, claves) -> pd.Index:
+        """Etiquetas de las claves combinadas observadas."""
+        niveles = []
+        for columna in reversed(dimensiones):
+            base = len(self._etiquetas[columna])
+            niveles.append(np.asarray(self._etiquetas[columna])[claves % base])
+            claves = claves // base
+        niveles.reverse()
+        if len(dimensiones) == 1:
+            return pd.Index(niveles[0], name=dimensiones[0])
+        return pd.MultiIndex.from_arrays(niveles, names=list(dimensiones))
+
+    @staticmethod
+    def _con_total(indice: pd.Index) -> pd.Index:
+        total = MARGINS_NAME if indice.nlevels == 1 else (MARGINS_NAME,) + ('',) * (indice.nlevels - 1)
+        return indice.append(pd.Index([total]) if indice.nlevels == 1 else pd.MultiIndex.from_tuples([total]))
+
+    def _pivot(self, filas, columnas, posiciones) -> pd.DataFrame:
+        # Filas con nulos en alguna dimensión o en el valor no participan (como dropna=True)
+        validas = self._valores[posiciones] >= 0
+        for columna in list(filas) + list(columnas):
+            validas &= self._codigos[columna][posiciones] >= 0
+        posiciones = posiciones[validas]
+        if len(posiciones) == 0:
+            return pd.DataFrame()
+
+        claves_fila, fila = np.unique(self._claves(filas, posiciones), return_inverse=True)
+        claves_columna, columna = np.unique(self._claves(columnas, posiciones), return_inverse=True)
+        n_filas, n_columnas = len(claves_fila), len(claves_columna)
+        valores = self._valores[posiciones].astype(np.int64)
+
+        # Núcleo: ternas (celda, valor) distintas
+        celdas, celda = np.unique(fila * n_columnas + columna, return_inverse=True)
+        ternas = np.unique(celda * self._n_valores + valores)
+        celda_terna, valor_terna = np.divmod(ternas, self._n_valores)
+        fila_terna, columna_terna = np.divmod(celdas[celda_terna], n_columnas)
+
+        matriz = np.zeros((n_filas + 1, n_columnas + 1), dtype=np.int64)
+        matriz[:n_filas, :n_columnas].flat[celdas] = np.bincount(celda_terna, minlength=len(celdas))
+        # Totales a partir del núcleo: valores distintos por fila, por columna y en total
+        por_fila = np.unique(fila_terna * self._n_valores + valor_terna) // self._n_valores
+        matriz[:n_filas, n_columnas] = np.bincount(por_fila, minlength=n_filas)
+        por_columna = np.unique(columna_terna * self._n_valores + valor_terna) // self._n_valores
+        matriz[n_filas, :n_columnas] = np.bincount(por_columna, minlength=n_columnas)
+        matriz[n_filas, n_columnas] = len(np.unique(valor_terna))
+
+        return pd.DataFrame(
+            matriz,
+            index=self._con_total(self._indice(filas, claves_fila)),
+            columns=self._con_total(self._indice(columnas, claves_columna))
+        )
@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+
+COLUMNAS_PRODUCTIVIDAD = ['EVALUADOR', 'CANT_EXPEDIENTES', 'DIAS_TRABAJADOS', 'PROMEDIO']
+
+class MonthlyProductivity:
+    """
+    Productividad mensual por evaluador para todos los meses del dataset.
+
+    En una sola pasada sobre los códigos (mes, evaluador, día) se calculan la
+    cantidad de expedientes, los días distintos trabajados de cada evaluador en
+    cada mes, los totales mensuales y la serie diaria. Las vistas de un mes
+    (actual, anterior o cualquier otro) son recortes de esas tablas.
+    """
+
+    def __init__(self, data: pd.DataFrame, columna_fecha, columna_evaluador, columna_expediente):
+        fechas = data[columna_fecha]
+        if not pd.api.types.is_datetime64_any_dtype(fechas):
+            fechas = pd.to_datetime(fechas, errors='coerce')
+        fechas = fechas.to_numpy(dtype='datetime64[ns]')
+        validas = ~np.isnat(fechas)
+        fechas = fechas[validas]
+
+        dias = fechas.astype('datetime64[D]').astype(np.int64)
+        meses = fechas.astype('datetime64[M]').astype(np.int64)
+        self._mes_base = int(meses.min()) if len(meses) else 0
+        self._dia_base = int(dias.min()) if len(dias) else 0
+        meses = meses - self._mes_base
+        dias = dias - self._dia_base
+        n_meses = int(meses.max()) + 1 if len(meses) else 0
+        n_dias = int(dias.max()) + 1 if len(dias) else 0
+
+        # Totales por mes y serie diaria (todas las filas con fecha, con o sin evaluador)
+        self.filas_por_dia = np.bincount(dias, minlength=n_dias)
+        dias_con_trabajo = np.flatnonzero(self.filas_por_dia)
+        self.filas_por_mes = np.bincount(meses, minlength=n_meses)
+        self.dias_por_mes = np.bincount(
+            self._mes_de_dia(dias_con_trabajo), minlength=n_meses
+        )
+
+        # Tabla (mes, evaluador): los evaluadores nulos quedan fuera, como en groupby
+        codigos, self.evaluadores = pd.factorize(
+            data[columna_evaluador].to_numpy()[validas], sort=True, use_na_sentinel=True
+        )
+        con_evaluador = codigos >= 0
+        n_evaluadores = len(self.evaluadores)
+        clave = meses[con_evaluador] * n_evaluadores + codigos[con_evaluador]
+        con_expediente = data[columna_expediente].notna().to_numpy()[validas][con_evaluador]
+
+        tamano = n_meses * n_evaluadores
+        filas = np.bincount(clave, minlength=tamano)
+        expedientes = np.bincount(clave, weights=con_expediente, minlength=tamano).astype(np.int64)
+        dias_distintos = np.unique(clave * max(n_dias, 1) + dias[con_evaluador]) // max(n_dias, 1)
+        dias_trabajados = np.bincount(dias_distintos, minlength=tamano)
+
+        presentes = np.flatnonzero(filas)
+        self._mes_grupo = presentes // max(n_evaluadores, 1)
+        self._evaluador_grupo = presentes % max(n_evaluadores, 1)
+        self._expedientes = expedientes[presentes]
+        self._dias_trabajados = dias_trabajados[presentes]
+        self.evaluadores_por_mes = np.bincount(self._mes_grupo, minlength=n_meses)
+        # Inicio de cada mes dentro de los grupos (ordenados por mes)
+        self._offsets = np.concatenate(([0], np.cumsum(self.evaluadores_por_mes)))
+
+    def _mes_de_dia(self, dias_relativos):
+        dias = (dias_relativos + self._dia_base).astype('datetime64[D]')
+        return dias.astype('datetime64[M]').astype(np.int64) - self._mes_base
+
+    def _indice_mes(self, anio, mes):
+        """Posición del mes en las tablas, o None si no hay datos de ese mes."""
+        indice = (anio - 1970) * 12 + (mes - 1) - self._mes_base
+        if indice < 0 or indice >= len(self.filas_por_mes):
+            return None
+        return indice
+
+    def month(self, anio, mes) -> pd.DataFrame:
+        """
+        Estadísticas por evaluador del mes: cantidad de expedientes, días
+        trabajados y promedio, ordenadas por cantidad con índice de ranking.
+        """
+        indice = self._indice_mes(anio, mes)
+        if indice is None:
+            return pd.DataFrame(columns=COLUMNAS_PRODUCTIVIDAD)
+        tramo = slice(self._offsets[indice], self._offsets[indice + 1])
+        stats = pd.DataFrame({
+            'EVALUADOR': np.asarray(self.evaluadores)[self._evaluador_grupo[tramo]],
+            'CANT_EXPEDIENTES': self._expedientes[tramo],
+            'DIAS_TRABAJADOS': self._dias_trabajados[tramo],
+        })
+        stats['PROMEDIO'] = (stats['CANT_EXPEDIENTES'] / stats['DIAS_TRABAJADOS']).round(0)
+        stats = stats.sort_values('CANT_EXPEDIENTES', ascending=False, kind='stable')
+        stats.index = range(1, len(stats) + 1)
+        return stats
+
+    def daily(self, anio, mes, hasta=None) -> pd.DataFrame:
+        """Cantidad de filas por día trabajado del mes (opcionalmente hasta una fecha)."""
+        inicio = np.datetime64(f"{anio:04d}-{mes:02d}", 'M')
+        desde = max(inicio.astype('datetime64[D]').astype(np.int64) - self._dia_base, 0)
+        fin = (inicio + 1).astype('datetime64[D]').astype(np.int64) - self._dia_base
+        if hasta is not None:
+            fin = min(fin, np.datetime64(pd.Timestamp(hasta).date(), 'D').astype(np.int64) - self._dia_base + 1)
+        fin = min(max(fin, desde), len(self.filas_por_dia))
+        conteos = self.filas_por_dia[desde:fin]
+        dias = np.flatnonzero(conteos)
+        return pd.DataFrame({
+            'fecha': (dias + desde + self._dia_base).astype('datetime64[D]').astype('datetime64[ns]'),
+            'cantidad': conteos[dias]
+        })
+
+    def summary(self, anio, mes):
+        """Totales del mes: filas, días trabajados y evaluadores activos."""
+        indice = self._indice_mes(anio, mes)
+        if indice is None:
+            return {'total': 0, 'dias': 0, 'evaluadores': 0}
+        return {
+            'total': int(self.filas_por_mes[indice]),
+            'dias': int(self.dias_por_mes[indice]),
+            'evaluadores': int(self.evaluadores_por_mes[indice])
+        }
@@ -0,0 +1,366 @@
+from datetime import date, datetime, timedelta
+import numpy as np
+import pandas as pd
+from pymongo import ASCENDING, DeleteMany, UpdateOne
+from pymongo.errors import OperationFailure
+
+# Índice compuesto que atiende todas las lecturas por módulo y rango de fechas;
+# único, porque los guardados son upserts por (modulo, fecha)
+RANKINGS_INDEX = [("modulo", ASCENDING), ("fecha", ASCENDING)]
+RANKINGS_INDEX_NAME = "modulo_1_fecha_1"
+
+# Índices del esquema aplanado: rangos por módulo y fecha (único por evaluador)
+# e historial de un evaluador
+FLAT_INDEX_NAME = "modulo_1_fecha_1_evaluador_1"
+FLAT_INDEXES = {
+    FLAT_INDEX_NAME: ([("modulo", ASCENDING), ("fecha", ASCENDING), ("evaluador", ASCENDING)], True),
+    "modulo_1_evaluador_1_fecha_1": ([("modulo", ASCENDING), ("evaluador", ASCENDING), ("fecha", ASCENDING)], False),
+}
+
+COLUMNAS_RANKING = ['fecha', 'evaluador', 'cantidad']
+# Rótulos de las columnas de fecha de la matriz de rankings
+FORMATO_COLUMNA = '%d/%m'
+FORMATO_COLUMNA_ANIO = '%d/%m/%y'
+
+def _a_datetime(fecha):
+    """Normaliza date/Timestamp/datetime al datetime que se guarda en MongoDB."""
+    if fecha is None:
+        return None
+    if isinstance(fecha, pd.Timestamp):
+        fecha = fecha.tz_localize(None) if fecha.tzinfo else fecha
+        return fecha.to_pydatetime()
+    if isinstance(fecha, datetime):
+        return fecha.replace(tzinfo=None)
+    if isinstance(fecha, date):
+        return datetime.combine(fecha, datetime.min.time())
+    return fecha
+
+def build_ranking_matrix(registros: pd.DataFrame, columna_evaluador='EVALUADOR') -> pd.DataFrame:
+    """
+    Matriz evaluador × fecha a partir de filas (fecha, evaluador, cantidad) con
+    un único pivot sobre las fechas reales, columnas en orden cronológico y
+    columna Total, ordenada por Total descendente.
+
+    Las columnas se rotulan dd/mm; si la ventana repite algún dd/mm (más de un
+    año) se rotulan dd/mm/aa.
+    """
+    if registros.empty:
+        return pd.DataFrame(columns=[columna_evaluador, 'Total'])
+
+    registros = registros.dropna(subset=['evaluador'])
+    matriz = registros.pivot_table(
+        index='evaluador',
+        columns=pd.to_datetime(registros['fecha']).dt.normalize(),
+        values='cantidad',
+        aggfunc='sum',
+        fill_value=0
+    ).sort_index(axis=1)
+
+    etiquetas = matriz.columns.strftime(FORMATO_COLUMNA)
+    if etiquetas.has_duplicates:
+        etiquetas = matriz.columns.strftime(FORMATO_COLUMNA_ANIO)
+    matriz.columns = etiquetas
+    matriz['Total'] = matriz.to_numpy().sum(axis=1)
+    return (
+        matriz.rename_axis(index=columna_evaluador, columns=None)
+        .reset_index()
+        .sort_values('Total', ascending=False, kind='stable')
+    )
+
+def ranking_column(matriz: pd.DataFrame, fecha) -> str:
+    """Rótulo de la columna de `fecha` en una matriz de build_ranking_matrix (dd/mm o dd/mm/aa)."""
+    con_anio = fecha.strftime(FORMATO_COLUMNA_ANIO)
+    return con_anio if con_anio in matriz.columns else fecha.strftime(FORMATO_COLUMNA)
+
+class RankingsRepository:
+    """
+    Acceso a los rankings de expedientes trabajados.
+
+    Conviven dos esquemas:
+    - Anidado (colección `rankings`): un documento por (modulo, fecha) con el
+      arreglo `datos` de {evaluador, cantidad}. Se lee con $match sobre el
+      índice (modulo, fecha) y $unwind de `datos` en el servidor.
+    - Aplanado (colección `rankings_diarios`): un documento por
+      (modulo, fecha, evaluador). Rangos, historial por evaluador y totales
+      son recorridos de índice sin desanidar.
+
+    Las escrituras van a ambos esquemas. Las lecturas usan el aplanado para
+    los módulos marcados como migrados en `rankings_esquema`
+    (ver scripts/migrate_rankings_flat.py) y el anidado para el resto.
+    """
+
+    def __init__(self, collection, flat_collection=None, schema_collection=None):
+        self.collection = collection
+        db = collection.database
+        if flat_collection is None or schema_collection is None:
+            # Se importa aquí: config.settings lee st.secrets al importarse
+            from config.settings import MONGODB_CONFIG
+            colecciones = MONGODB_CONFIG['collections']
+            flat_collection = flat_collection if flat_collection is not None else db[colecciones['rankings_diarios']]
+            schema_collection = schema_collection if schema_collection is not None else db[colecciones['rankings_esquema']]
+        self.flat = flat_collection
+        self.schema = schema_collection
+
+    def ensure_indexes(self):
+        """
+        Crea los índices de ambos esquemas que falten, sin eliminar ninguno.
+
+        Un índice (modulo, fecha) sin unique de una versión anterior se
+        conserva: la fusión de documentos duplicados y el reemplazo por el
+        índice único los hace scripts/migrate_rankings_flat.py.
+        """
+        if RANKINGS_INDEX_NAME not in self.collection.index_information():
+            try:
+                self.collection.create_index(RANKINGS_INDEX, name=RANKINGS_INDEX_NAME, unique=True, background=True)
+            except OperationFailure:
+                # Hay (modulo, fecha) duplicados: las lecturas no quedan sin índice
+                self.collection.create_index(RANKINGS_INDEX, name=RANKINGS_INDEX_NAME, background=True)
+        existentes = self.flat.index_information()
+        for nombre, (claves, unico) in FLAT_INDEXES.items():
+            if nombre not in existentes:
+                self.flat.create_index(claves, name=nombre, unique=unico, background=True)
+
+    def is_migrated(self, module) -> bool:
+        """Indica si las lecturas del módulo se sirven desde el esquema aplanado."""
+        return self.schema.find_one({"_id": module}) is not None
+
+    def mark_migrated(self, module, filas):
+        """Marca el módulo como migrado al esquema aplanado."""
+        self.schema.update_one(
+            {"_id": module},
+            {"$set": {"migrado": datetime.now(), "filas": int(filas)}},
+            upsert=True
+        )
+
+    @staticmethod
+    def _filtro(module, desde=None, hasta=None):
+        """Filtro por módulo y ventana [desde, hasta] (ambas fechas inclusive)."""
+        filtro = {"modulo": module}
+        rango = {}
+        if desde is not None:
+            rango["$gte"] = _a_datetime(desde)
+        if hasta is not None:
+            rango["$lt"] = _a_datetime(hasta) + timedelta(days=1)
+        if rango:
+            filtro["fecha"] = rango
+        return filtro
+
+    def pipeline(self, module, desde=None, hasta=None):
+        """Pipeline de agregación que retorna una fila por (fecha, evaluador)."""
+        return [
+            {"$match": self._filtro(module, desde, hasta)},
+            {"$project": {"_id": 0, "fecha": 1, "datos": 1}},
+            {"$unwind": "$datos"},
+            {"$project": {
+                "fecha": 1,
+                # Los registros de SPE usan la clave EVALUADOR
+                "evaluador": {"$ifNull": ["$datos.evaluador", "$datos.EVALUADOR"]},
+                "cantidad": {"$convert": {"input": "$datos.cantidad", "to": "int", "onError": None, "onNull": None}},
+            }},
+            {"$sort": {"fecha": 1}},
+        ]
+
+    def _flat_cursor(self, filtro):
+        return self.flat.find(filtro, {"_id": 0, "fecha": 1, "evaluador": 1, "cantidad": 1}).sort(
+            [("fecha", ASCENDING), ("evaluador", ASCENDING)]
+        )
+
+    @staticmethod
+    def _to_frame(cursor) -> pd.DataFrame:
+        df = pd.DataFrame.from_records(cursor, columns=COLUMNAS_RANKING)
+        if not df.empty:
+            df['fecha'] = pd.to_datetime(df['fecha'])
+        return df
+
+    def read(self, module, desde=None, hasta=None) -> pd.DataFrame:
+        """
+        Rankings del módulo en la ventana indicada como DataFrame con columnas
+        fecha (datetime64), evaluador y cantidad.
+        """
+        if self.is_migrated(module):
+            return self._to_frame(self._flat_cursor(self._filtro(module, desde, hasta)))
+        return self._to_frame(self.collection.aggregate(self.pipeline(module, desde, hasta)))
+
+    def evaluator_history(self, module, evaluador, desde=None, hasta=None) -> pd.DataFrame:
+        """Serie diaria de un evaluador (índice (modulo, evaluador, fecha) en el esquema aplanado)."""
+        if self.is_migrated(module):
+            filtro = {**self._filtro(module, desde, hasta), "evaluador": evaluador}
+            return self._to_frame(self._flat_cursor(filtro))
+        pipeline = self.pipeline(module, desde, hasta)
+        pipeline.insert(-1, {"$match": {"evaluador": evaluador}})
+        return self._to_frame(self.collection.aggregate(pipeline))
+
+    def totals(self, module, desde=None, hasta=None) -> pd.DataFrame:
+        """Total de expedientes por evaluador en la ventana, agregado en el servidor."""
+        agrupar = [
+            {"$group": {"_id": "$evaluador", "cantidad": {"$sum": "$cantidad"}}},
+            {"$project": {"_id": 0, "evaluador": "$_id", "cantidad": 1}},
+            {"$sort": {"cantidad": -1}},
+        ]
+        if self.is_migrated(module):
+            cursor = self.flat.aggregate([{"$match": self._filtro(module, desde, hasta)}] + agrupar)
+        else:
+            cursor = self.collection.aggregate(self.pipeline(module, desde, hasta)[:-1] + agrupar)
+        return pd.DataFrame.from_records(cursor, columns=['evaluador', 'cantidad'])
+
+    def write(self, module, conteos: pd.DataFrame, clave_evaluador='evaluador'):
+        """
+        Guarda los conteos diarios en un solo bulk_write de upserts por
+        (modulo, fecha). Cada fecha reemplaza su arreglo `datos`, por lo que
+        volver a guardar un día es idempotente. El esquema aplanado recibe un
+        upsert por (modulo, fecha, evaluador) y se eliminan los evaluadores que
+        ya no figuran en las fechas guardadas.
+
+        Args:
+            module: Módulo al que pertenecen los rankings
+            conteos: DataFrame con columnas fecha, evaluador y cantidad
+            clave_evaluador: Nombre de la clave del evaluador dentro de `datos`
+
+        Returns:
+            Diccionario con la cantidad de fechas insertadas, actualizadas y sin cambios
+        """
+        if conteos.empty:
+            return {'insertados': 0, 'actualizados': 0, 'sin_cambios': 0}
+
+        conteos = conteos.sort_values(['fecha', 'evaluador'], kind='stable')
+        fechas = pd.to_datetime(conteos['fecha']).dt.normalize().to_numpy()
+        evaluadores = conteos['evaluador'].to_numpy(dtype=object)
+        cantidades = conteos['cantidad'].to_numpy(dtype=np.int64)
+
+        # Cortes donde cambia la fecha: cada tramo es el arreglo `datos` de un documento
+        cortes = np.flatnonzero(fechas[1:] != fechas[:-1]) + 1
+        inicios = np.concatenate(([0], cortes))
+        operaciones = [
+            UpdateOne(
+                {"modulo": module, "fecha": _a_datetime(pd.Timestamp(fechas[inicio]))},
+                {"$set": {"datos": [
+                    {clave_evaluador: evaluador, "cantidad": cantidad}
+                    for evaluador, cantidad in zip(tramo_evaluadores.tolist(), tramo_cantidades.tolist())
+                ]}},
+                upsert=True
+            )
+            for inicio, tramo_evaluadores, tramo_cantidades in zip(
+                inicios, np.split(evaluadores, cortes), np.split(cantidades, cortes)
+            )
+        ]
+
+        resultado = self.collection.bulk_write(operaciones, ordered=False)
+        self.flat.bulk_write(
+            self._operaciones_planas(module, fechas, evaluadores, cantidades, inicios, cortes),
+            ordered=False
+        )
+        return {
+            'insertados': resultado.upserted_count,
+            'actualizados': resultado.modified_count,
+            'sin_cambios': resultado.matched_count - resultado.modified_count
+        }
+
+    @staticmethod
+    def _operaciones_planas(module, fechas, evaluadores, cantidades, inicios, cortes):
+        operaciones = []
+        for inicio, tramo_evaluadores in zip(inicios, np.split(evaluadores, cortes)):
+            fecha = _a_datetime(pd.Timestamp(fechas[inicio]))
+            operaciones.append(DeleteMany(
+                {"modulo": module, "fecha": fecha, "evaluador": {"$nin": tramo_evaluadores.tolist()}}
+            ))
+        operaciones.extend(
+            UpdateOne(
+                {"modulo": module, "fecha": _a_datetime(pd.Timestamp(fecha)), "evaluador": evaluador},
+                {"$set": {"cantidad": cantidad}},
+                upsert=True
+            )
+            for fecha, evaluador, cantidad in zip(fechas, evaluadores.tolist(), cantidades.tolist())
+        )
+        return operaciones
+
+    def set_count(self, module, fecha, evaluador, cantidad, clave_evaluador='evaluador'):
+        """
+        Fija la cantidad de un evaluador en una fecha sin leer ni reescribir el
+        arreglo `datos` completo.
+
+        Si el evaluador ya está en el documento, se actualiza su elemento con un
+        único update atómico con arrayFilters. Si no está, se agrega con $push
+        condicionado a que siga ausente (o se crea el documento del día).
+
+        Returns:
+            'actualizado', 'sin_cambios', 'agregado' o 'creado'
+        """
+        filtro = {"modulo": module, "fecha": _a_datetime(fecha)}
+        cantidad = int(cantidad)
+        self.flat.update_one(
+            {**filtro, "evaluador": evaluador}, {"$set": {"cantidad": cantidad}}, upsert=True
+        )
+
+        resultado = self.collection.update_one(
+            {**filtro, f"datos.{clave_evaluador}": evaluador},
+            {"$set": {"datos.$[elemento].cantidad": cantidad}},
+            array_filters=[{f"elemento.{clave_evaluador}": evaluador}]
+        )
+        if resultado.matched_count:
+            return 'actualizado' if resultado.modified_count else 'sin_cambios'
+
+        resultado = self.collection.update_one(
+            {**filtro, f"datos.{clave_evaluador}": {"$ne": evaluador}},
+            {"$push": {"datos": {clave_evaluador: evaluador, "cantidad": cantidad}}},
+            upsert=True
+        )
+        return 'creado' if resultado.upserted_id is not None else 'agregado'
+
+    def delete_day(self, module, fecha, incluir_sin_modulo=False):
+        """
+        Elimina los rankings de una fecha en ambos esquemas.
+
+        Args:
+            incluir_sin_modulo: Eliminar también los documentos antiguos de esa
+                fecha que no tienen el campo modulo
+
+        Returns:
+            Cantidad de documentos eliminados en el esquema anidado
+        """
+        fecha = _a_datetime(fecha)
+        self.flat.delete_many({"modulo": module, "fecha": fecha})
+        filtro = {"fecha": fecha, "modulo": module}
+        if incluir_sin_modulo:
+            del filtro["modulo"]
+            filtro["$or"] = [{"modulo": module}, {"modulo": {"$exists": False}}]
+        return self.collection.delete_many(filtro).deleted_count
+
+    def explain(self, module, desde=None, hasta=None):
+        """Plan de ejecución (queryPlanner) de la lectura de rankings del módulo."""
+        if self.is_migrated(module):
+            return self.flat.database.command(
+                'explain',
+                {
+                    'find': self.flat.name,
+                    'filter': self._filtro(module, desde, hasta),
+                    'projection': {"_id": 0, "fecha": 1, "evaluador": 1, "cantidad": 1},
+                    'sort': {"fecha": 1, "evaluador": 1}
+                },
+                verbosity='queryPlanner'
+            )
+        return self.collection.database.command(
+            'explain',
+            {
+                'aggregate': self.collection.name,
+                'pipeline': self.pipeline(module, desde, hasta),
+                'cursor': {}
+            },
+            verbosity='queryPlanner'
+        )
+
+    @staticmethod
+    def plan_stages(plan):
+        """Etapas (stage) e índices presentes en un plan de explain, recorrido completo."""
+        etapas, indices = [], []
+        pendientes = [plan]
+        while pendientes:
+            nodo = pendientes.pop()
+            if isinstance(nodo, dict):
+                if 'stage' in nodo:
+                    etapas.append(nodo['stage'])
+                if 'indexName' in nodo:
+                    indices.append(nodo['indexName'])
+                pendientes.extend(nodo.values())
+            elif isinstance(nodo, list):
+                pendientes.extend(nodo)
+        return etapas, indices
@@ -0,0 +1,37 @@
+import pandas as pd
+
+def parse_dates_unique(serie: pd.Series, **kwargs) -> pd.Series:
+    """
+    Convierte una columna de fechas en texto parseando cada valor distinto una
+    sola vez y propagando el resultado a las filas por su código.
+
+    Las hojas repiten la misma fecha en cientos de filas, por lo que el parseo
+    en formato mixto (el más lento de pandas) se hace sobre unos pocos cientos
+    de valores en lugar de sobre toda la columna.
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie
+    codigos, unicos = pd.factorize(serie, use_na_sentinel=True)
+    parseados = pd.to_datetime(pd.Index(unicos, dtype=object), errors='coerce', **kwargs)
+    # Los nulos (código -1) quedan como NaT
+    valores = parseados.take(codigos, allow_fill=True, fill_value=pd.NaT)
+    return pd.Series(valores, index=serie.index, name=serie.name)
+
+
+class SPEDataset:
+    """
+    Hoja de SPE con las columnas de fecha ya tipadas.
+
+    Se construye una vez por carga de la hoja (ver SPEModule.load_data) y se
+    conserva en session_state junto a los datos crudos, de modo que las
+    pestañas reciben fechas datetime64 sin volver a parsearlas en cada rerun.
+    """
+
+    def __init__(self, raw: pd.DataFrame, columnas_fecha):
+        self.raw = raw
+        self.data = raw.copy()
+        for columna in columnas_fecha:
+            if columna not in raw.columns:
+                continue
+            self.data[columna] = parse_dates_unique(raw[columna], format='mixed', dayfirst=True)
+
@@ -0,0 +1,75 @@
+from datetime import date
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from config.constants import FERIADOS_PERU
+
+def _pascua(anio):
+    """Domingo de Pascua (algoritmo de Meeus/Jones/Butcher, calendario gregoriano)."""
+    a, b, c = anio % 19, anio // 100, anio % 100
+    d, e = b // 4, b % 4
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 19 * l + 433) // 5143
+    mes = (h + l - 7 * m + 90) // 25
+    dia = (h + l - 7 * m + 33 * mes + 19) % 32
+    return date(anio, mes, dia)
+
+def feriados(anio_desde, anio_hasta, config=FERIADOS_PERU):
+    """Fechas feriadas (datetime64[D], ordenadas) entre los años indicados, inclusive."""
+    fechas = []
+    for anio in range(anio_desde, anio_hasta + 1):
+        fechas.extend(
+            date(anio, mes, dia) for mes, dia, desde in config.get('fijos', [])
+            if desde is None or anio >= desde
+        )
+        if config.get('semana_santa'):
+            pascua = np.datetime64(_pascua(anio), 'D')
+            fechas.extend([pascua - 3, pascua - 2])
+    fechas.extend(config.get('adicionales', []))
+    return np.unique(np.array(fechas, dtype='datetime64[D]'))
+
+class BusinessCalendar:
+    """
+    Calendario de días hábiles (lunes a viernes sin feriados) sobre
+    numpy.busdaycalendar. Todos los conteos son vectorizados: reciben
+    escalares, Series o arreglos de inicios y fines y resuelven cualquier
+    cantidad de períodos en una sola llamada a numpy.busday_count.
+    """
+
+    def __init__(self, anio_desde=2015, anio_hasta=None, config=FERIADOS_PERU):
+        anio_hasta = anio_hasta or date.today().year + 2
+        self.feriados = feriados(anio_desde, anio_hasta, config)
+        self._calendario = np.busdaycalendar(weekmask='1111100', holidays=self.feriados)
+
+    @staticmethod
+    def _dias(valores):
+        """Convierte escalares, Series o arreglos de fechas a datetime64[D]."""
+        if isinstance(valores, np.ndarray) and valores.dtype.kind == 'M':
+            return valores.astype('datetime64[D]')
+        if np.ndim(valores) == 0:
+            return np.datetime64(pd.Timestamp(valores).date(), 'D')
+        return pd.to_datetime(valores).to_numpy().astype('datetime64[D]')
+
+    def count(self, inicio, fin):
+        """Días hábiles entre inicio y fin, ambos inclusive (0 si fin < inicio)."""
+        inicio, fin = self._dias(inicio), self._dias(fin)
+        conteo = np.busday_count(inicio, fin + 1, busdaycal=self._calendario)
+        return np.maximum(conteo, 0)
+
+    def month_business_days(self, fechas):
+        """Días hábiles del mes completo al que pertenece cada fecha."""
+        dias = self._dias(fechas)
+        primero = dias.astype('datetime64[M]')
+        return self.count(primero.astype('datetime64[D]'), (primero + 1).astype('datetime64[D]') - 1)
+
+    def is_business_day(self, fechas):
+        """Máscara de las fechas que son días hábiles."""
+        return np.is_busday(self._dias(fechas), busdaycal=self._calendario)
+
+@lru_cache(maxsize=1)
+def business_calendar() -> BusinessCalendar:
+    """Calendario de Perú compartido por el proceso."""
+    return BusinessCalendar()
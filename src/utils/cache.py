@@ -9,4 +9,34 @@ def smart_cache(ttl_seconds=3600):
         def wrapped(*args, **kwargs):
             return func(*args, **kwargs)
         return wrapped
-    return decorator 
\ No newline at end of file
+    return decorator
+
+def data_version(df):
+    """
+    Identificador barato de la versión de un DataFrame en memoria.
+    No recorre los datos: los DataFrames del dashboard viven en session_state
+    y se reemplazan (no se mutan en filas) cuando se recargan.
+    """
+    return f"{id(df)}-{len(df)}-{len(df.columns)}"
+
+def session_cached(namespace, data, builder, extra=None):
+    """
+    Construye una estructura derivada de `data` (motor, índice, matriz...)
+    una sola vez por versión de datos y la conserva en session_state.
+
+    Args:
+        namespace: Nombre lógico del objeto cacheado
+        data: DataFrame del que se deriva el objeto
+        builder: Función que recibe `data` y retorna el objeto
+        extra: Valor adicional que invalida el objeto al cambiar (ej. fecha del día)
+
+    Returns:
+        El objeto construido o el cacheado si la versión de datos no cambió
+    """
+    key = f"_cache_{namespace}"
+    version = (data_version(data), extra)
+    entry = st.session_state.get(key)
+    if entry is None or entry[0] != version:
+        entry = (version, builder(data))
+        st.session_state[key] = entry
+    return entry[1]
@@ -0,0 +1,345 @@
+"""
+Reemplazo de hojas dentro de un libro .xlsx existente.
+
+Un .xlsx es un zip de partes XML (una por hoja). Para reescribir unas pocas
+hojas no hace falta cargar y guardar el libro completo con openpyxl, que
+interpreta y vuelve a serializar todas las celdas de todas las hojas: las
+partes de las hojas a reemplazar se generan de una vez y el resto del
+paquete se copia sin interpretarlo.
+"""
+import math
+import numbers
+import os
+import posixpath
+import re
+import zipfile
+from dataclasses import dataclass
+from typing import Optional, Sequence
+from xml.sax.saxutils import escape, quoteattr, unescape
+from xlsxwriter.utility import xl_col_to_name
+
+NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+NS_PAQUETE = "http://schemas.openxmlformats.org/package/2006/relationships"
+TIPO_HOJA = NS_REL + "/worksheet"
+TIPO_TABLA = NS_REL + "/table"
+TIPO_CALC_CHAIN = NS_REL + "/calcChain"
+CT_HOJA = "application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"
+CT_TABLA = "application/vnd.openxmlformats-officedocument.spreadsheetml.table+xml"
+ESTILO_TABLA = "TableStyleMedium9"
+ENCABEZADO_XML = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+_CARACTERES_INVALIDOS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+_ATRIBUTO = re.compile(r'([\w:.-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+
+
+@dataclass
+class ContenidoHoja:
+    """
+    Contenido nuevo de una hoja.
+
+    Con `encabezados` la hoja se reemplaza completa (o se crea al final del
+    libro si no existe) y, si se indica `tabla`, lleva una tabla con estilo
+    sobre todo el rango. Sin `encabezados` la hoja debe existir: conserva su
+    primera fila y desde la fila 2 solo quedan `filas`.
+    """
+    filas: Sequence[Sequence]
+    encabezados: Optional[Sequence[str]] = None
+    tabla: Optional[str] = None
+
+
+def _atributos(etiqueta):
+    return {nombre: unescape(doble if doble or not simple else simple, {'&quot;': '"', '&apos;': "'"})
+            for nombre, doble, simple in _ATRIBUTO.findall(etiqueta)}
+
+def _etiquetas(xml, nombre):
+    """Etiquetas de apertura (o vacías) del elemento `nombre`, con o sin prefijo."""
+    return re.findall(rf'<(?:\w+:)?{nombre}\b[^>]*>', xml)
+
+def _resolver(base, destino):
+    """Ruta dentro del zip del destino de una relación, relativo a la carpeta `base`."""
+    if destino.startswith('/'):
+        return destino[1:]
+    return posixpath.normpath(posixpath.join(base, destino))
+
+def _ruta_rels(parte):
+    carpeta, archivo = posixpath.split(parte)
+    return posixpath.join(carpeta, '_rels', archivo + '.rels')
+
+def _relaciones(paquete, parte):
+    """Relaciones de una parte: lista de (id, tipo, ruta destino, etiqueta original)."""
+    ruta = _ruta_rels(parte)
+    if ruta not in paquete:
+        return []
+    base = posixpath.dirname(parte)
+    relaciones = []
+    for etiqueta in _etiquetas(paquete[ruta], 'Relationship'):
+        atributos = _atributos(etiqueta)
+        destino = atributos.get('Target', '')
+        if atributos.get('TargetMode') != 'External':
+            destino = _resolver(base, destino)
+        relaciones.append((atributos.get('Id'), atributos.get('Type'), destino, etiqueta))
+    return relaciones
+
+def _quitar_etiquetas(xml, etiquetas):
+    for etiqueta in etiquetas:
+        xml = xml.replace(etiqueta, '', 1)
+    return xml
+
+def _insertar_antes_de_cierre(xml, elemento, nuevo):
+    """Inserta `nuevo` antes del cierre de `elemento` (o expande la forma vacía <elemento/>)."""
+    cierre = re.search(rf'</((?:\w+:)?){elemento}>', xml)
+    if cierre:
+        return xml[:cierre.start()] + nuevo + xml[cierre.start():]
+    vacio = re.search(rf'<((?:\w+:)?){elemento}\b([^>]*?)/>', xml)
+    prefijo = vacio.group(1)
+    return xml[:vacio.start()] + f'<{prefijo}{elemento}{vacio.group(2)}>{nuevo}</{prefijo}{elemento}>' + xml[vacio.end():]
+
+def _valor_celda(referencia, valor, p):
+    """XML de una celda; números y booleanos como tales, el resto como texto (vacío si None o NaN)."""
+    if isinstance(valor, str):
+        return _texto_celda(referencia, valor, p)
+    if valor is None:
+        return ''
+    if isinstance(valor, bool):
+        return f'<{p}c r="{referencia}" t="b"><{p}v>{int(valor)}</{p}v></{p}c>'
+    if isinstance(valor, numbers.Integral):
+        return f'<{p}c r="{referencia}"><{p}v>{int(valor)}</{p}v></{p}c>'
+    if isinstance(valor, numbers.Real):
+        if not math.isfinite(valor):
+            return ''
+        return f'<{p}c r="{referencia}"><{p}v>{float(valor)!r}</{p}v></{p}c>'
+    return _texto_celda(referencia, str(valor), p)
+
+def _texto_celda(referencia, texto, p):
+    texto = _CARACTERES_INVALIDOS.sub('', texto)
+    if len(texto) > 1 and texto.startswith('='):
+        # Igual que al asignar el texto a una celda con openpyxl: se guarda como fórmula
+        return f'<{p}c r="{referencia}"><{p}f>{escape(texto[1:])}</{p}f></{p}c>'
+    espacio = ' xml:space="preserve"' if texto != texto.strip() else ''
+    return f'<{p}c r="{referencia}" t="inlineStr"><{p}is><{p}t{espacio}>{escape(texto)}</{p}t></{p}is></{p}c>'
+
+def _filas_xml(filas, fila_inicial, p=''):
+    """(XML de las filas desde `fila_inicial`, cantidad de columnas usadas)."""
+    letras = []
+    partes = []
+    columnas = 0
+    for i, fila in enumerate(filas, start=fila_inicial):
+        if len(fila) > len(letras):
+            letras.extend(xl_col_to_name(j) for j in range(len(letras), len(fila)))
+        columnas = max(columnas, len(fila))
+        celdas = ''.join(_valor_celda(f'{letras[j]}{i}', valor, p) for j, valor in enumerate(fila))
+        partes.append(f'<{p}row r="{i}">{celdas}</{p}row>')
+    return ''.join(partes), columnas
+
+def _rango(columnas, filas):
+    return f"A1:{xl_col_to_name(max(columnas, 1) - 1)}{max(filas, 1)}"
+
+def _hoja_con_encabezado_existente(xml, filas):
+    """Hoja existente con su primera fila y las `filas` nuevas desde la fila 2."""
+    datos = re.search(r'<((?:\w+:)?)sheetData\s*/>|<((?:\w+:)?)sheetData>(.*?)</\2sheetData>', xml, re.S)
+    if datos is None:
+        raise ValueError("La hoja no tiene sheetData")
+    p = datos.group(1) if datos.group(1) is not None else datos.group(2)
+    contenido = datos.group(3) or ''
+
+    encabezado = ''
+    primera = re.match(r'\s*(<(?:\w+:)?row\b[^>]*?/>|<(?:\w+:)?row\b[^>]*>.*?</(?:\w+:)?row>)', contenido, re.S)
+    if primera and _atributos(re.match(r'<[^>]*>', primera.group(1)).group(0)).get('r', '1') == '1':
+        encabezado = primera.group(1)
+    letras = re.findall(r'\br="([A-Z]+)1"', encabezado)
+    columnas_encabezado = max((_columna_numero(letra) for letra in letras), default=0)
+
+    nuevas, columnas = _filas_xml(filas, 2, p)
+    xml = xml[:datos.start()] + f'<{p}sheetData>{encabezado}{nuevas}</{p}sheetData>' + xml[datos.end():]
+    rango = _rango(max(columnas, columnas_encabezado), len(filas) + 1)
+    return re.sub(r'(<(?:\w+:)?dimension\b[^>]*?\bref=)"[^"]*"', rf'\1"{rango}"', xml, count=1)
+
+def _columna_numero(letras):
+    numero = 0
+    for letra in letras:
+        numero = numero * 26 + ord(letra) - ord('A') + 1
+    return numero
+
+def _hoja_nueva(contenido: ContenidoHoja, tiene_tabla):
+    filas = [list(contenido.encabezados)] + [list(fila) for fila in contenido.filas]
+    datos, columnas = _filas_xml(filas, 1)
+    partes_tabla = '<tableParts count="1"><tablePart r:id="rId1"/></tableParts>' if tiene_tabla else ''
+    return (
+        f'{ENCABEZADO_XML}<worksheet xmlns="{NS_MAIN}" xmlns:r="{NS_REL}">'
+        f'<dimension ref="{_rango(columnas, len(filas))}"/>'
+        f'<sheetData>{datos}</sheetData>{partes_tabla}</worksheet>'
+    )
+
+def _tabla_xml(id_tabla, nombre, encabezados, filas):
+    rango = _rango(len(encabezados), max(filas + 1, 2))
+    columnas = ''.join(
+        f'<tableColumn id="{j}" name={quoteattr(str(encabezado))}/>' for j, encabezado in enumerate(encabezados, start=1)
+    )
+    return (
+        f'{ENCABEZADO_XML}<table xmlns="{NS_MAIN}" id="{id_tabla}" name={quoteattr(nombre)} '
+        f'displayName={quoteattr(nombre)} ref="{rango}" totalsRowShown="0">'
+        f'<autoFilter ref="{rango}"/><tableColumns count="{len(encabezados)}">{columnas}</tableColumns>'
+        f'<tableStyleInfo name="{ESTILO_TABLA}" showFirstColumn="0" showLastColumn="0" '
+        f'showRowStripes="1" showColumnStripes="1"/></table>'
+    )
+
+def _calculo_al_abrir(workbook):
+    """Marca el libro para recalcular sus fórmulas al abrirlo (las de otras hojas pueden leer las reemplazadas)."""
+    calc = re.search(r'<(?:\w+:)?calcPr\b[^>]*?/?>', workbook)
+    if calc:
+        etiqueta = calc.group(0)
+        if 'fullCalcOnLoad=' in etiqueta:
+            nueva = re.sub(r'fullCalcOnLoad="[^"]*"', 'fullCalcOnLoad="1"', etiqueta)
+        else:
+            nueva = re.sub(r'\s*(/?>)$', r' fullCalcOnLoad="1"\1', etiqueta)
+        return workbook.replace(etiqueta, nueva, 1)
+    # calcPr va después de definedNames/externalReferences/sheets, antes del resto
+    siguiente = re.search(
+        r'<(?:\w+:)?(?:oleSize|customWorkbookViews|pivotCaches|smartTagPr|smartTagTypes|webPublishing'
+        r'|fileRecoveryPr|webPublishObjects|extLst)\b|</(?:\w+:)?workbook>', workbook)
+    prefijo = re.search(r'<((?:\w+:)?)sheets\b', workbook).group(1)
+    return workbook[:siguiente.start()] + f'<{prefijo}calcPr fullCalcOnLoad="1"/>' + workbook[siguiente.start():]
+
+def reemplazar_hojas(ruta, hojas):
+    """
+    Reemplaza el contenido de las hojas indicadas de un libro .xlsx.
+
+    Solo se generan las partes de esas hojas (y sus tablas); las demás hojas,
+    estilos y textos compartidos se copian sin interpretarlos. Las hojas
+    reemplazadas mantienen su posición. Como otras hojas pueden tener
+    fórmulas que lean las reemplazadas, el libro queda marcado para
+    recalcularse al abrirlo.
+
+    Args:
+        ruta: Libro a modificar (se reescribe de forma atómica)
+        hojas: Nombre de hoja -> ContenidoHoja
+    Raises:
+        KeyError: Si una hoja que conserva su encabezado no existe
+    """
+    with zipfile.ZipFile(ruta) as zin:
+        entradas = zin.infolist()
+        # Partes pequeñas que describen el paquete (las hojas no se leen salvo las que conservan encabezado)
+        textos = {
+            info.filename: zin.read(info).decode('utf-8') for info in entradas
+            if info.filename.endswith('.rels') or info.filename.startswith('xl/tables/')
+            or info.filename in ('[Content_Types].xml', 'xl/workbook.xml')
+        }
+
+        relaciones_libro = _relaciones(textos, 'xl/workbook.xml')
+        destinos = {id_rel: destino for id_rel, _, destino, _ in relaciones_libro}
+        workbook = textos['xl/workbook.xml']
+        prefijo_r = re.search(rf'xmlns:(\w+)="{re.escape(NS_REL)}"', workbook).group(1)
+        hojas_libro = {}
+        for etiqueta in _etiquetas(re.search(r'<(?:\w+:)?sheets\b.*?</(?:\w+:)?sheets>', workbook, re.S).group(0), 'sheet'):
+            atributos = _atributos(etiqueta)
+            hojas_libro[atributos['name']] = destinos[atributos[f'{prefijo_r}:id']]
+        for nombre, contenido in hojas.items():
+            if contenido.encabezados is None and nombre not in hojas_libro:
+                raise KeyError(f"Worksheet {nombre} does not exist.")
+
+        tipos = textos['[Content_Types].xml']
+        rels_libro = textos['xl/_rels/workbook.xml.rels']
+        nuevas_partes = {}
+        eliminadas = set()
+
+        # La cadena de cálculo puede citar celdas que ya no tienen fórmula: se descarta
+        for id_rel, tipo, destino, etiqueta in relaciones_libro:
+            if tipo == TIPO_CALC_CHAIN:
+                eliminadas.add(destino)
+                rels_libro = _quitar_etiquetas(rels_libro, [etiqueta])
+        workbook = _calculo_al_abrir(workbook)
+
+        ids_tabla = [int(m) for parte, xml in textos.items() if parte.startswith('xl/tables/')
+                     for m in re.findall(r'<(?:\w+:)?table\b[^>]*?\bid="(\d+)"', xml)]
+        siguiente_tabla = max(ids_tabla, default=0) + 1
+        numero_parte = len([e for e in entradas if e.filename.startswith('xl/tables/')]) + 1
+        ids_rel = [int(m) for m in re.findall(r'Id="rId(\d+)"', rels_libro)]
+        ids_hoja = [int(_atributos(e).get('sheetId', 0)) for e in _etiquetas(workbook, 'sheet')]
+
+        for nombre, contenido in hojas.items():
+            parte = hojas_libro.get(nombre)
+            if contenido.encabezados is None:
+                xml = zin.read(parte).decode('utf-8')
+                nuevas_partes[parte] = _hoja_con_encabezado_existente(xml, contenido.filas)
+                continue
+
+            if parte is None:
+                # Hoja nueva al final del libro
+                numero = 1
+                while f'xl/worksheets/sheet{numero}.xml' in zin.namelist() or f'xl/worksheets/sheet{numero}.xml' in nuevas_partes:
+                    numero += 1
+                parte = f'xl/worksheets/sheet{numero}.xml'
+                id_rel = f'rId{max(ids_rel, default=0) + 1}'
+                ids_rel.append(int(id_rel[3:]))
+                id_hoja = max(ids_hoja, default=0) + 1
+                ids_hoja.append(id_hoja)
+                rels_libro = _insertar_antes_de_cierre(
+                    rels_libro, 'Relationships',
+                    f'<Relationship Id="{id_rel}" Type="{TIPO_HOJA}" Target="/{parte}"/>'
+                )
+                prefijo = re.search(r'<((?:\w+:)?)sheets\b', workbook).group(1)
+                workbook = _insertar_antes_de_cierre(
+                    workbook, 'sheets',
+                    f'<{prefijo}sheet name={quoteattr(nombre)} sheetId="{id_hoja}" {prefijo_r}:id="{id_rel}"/>'
+                )
+                tipos = _insertar_antes_de_cierre(
+                    tipos, 'Types', f'<Override PartName="/{parte}" ContentType="{CT_HOJA}"/>'
+                )
+            else:
+                # La hoja anterior se descarta completa, con sus tablas
+                for _, tipo, destino, _ in _relaciones(textos, parte):
+                    if tipo == TIPO_TABLA:
+                        eliminadas.add(destino)
+                eliminadas.add(_ruta_rels(parte))
+
+            nuevas_partes[parte] = _hoja_nueva(contenido, contenido.tabla is not None)
+            if contenido.tabla is not None:
+                while f'xl/tables/table{numero_parte}.xml' in zin.namelist():
+                    numero_parte += 1
+                parte_tabla = f'xl/tables/table{numero_parte}.xml'
+                numero_parte += 1
+                nuevas_partes[parte_tabla] = _tabla_xml(
+                    siguiente_tabla, contenido.tabla, contenido.encabezados, len(contenido.filas)
+                )
+                siguiente_tabla += 1
+                nuevas_partes[_ruta_rels(parte)] = (
+                    f'{ENCABEZADO_XML}<Relationships xmlns="{NS_PAQUETE}">'
+                    f'<Relationship Id="rId1" Type="{TIPO_TABLA}" Target="/{parte_tabla}"/></Relationships>'
+                )
+                tipos = _insertar_antes_de_cierre(
+                    tipos, 'Types', f'<Override PartName="/{parte_tabla}" ContentType="{CT_TABLA}"/>'
+                )
+
+        eliminadas -= set(nuevas_partes)
+        tipos = _quitar_etiquetas(tipos, [
+            etiqueta for etiqueta in _etiquetas(tipos, 'Override')
+            if _atributos(etiqueta).get('PartName', '').lstrip('/') in eliminadas
+        ])
+        nuevas_partes.update({
+            '[Content_Types].xml': tipos,
+            'xl/workbook.xml': workbook,
+            'xl/_rels/workbook.xml.rels': rels_libro,
+        })
+
+        temporal = ruta + '.tmp'
+        try:
+            with zipfile.ZipFile(temporal, 'w', zipfile.ZIP_DEFLATED) as zout:
+                escritas = set()
+                for info in entradas:
+                    if info.filename in eliminadas:
+                        continue
+                    if info.filename in nuevas_partes:
+                        zout.writestr(info.filename, nuevas_partes[info.filename])
+                    else:
+                        zout.writestr(info, zin.read(info))
+                    escritas.add(info.filename)
+                for parte, xml in nuevas_partes.items():
+                    if parte not in escritas:
+                        zout.writestr(parte, xml)
+        except BaseException:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+    os.replace(temporal, ruta)
+    return ruta
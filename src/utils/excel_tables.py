@@ -0,0 +1,114 @@
+"""
+Exportación de DataFrames a Excel como tabla con estilo.
+
+Usa xlsxwriter: cada columna se convierte una vez por tramo de filas y se
+escribe con la función de su tipo, por lo que el costo es lineal en la
+cantidad de celdas. Las columnas se direccionan por índice, sin límite de la
+columna Z.
+"""
+import re
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+MAX_FILAS_EXCEL = 1_048_576
+FILAS_POR_TRAMO = 20_000
+ESTILO_TABLA = 'Table Style Medium 9'
+FORMATO_FECHA = 'dd/mm/yyyy'
+FORMATO_FECHA_HORA = 'dd/mm/yyyy hh:mm:ss'
+_EPOCA_EXCEL = np.datetime64('1899-12-30', 'ns')
+
+def table_name(nombre):
+    """Nombre válido para una tabla de Excel (letras, números, _ y .; sin empezar con número)."""
+    nombre = re.sub(r'[^0-9A-Za-z_.]', '_', str(nombre))
+    return nombre if re.match(r'[A-Za-z_]', nombre) else f"_{nombre}"
+
+def _fechas_excel(serie: pd.Series):
+    """Fechas como número de serie de Excel (días desde 1899-12-30), None si vacía."""
+    if getattr(serie.dt, 'tz', None) is not None:
+        serie = serie.dt.tz_localize(None)
+    fechas = serie.to_numpy(dtype='datetime64[ns]')
+    dias = (fechas - _EPOCA_EXCEL).astype(np.int64) / 86_400e9
+    return np.where(np.isnat(fechas), None, dias)
+
+def _numeros(serie: pd.Series):
+    numeros = serie.to_numpy(dtype=float, na_value=np.nan)
+    return np.where(np.isfinite(numeros), numeros, None)
+
+def _objetos(serie: pd.Series):
+    return serie.astype(object).where(serie.notna(), None).to_numpy()
+
+def _columna(hoja, formatos, serie: pd.Series):
+    """(conversión de un tramo de la columna a valores con None para vacíos, función de escritura, formato)."""
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        dias = _fechas_excel(serie)
+        con_hora = any(d % 1 != 0 for d in dias if d is not None)
+        return _fechas_excel, hoja.write_number, formatos[FORMATO_FECHA_HORA if con_hora else FORMATO_FECHA]
+    if pd.api.types.is_bool_dtype(serie):
+        return _objetos, hoja.write_boolean, None
+    if pd.api.types.is_numeric_dtype(serie):
+        return _numeros, hoja.write_number, None
+    if pd.api.types.infer_dtype(serie, skipna=True) in ('string', 'empty'):
+        return _objetos, hoja.write_string, None
+    return _objetos, hoja.write, None
+
+def _agregar_tabla(hoja, filas, encabezados, nombre, estilo):
+    """
+    Declara la tabla sobre el encabezado y todas las filas de datos. add_table
+    solo escribe los encabezados; los valores se escriben después, con la
+    función de escritura de cada columna.
+    """
+    hoja.add_table(0, 0, max(filas, 1), len(encabezados) - 1, {
+        'name': nombre,
+        'style': estilo,
+        'banded_columns': True,
+        'columns': [{'header': encabezado} for encabezado in encabezados],
+    })
+
+def write_excel_table(ruta, df: pd.DataFrame, nombre_tabla, hoja=None, estilo=ESTILO_TABLA):
+    """
+    Escribe el DataFrame en `ruta` como una tabla de Excel con estilo.
+
+    Args:
+        nombre_tabla: Nombre de la tabla (se ajusta a los caracteres permitidos)
+        hoja: Nombre de la hoja (por defecto, el de la tabla)
+    Returns:
+        Ruta del archivo escrito
+    """
+    if len(df) >= MAX_FILAS_EXCEL:
+        raise ValueError(f"{len(df):,d} filas superan el máximo de una hoja de Excel")
+    nombre = table_name(nombre_tabla)
+    encabezados = [str(columna) for columna in df.columns]
+
+    libro = xlsxwriter.Workbook(ruta, {
+        # Los textos se guardan tal cual (sin convertir '=...' en fórmulas ni URLs en enlaces)
+        'strings_to_formulas': False,
+        'strings_to_urls': False,
+        'default_date_format': FORMATO_FECHA,
+    })
+    try:
+        hoja_excel = libro.add_worksheet((hoja or nombre)[:31])
+        formatos = {
+            FORMATO_FECHA: libro.add_format({'num_format': FORMATO_FECHA}),
+            FORMATO_FECHA_HORA: libro.add_format({'num_format': FORMATO_FECHA_HORA}),
+        }
+        columnas = [_columna(hoja_excel, formatos, df.iloc[:, j]) for j in range(df.shape[1])]
+        for j, (_, _, formato) in enumerate(columnas):
+            if formato is not None:
+                hoja_excel.set_column(j, j, 19 if formato is formatos[FORMATO_FECHA_HORA] else 12)
+
+        if encabezados:
+            _agregar_tabla(hoja_excel, len(df), encabezados, nombre, estilo)
+
+        # Los valores se convierten por tramos para no duplicar la hoja completa en memoria
+        for inicio in range(0, len(df), FILAS_POR_TRAMO):
+            tramo = df.iloc[inicio:inicio + FILAS_POR_TRAMO]
+            valores = [convertir(tramo.iloc[:, j]).tolist() for j, (convertir, _, _) in enumerate(columnas)]
+            for fila in range(len(tramo)):
+                for j, (_, escribir, formato) in enumerate(columnas):
+                    valor = valores[j][fila]
+                    if valor is not None:
+                        escribir(inicio + fila + 1, j, valor, formato)
+    finally:
+        libro.close()
+    return ruta
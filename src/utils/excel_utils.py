@@ -1,7 +1,11 @@
+import time
 import pandas as pd
+import streamlit as st
+from collections import OrderedDict
 from io import BytesIO
 from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
+from src.utils.cache import data_version
 
 def format_excel_table(writer, df, sheet_name, title=None):
     """
@@ -74,4 +78,139 @@ def create_excel_download(df, filename, sheet_name="Reporte", title=None):
     with pd.ExcelWriter(output, engine='openpyxl') as writer:
         format_excel_table(writer, df, sheet_name, title)
     output.seek(0)
-    return output 
\ No newline at end of file
+    return output
+
+# Cantidad de archivos generados que se conservan por sesión
+EXPORT_CACHE_SIZE = 8
+
+def _export_state():
+    """
+    Caché de archivos y métricas de exportación de la sesión. Se guardan como
+    dicts planos porque la generación diferida corre en otro hilo, sin acceso
+    a st.session_state.
+    """
+    if '_excel_exports' not in st.session_state:
+        st.session_state['_excel_exports'] = {
+            'archivos': OrderedDict(),
+            'metricas': {
+                'registradas': 0,          # Botones de descarga renderizados
+                'generadas': 0,            # Archivos construidos al pedir la descarga
+                'reutilizadas': 0,         # Descargas servidas desde la caché
+                'segundos_generacion': 0.0,
+                'bytes_generados': 0,
+                'celdas_generadas': 0,
+            },
+            'rerun': {'diferidas': 0, 'segundos_ahorrados': 0.0, 'bytes_ahorrados': 0},
+        }
+    return st.session_state['_excel_exports']
+
+def begin_export_rerun():
+    """Reinicia las métricas de ahorro del rerun actual (llamar al inicio del script)."""
+    _export_state()['rerun'] = {'diferidas': 0, 'segundos_ahorrados': 0.0, 'bytes_ahorrados': 0}
+
+def export_stats():
+    """Métricas acumuladas de exportación y el ahorro estimado del último rerun."""
+    estado = _export_state()
+    return {**estado['metricas'], 'rerun': dict(estado['rerun'])}
+
+def huella_datos(df):
+    """Huella del contenido de un DataFrame; None si no se puede calcular."""
+    try:
+        return int(pd.util.hash_pandas_object(df, index=True).sum())
+    except Exception:
+        return None
+
+def deferred_download(builder, key, celdas=0, huella=None):
+    """
+    Retorna un callable para `st.download_button(data=...)` que construye el
+    archivo solo cuando el usuario pide la descarga y cachea los bytes por `key`.
+
+    Cada registro cuenta como una generación evitada en el rerun: el tiempo y la
+    memoria ahorrados se toman de la generación previa de la misma clave o, si
+    no existe, se estiman con el costo medio por celda de las generaciones
+    medidas en la sesión.
+
+    Args:
+        builder: Función sin argumentos que retorna los bytes del archivo
+        key: Clave de caché (versión de datos, filtros, formato...)
+        celdas: Tamaño de la tabla exportada, usado para estimar el ahorro
+        huella: Función opcional que valida, al momento de la descarga, que el
+            contenido cacheado corresponde a los datos actuales
+    """
+    estado = _export_state()
+    archivos, metricas, rerun = estado['archivos'], estado['metricas'], estado['rerun']
+
+    metricas['registradas'] += 1
+    rerun['diferidas'] += 1
+    if key in archivos:
+        _, _, segundos, tamano = archivos[key]
+        rerun['segundos_ahorrados'] += segundos
+        rerun['bytes_ahorrados'] += tamano
+    elif metricas['celdas_generadas']:
+        rerun['segundos_ahorrados'] += celdas * metricas['segundos_generacion'] / metricas['celdas_generadas']
+        rerun['bytes_ahorrados'] += int(celdas * metricas['bytes_generados'] / metricas['celdas_generadas'])
+
+    def generar():
+        actual = huella() if huella else None
+        if key in archivos and archivos[key][0] == actual:
+            metricas['reutilizadas'] += 1
+            archivos.move_to_end(key)
+            return archivos[key][1]
+        inicio = time.perf_counter()
+        contenido = builder()
+        if isinstance(contenido, BytesIO):
+            contenido = contenido.getvalue()
+        segundos = time.perf_counter() - inicio
+        archivos[key] = (actual, contenido, segundos, len(contenido))
+        while len(archivos) > EXPORT_CACHE_SIZE:
+            archivos.popitem(last=False)
+        metricas['generadas'] += 1
+        metricas['segundos_generacion'] += segundos
+        metricas['bytes_generados'] += len(contenido)
+        metricas['celdas_generadas'] += celdas
+        return contenido
+
+    return generar
+
+def _excel_simple(df, sheet_name):
+    """Excel sin formato (sin índice) escrito con xlsxwriter."""
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        df.to_excel(writer, index=False, sheet_name=sheet_name)
+    return output.getvalue()
+
+def deferred_excel_download(df, filename, sheet_name="Reporte", title=None, spec=None, formato='formateado',
+                            preparar=None):
+    """
+    Versión diferida de create_excel_download: el archivo se construye al hacer
+    clic en el botón de descarga y se reutiliza mientras no cambien los datos,
+    los filtros (`spec`) ni el formato.
+
+    Args:
+        df: DataFrame a exportar
+        filename: Nombre del archivo
+        sheet_name: Nombre de la hoja
+        title: Título opcional para la tabla
+        spec: Descripción hashable de los filtros que produjeron `df`
+        formato: 'formateado' (openpyxl con estilos), 'simple' (xlsxwriter) o 'csv'
+        preparar: Transformación opcional de `df` (ej. formatear fechas) que
+            también se difiere hasta la descarga
+
+    Returns:
+        Callable para el parámetro `data` de st.download_button
+    """
+    if formato not in ('formateado', 'simple', 'csv'):
+        raise ValueError(f"Formato de exportación no soportado: {formato}")
+
+    def builder():
+        datos = preparar(df) if preparar else df
+        if formato == 'formateado':
+            return create_excel_download(datos, filename, sheet_name, title)
+        if formato == 'simple':
+            return _excel_simple(datos, sheet_name)
+        return datos.to_csv(index=False).encode('utf-8')
+
+    key = (data_version(df), spec, formato, filename, sheet_name, title)
+    # La clave usa la versión barata del DataFrame; la huella del contenido solo
+    # se calcula al descargar, para no reutilizar un archivo de otros datos
+    return deferred_download(builder, key, celdas=df.size, huella=lambda: huella_datos(df))
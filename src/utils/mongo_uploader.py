@@ -7,6 +7,7 @@ import numpy as np
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from pymongo.operations import InsertOne
 import time
+from src.utils.parquet_store import existe_tabla, leer_tabla
 
 class MongoUploader:
     def __init__(self, mongo_uri=None):
@@ -91,9 +92,7 @@ class MongoUploader:
         for column in df.columns:
             if pd.api.types.is_datetime64_any_dtype(df[column]):
                 # Para columnas ya en formato datetime
-                df[column] = df[column].apply(
-                    lambda x: x.strftime('%d/%m/%Y') if pd.notnull(x) else None
-                )
+                df[column] = df[column].dt.strftime('%d/%m/%Y').astype(object).where(df[column].notna(), None)
             elif isinstance(df[column].dtype, pd.StringDtype) or df[column].dtype == object:
                 # Para columnas que podrían contener fechas como strings
                 if df[column].notna().any():
@@ -121,7 +120,7 @@ class MongoUploader:
 
     def upload_file(self, file_path, collection_name):
         """
-        Sube un archivo Excel a MongoDB de manera optimizada para instancias serverless.
+        Sube un consolidado (Parquet o Excel) a MongoDB de manera optimizada para instancias serverless.
         """
         self.ensure_connection()
         max_retries = 3
@@ -131,8 +130,8 @@ class MongoUploader:
             try:
                 print(f"\nProcesando {os.path.basename(file_path)}...")
                 
-                # Leer el archivo Excel
-                df = pd.read_excel(file_path)
+                # Leer el consolidado (Parquet tipado; Excel como respaldo)
+                df = leer_tabla(file_path)
                 total_records = len(df)
                 print(f"Registros totales a procesar: {total_records}")
 
@@ -197,7 +196,7 @@ class MongoUploader:
                 # Verificar integridad al final
                 final_count = collection.count_documents({})
                 if final_count != total_records:
-                    print(f"⚠️ Advertencia: {final_count} registros en DB vs {total_records} en Excel")
+                    print(f"⚠️ Advertencia: {final_count} registros en DB vs {total_records} en el archivo")
                 else:
                     print(f"\n✅ Datos actualizados en {collection_name}")
                     print(f"✅ Total registros: {final_count}")
@@ -222,11 +221,16 @@ class MongoUploader:
             descargas_dir = "descargas"  # Carpeta relativa
             
             # Definir rutas relativas para cada archivo
+            cruces = {
+                'consolidado_ccm': os.path.join(descargas_dir, "CCM", "Consolidado_CCM_CRUZADO"),
+                'consolidado_prr': os.path.join(descargas_dir, "PRR", "Consolidado_PRR_CRUZADO"),
+                'consolidado_ccm_esp': os.path.join(descargas_dir, "CCM-ESP", "Consolidado_CCM-ESP_CRUZADO"),
+                'consolidado_sol': os.path.join(descargas_dir, "SOL", "Consolidado_SOL_CRUZADO")
+            }
+            # Parquet generado por cruces.py; el Excel solo si no hay Parquet
             archivos_a_subir = {
-                'consolidado_ccm': os.path.join(descargas_dir, "CCM", "Consolidado_CCM_CRUZADO.xlsx"),
-                'consolidado_prr': os.path.join(descargas_dir, "PRR", "Consolidado_PRR_CRUZADO.xlsx"),
-                'consolidado_ccm_esp': os.path.join(descargas_dir, "CCM-ESP", "Consolidado_CCM-ESP_CRUZADO.xlsx"),
-                'consolidado_sol': os.path.join(descargas_dir, "SOL", "Consolidado_SOL_CRUZADO.xlsx")
+                collection_name: existe_tabla(f"{base}.parquet", f"{base}.xlsx") or f"{base}.parquet"
+                for collection_name, base in cruces.items()
             }
             
             # Mostrar estado actual y permitir selección
@@ -0,0 +1,139 @@
+import hashlib
+import math
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+PAGE_SIZES = [25, 50, 100, 250]
+
+def _huella(serie: pd.Series) -> str:
+    """Hash del contenido de la columna en su orden (sin el índice)."""
+    try:
+        hashes = pd.util.hash_pandas_object(serie, index=False)
+    except TypeError:
+        # Valores no hashables (listas, diccionarios): usar su representación de texto
+        hashes = pd.util.hash_pandas_object(serie.astype(str), index=False)
+    return hashlib.blake2b(hashes.to_numpy().tobytes(), digest_size=16).hexdigest()
+
+def _orden_filas(df: pd.DataFrame, columna, ascendente: bool, key: str) -> np.ndarray:
+    """
+    Posiciones de las filas ordenadas por `columna`. Solo se ordena esa columna
+    (no el DataFrame completo) y el resultado se conserva en session_state para
+    que cambiar de página no vuelva a ordenar.
+
+    La versión se toma del contenido de la columna (no de data_version): las
+    tablas filtradas se reconstruyen en cada rerun y un id() liberado se
+    reutiliza enseguida, por lo que otro filtro de igual forma tomaría el
+    orden anterior.
+    """
+    if columna is None:
+        return None
+    cache_key = f"_orden_{key}"
+    version = (_huella(df[columna]), len(df), columna, ascendente)
+    entry = st.session_state.get(cache_key)
+    if entry is None or entry[0] != version:
+        serie = df[columna].reset_index(drop=True)
+        try:
+            orden = serie.sort_values(ascending=ascendente, na_position='last', kind='stable').index.to_numpy()
+        except TypeError:
+            # Columnas con tipos mezclados: ordenar por su representación de texto
+            orden = serie.astype(str).sort_values(ascending=ascendente, kind='stable').index.to_numpy()
+        entry = (version, orden)
+        st.session_state[cache_key] = entry
+    return entry[1]
+
+def _formatear_pagina(pagina: pd.DataFrame, date_format: str) -> pd.DataFrame:
+    """Formatea las fechas solo de las filas visibles."""
+    if not date_format:
+        return pagina
+    pagina = pagina.copy()
+    for col in pagina.select_dtypes(include=['datetime64', 'datetimetz']).columns:
+        pagina[col] = pagina[col].dt.strftime(date_format)
+    return pagina
+
+def render_paginated_table(df: pd.DataFrame, key: str, column_config=None, default_columns=None,
+                           page_size: int = 50, date_format: str = '%d/%m/%Y', hide_index=True):
+    """
+    Muestra un DataFrame paginado en el servidor.
+
+    Solo la página visible (y las columnas elegidas) se formatea y se envía al
+    navegador, por lo que el costo no depende del tamaño del resultado filtrado.
+    Permite ordenar por una columna y elegir qué columnas mostrar.
+
+    Args:
+        df: DataFrame completo a mostrar (no se modifica)
+        key: Prefijo único para los widgets de la tabla
+        column_config: Configuración de columnas de st.dataframe
+        default_columns: Columnas visibles por defecto (todas si es None)
+        page_size: Filas por página inicial
+        date_format: Formato aplicado a las columnas de fecha de la página
+            (None para dejarlas nativas, ej. con st.column_config.DateColumn)
+        hide_index: Ocultar el índice del DataFrame
+    """
+    total = len(df)
+    if total == 0:
+        st.info("No hay filas para mostrar")
+        return
+
+    columnas_disponibles = list(df.columns)
+    with st.expander("⚙️ Opciones de la tabla"):
+        col1, col2, col3 = st.columns([3, 2, 1])
+        with col1:
+            columnas = st.multiselect(
+                "Columnas visibles",
+                options=columnas_disponibles,
+                default=default_columns or columnas_disponibles,
+                key=f"{key}_columnas"
+            )
+        with col2:
+            columna_orden = st.selectbox(
+                "Ordenar por",
+                options=[None] + columnas_disponibles,
+                format_func=lambda c: "Orden original" if c is None else str(c),
+                key=f"{key}_orden"
+            )
+        with col3:
+            ascendente = st.radio(
+                "Sentido",
+                options=[True, False],
+                format_func=lambda a: "Asc" if a else "Desc",
+                key=f"{key}_sentido"
+            )
+    columnas = columnas or columnas_disponibles
+
+    col1, col2, col3 = st.columns([1, 1, 2])
+    with col1:
+        filas_por_pagina = st.selectbox(
+            "Filas por página",
+            options=PAGE_SIZES,
+            index=PAGE_SIZES.index(page_size) if page_size in PAGE_SIZES else 1,
+            key=f"{key}_page_size"
+        )
+    total_paginas = max(1, math.ceil(total / filas_por_pagina))
+    # Si el resultado se redujo (nuevos filtros), volver a una página válida
+    if st.session_state.get(f"{key}_pagina", 1) > total_paginas:
+        st.session_state[f"{key}_pagina"] = total_paginas
+    with col2:
+        pagina = st.number_input(
+            "Página",
+            min_value=1,
+            max_value=total_paginas,
+            step=1,
+            key=f"{key}_pagina"
+        )
+
+    inicio = (int(pagina) - 1) * filas_por_pagina
+    fin = min(inicio + filas_por_pagina, total)
+    orden = _orden_filas(df, columna_orden, ascendente, key)
+    posiciones = np.arange(inicio, fin) if orden is None else orden[inicio:fin]
+    indices_columnas = [df.columns.get_loc(c) for c in columnas]
+
+    with col3:
+        st.caption(f"Mostrando filas {inicio + 1:,d}–{fin:,d} de {total:,d} (página {int(pagina)} de {total_paginas})")
+
+    st.dataframe(
+        _formatear_pagina(df.iloc[posiciones, indices_columnas], date_format),
+        use_container_width=True,
+        column_config=column_config,
+        hide_index=hide_index
+    )
@@ -0,0 +1,99 @@
+"""
+Lectura y escritura de los artefactos intermedios del ETL en Parquet.
+
+Cada paso (descarga → gestionar_consolidados → cruces → MongoDB / dashboard)
+deja su resultado en Parquet con tipos (fechas datetime64, números), de modo
+que el siguiente paso lo lee sin volver a interpretar texto. El Excel queda
+solo como exportación para revisión humana (EXPORTAR_EXCEL).
+"""
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from src.services.spe_dataset import parse_dates_unique
+
+# Exportar además a Excel los artefactos del ETL (variable de entorno EXPORTAR_EXCEL=1)
+EXPORTAR_EXCEL = os.getenv('EXPORTAR_EXCEL', '0') == '1'
+
+def ruta_parquet(ruta):
+    """Ruta Parquet equivalente a la de un artefacto (ej. Consolidado_CCM.xlsx → .parquet)."""
+    return os.path.splitext(ruta)[0] + '.parquet'
+
+def _columna_arrow(serie: pd.Series):
+    """Arreglo Arrow de la columna; las columnas con tipos mezclados se guardan como texto."""
+    try:
+        return pa.array(serie, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        texto = serie.astype(object).where(serie.notna(), None)
+        return pa.array([None if v is None else str(v) for v in texto], type=pa.string())
+
+def guardar_parquet(df: pd.DataFrame, ruta):
+    """
+    Guarda el DataFrame en Parquet de forma atómica (archivo temporal + rename).
+
+    Returns:
+        Ruta del archivo escrito
+    """
+    tabla = pa.Table.from_arrays(
+        [_columna_arrow(df[columna]) for columna in df.columns],
+        names=[str(columna) for columna in df.columns]
+    )
+    temporal = ruta + '.tmp'
+    pq.write_table(tabla, temporal)
+    os.replace(temporal, ruta)
+    return ruta
+
+def existe_tabla(*rutas):
+    """Primera ruta existente entre las candidatas, o None."""
+    return next((ruta for ruta in rutas if ruta and os.path.exists(ruta)), None)
+
+def leer_tabla(*rutas, columns=None) -> pd.DataFrame:
+    """
+    Lee el primer artefacto existente entre las rutas candidatas.
+
+    Acepta archivos .parquet, carpetas con un dataset Parquet particionado
+    (la columna de partición `anio` se descarta) y, como respaldo, .xlsx.
+
+    Raises:
+        FileNotFoundError: Si no existe ninguna de las rutas
+    """
+    ruta = existe_tabla(*rutas)
+    if ruta is None:
+        raise FileNotFoundError(f"No se encontró ninguno de: {', '.join(map(str, rutas))}")
+    if os.path.isdir(ruta):
+        tabla = pq.read_table(ruta, columns=columns, partitioning='hive')
+        if 'anio' in tabla.column_names and (columns is None or 'anio' not in columns):
+            tabla = tabla.drop_columns(['anio'])
+        return tabla.to_pandas()
+    if ruta.endswith('.parquet'):
+        return pd.read_parquet(ruta, columns=columns)
+    return pd.read_excel(ruta, usecols=columns)
+
+def tipar_columnas(df: pd.DataFrame, columnas_fecha=(), dayfirst=True) -> pd.DataFrame:
+    """
+    Asigna tipos a un DataFrame leído como texto.
+
+    Las columnas de fecha se parsean (una vez por valor distinto) y se
+    truncan al día. El resto de columnas de texto pasa a numérico cuando todos
+    sus valores son números, como haría pd.read_csv al inferir tipos.
+    """
+    df = df.copy()
+    for columna in df.columns:
+        serie = df[columna]
+        if columna in columnas_fecha:
+            df[columna] = parse_dates_unique(serie, dayfirst=dayfirst).dt.normalize()
+            continue
+        if not (serie.dtype == object or isinstance(serie.dtype, pd.StringDtype)):
+            continue
+        codigos, unicos = pd.factorize(serie, use_na_sentinel=True)
+        if len(unicos) == 0:
+            continue
+        numeros = pd.to_numeric(pd.Series(np.asarray(unicos, dtype=object)), errors='coerce')
+        if numeros.isna().any():
+            continue
+        valores = numeros.to_numpy()
+        if (codigos < 0).any():
+            valores = np.append(valores.astype(float), np.nan)
+        df[columna] = pd.Series(valores[codigos], index=df.index, name=columna)
+    return df
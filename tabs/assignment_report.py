@@ -1,7 +1,11 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 
+# Ventana de asignaciones por defecto (días)
+DEFAULT_ASSIGNMENT_DAYS = 15
+
 def render_assignment_report_tab(data: pd.DataFrame):
     try:
         st.header("📋 Reporte de Asignaciones")
@@ -11,49 +15,62 @@ def render_assignment_report_tab(data: pd.DataFrame):
             st.error("No hay datos disponibles para mostrar")
             return
 
-        # Asegurar que no hay valores None en las columnas críticas
-        data['EVALASIGN'] = data['EVALASIGN'].fillna('')
-        data['FechaExpendiente'] = pd.to_datetime(data['FechaExpendiente'], errors='coerce')
-        
-        # Información de asignaciones de los últimos 15 días
+        # Información de asignaciones de los últimos N días
         st.subheader("📊 Porcentaje de Expedientes Asignados y Sin Asignar por Día")
+        dias = st.number_input(
+            "Días a analizar",
+            min_value=1,
+            value=DEFAULT_ASSIGNMENT_DAYS,
+            step=1,
+            help="Cantidad de días hacia atrás que se incluyen en el reporte"
+        )
         
         # Procesar y mostrar datos de asignación
-        assignment_data = process_assignment_data(data)
+        assignment_data = process_assignment_data(data, dias=int(dias))
         display_assignment_data(assignment_data)
         
         # Mostrar gráfico de barras apiladas
-        display_stacked_bar_chart(assignment_data)
+        display_stacked_bar_chart(assignment_data, dias=int(dias))
 
     except Exception as e:
         st.error(f"Error al procesar el reporte de asignaciones: {str(e)}")
         print(f"Error detallado: {str(e)}")
 
-def process_assignment_data(data):
-    """Procesar datos de asignación de los últimos 15 días."""
+def process_assignment_data(data, dias=DEFAULT_ASSIGNMENT_DAYS):
+    """
+    Procesar datos de asignación de los últimos `dias` días.
+
+    Agrega en una sola pasada: cada fecha se codifica una vez y los totales y
+    asignados por fecha se cuentan con bincount, sin filtrar grupo por grupo.
+    """
     try:
-        # Filtrar datos recientes
-        last_15_days = pd.Timestamp.now() - pd.DateOffset(days=15)
-        recent_data = data[data['FechaExpendiente'] >= last_15_days]
-
-        # Agrupar y calcular métricas
-        assignment_data = recent_data.groupby('FechaExpendiente').apply(
-            lambda x: pd.Series({
-                'TotalExpedientes': len(x),
-                'CantidadAsignados': len(x[x['EVALASIGN'] != '']),
-                'CantidadSinAsignar': len(x[x['EVALASIGN'] == ''])
-            })
-        ).reset_index()
+        fechas = data['FechaExpendiente']
+        if not pd.api.types.is_datetime64_any_dtype(fechas):
+            fechas = pd.to_datetime(fechas, errors='coerce')
+        desde = pd.Timestamp.now() - pd.DateOffset(days=dias)
+        posiciones = np.flatnonzero((fechas >= desde).to_numpy())
+
+        # Los evaluadores nulos o vacíos cuentan como sin asignar
+        evaluadores = data['EVALASIGN'].iloc[posiciones]
+        asignado = (evaluadores.notna() & (evaluadores != '')).to_numpy(dtype=bool)
+
+        codigos, fechas_unicas = pd.factorize(fechas.iloc[posiciones].to_numpy(), sort=True)
+        total = np.bincount(codigos, minlength=len(fechas_unicas))
+        asignados = np.bincount(codigos, weights=asignado, minlength=len(fechas_unicas)).astype(np.int64)
+
+        assignment_data = pd.DataFrame({
+            'FechaExpendiente': pd.DatetimeIndex(fechas_unicas).strftime('%d/%m/%Y'),
+            'TotalExpedientes': total,
+            'CantidadAsignados': asignados,
+            'CantidadSinAsignar': total - asignados
+        })
 
         # Calcular porcentajes
-        assignment_data['% Sin Asignar'] = assignment_data.apply(
-            lambda row: f"{(row['CantidadSinAsignar'] / row['TotalExpedientes'] * 100):.2f}%" 
-            if row['TotalExpedientes'] > 0 else "0.00%",
-            axis=1
+        porcentaje = np.divide(
+            assignment_data['CantidadSinAsignar'] * 100, total,
+            out=np.zeros(len(total)), where=total > 0
         )
-
-        # Formatear fechas
-        assignment_data['FechaExpendiente'] = assignment_data['FechaExpendiente'].dt.strftime('%d/%m/%Y')
+        assignment_data['% Sin Asignar'] = pd.Series(porcentaje).map('{:.2f}%'.format)
 
         return assignment_data
 
@@ -87,7 +104,7 @@ def display_assignment_data(assignment_data):
     except Exception as e:
         st.error(f"Error al mostrar datos de asignación: {str(e)}")
 
-def display_stacked_bar_chart(assignment_data):
+def display_stacked_bar_chart(assignment_data, dias=DEFAULT_ASSIGNMENT_DAYS):
     """Mostrar gráfico de barras apiladas de asignaciones."""
     try:
         if not assignment_data.empty:
@@ -95,7 +112,7 @@ def display_stacked_bar_chart(assignment_data):
                 assignment_data,
                 x='FechaExpendiente',
                 y=['CantidadAsignados', 'CantidadSinAsignar'],
-                title="Distribución de Expedientes Asignados y Sin Asignar (Últimos 15 Días)",
+                title=f"Distribución de Expedientes Asignados y Sin Asignar (Últimos {dias} Días)",
                 labels={
                     'value': 'Cantidad de Expedientes',
                     'FechaExpendiente': 'Fecha',
@@ -3,7 +3,9 @@ import pandas as pd
 import plotly.express as px
 from io import BytesIO
 import numpy as np
-from src.utils.excel_utils import create_excel_download
+from src.utils.excel_utils import deferred_excel_download
+from src.utils.cache import session_cached
+from src.services.closing_analytics import ClosingAnalytics
 
 def render_closing_analysis_tab(data: pd.DataFrame):
     try:
@@ -17,6 +19,9 @@ def render_closing_analysis_tab(data: pd.DataFrame):
             st.error(f"Faltan las siguientes columnas necesarias: {', '.join(missing_columns)}")
             return
 
+        # Conservar la referencia al DataFrame de sesión para cachear el motor
+        data_original = data
+
         # Asegurar que las fechas son válidas
         data['FechaPre'] = pd.to_datetime(data['FechaPre'], errors='coerce')
         data['FechaExpendiente'] = pd.to_datetime(data['FechaExpendiente'], errors='coerce')
@@ -82,6 +87,7 @@ def render_closing_analysis_tab(data: pd.DataFrame):
         st.subheader("📅 Matriz de Cierre por Período")
         
         range_options = {
+            "Últimos 7 días": 7,
             "Últimos 15 días": 15,
             "Últimos 30 días": 30,
             "Durante el último mes": "month"
@@ -93,87 +99,29 @@ def render_closing_analysis_tab(data: pd.DataFrame):
             horizontal=True
         )
 
-        # Determinar el rango de fechas basado en la selección
-        if selected_range == "Durante el último mes":
-            date_threshold = pd.Timestamp.now().replace(day=1)
-        else:
-            days = range_options[selected_range]
-            date_threshold = pd.Timestamp.now() - pd.DateOffset(days=days)
-
-        cierre_data_range = data[data['FechaPre'] >= date_threshold].copy()
-
-        # Calcular 'TiempoCierre'
-        cierre_data_range['TiempoCierre'] = (cierre_data_range['FechaPre'] - cierre_data_range['FechaExpendiente']).dt.days
-
-        # Agrupar por evaluador y fecha de cierre
-        cierre_matrix = cierre_data_range.groupby(['EVALASIGN', cierre_data_range['FechaPre'].dt.date]).size().unstack(fill_value=0)
-
-        # Limitar las columnas de la matriz a las fechas seleccionadas
-        cierre_matrix = cierre_matrix.loc[:, cierre_matrix.columns]
-
-        # Renombrar las columnas de fecha a formato dd/mm
-        cierre_matrix.columns = [col.strftime('%d/%m') for col in cierre_matrix.columns]
-
-        # Calcular tendencia (aumenta, disminuye, mantiene), ignorando ceros
-        tendencias = {}
-        for evaluador in cierre_matrix.index:
-            series = cierre_matrix.loc[evaluador]
-            # Filtrar valores diferentes de cero
-            series_nonzero = series[series > 0]
-            if series_nonzero.diff().sum() > 0:
-                tendencia = "⬆️"
-            elif series_nonzero.diff().sum() < 0:
-                tendencia = "⬇️"
-            else:
-                tendencia = "➡️"
-            tendencias[evaluador] = tendencia
-
-        # Agregar la tendencia al final de la matriz
-        cierre_matrix['Tendencia'] = cierre_matrix.index.map(tendencias)
-
-        # Calcular el promedio dinámico de cierre por evaluador
-        def calcular_promedio_dias_validos(cierre_data):
-            # Contar cierres por día
-            cierres_por_dia = cierre_data.groupby(['EVALASIGN', 'FechaPre']).size().reset_index(name='Cierres')
-
-            # Agregar columna del día de la semana
-            cierres_por_dia['DiaSemana'] = cierres_por_dia['FechaPre'].dt.dayofweek  # 0 = Lunes, 6 = Domingo
-
-            # Filtrar días válidos
-            cierres_por_dia['Valido'] = (
-                (cierres_por_dia['DiaSemana'].between(0, 4)) |  # Lunes a Viernes
-                ((cierres_por_dia['DiaSemana'] == 5) & (cierres_por_dia['Cierres'] > 10)) |  # Sábados con > 10 cierres
-                ((cierres_por_dia['DiaSemana'] == 6) & (cierres_por_dia['Cierres'] > 10))    # Domingos con > 10 cierres
-            )
-
-            # Filtrar solo días válidos
-            dias_validos = cierres_por_dia[cierres_por_dia['Valido'] & (cierres_por_dia['Cierres'] > 0)]
-
-            # Calcular promedio dinámico por evaluador
-            promedio_por_evaluador = dias_validos.groupby('EVALASIGN').apply(
-                lambda x: x['Cierres'].sum() / x['FechaPre'].nunique()
-            ).reset_index(name='PromedioDíasCierre')
-
-            return promedio_por_evaluador
+        # Todos los períodos se sirven desde la misma matriz precalculada
+        periodo = range_options[selected_range]
+        motor = session_cached(
+            "closing_analytics",
+            data_original,
+            ClosingAnalytics,
+            extra=pd.Timestamp.now().date()
+        )
 
-        tiempo_promedio_por_evaluador = calcular_promedio_dias_validos(cierre_data_range)
+        cierre_data_range = motor.filas(periodo)
+        cierre_matrix = motor.matriz(periodo)
+        tiempo_promedio_por_evaluador = motor.promedio_dias_validos(periodo)
 
         # Mostrar el tiempo promedio general
         tiempo_promedio_general = tiempo_promedio_por_evaluador['PromedioDíasCierre'].mean()
         st.metric(f"Tiempo Promedio General de Cierre ({selected_range})", f"{tiempo_promedio_general:.2f} días")
 
-        # Ordenar la matriz por promedio de cierre dinámico
-        cierre_matrix['Promedio'] = cierre_matrix.index.map(
-            tiempo_promedio_por_evaluador.set_index('EVALASIGN')['PromedioDíasCierre'].to_dict()
-        )
-        cierre_matrix = cierre_matrix.sort_values(by='Promedio', ascending=False)
-
         # Mostrar la matriz en Streamlit
         st.subheader(f"Matriz de Cierre de Expedientes ({selected_range})")
         st.dataframe(cierre_matrix)
 
         # Agregar botón de descarga formateado para la matriz de cierre
-        excel_data_matriz = create_excel_download(
+        excel_data_matriz = deferred_excel_download(
             cierre_matrix,
             "matriz_cierre.xlsx",
             "Matriz_Cierre",
@@ -189,9 +137,7 @@ def render_closing_analysis_tab(data: pd.DataFrame):
 
         # Mostrar tabla de tiempos promedio real por evaluador (tiempo entre fechas)
         st.subheader(f"Tiempos Promedio de Cierre por Evaluador ({selected_range})")
-        tiempo_promedio_real = cierre_data_range.groupby('EVALASIGN')['TiempoCierre'].agg(
-            TiempoPromedio=lambda x: x.mean()
-        ).reset_index()
+        tiempo_promedio_real = motor.tiempos_promedio(periodo)
         
         st.dataframe(
             tiempo_promedio_real
@@ -285,7 +231,7 @@ def render_closing_analysis_tab(data: pd.DataFrame):
         st.dataframe(top_25_demorados)
 
         # Agregar botón de descarga formateado
-        excel_data = create_excel_download(
+        excel_data = deferred_excel_download(
             top_25_demorados,
             "top_25_demorados.xlsx",
             "Top_25_Demorados",
@@ -2,12 +2,12 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import PolynomialFeatures
 import numpy as np
 from datetime import datetime, timedelta
+from src.services.model_jobs import render_model_job, job_key
+from src.services.forecast_models import polynomial_forecast
 
-def render_entry_analysis_tab(data: pd.DataFrame):
+def render_entry_analysis_tab(data: pd.DataFrame, selected_module: str = None):
     try:
         st.header("📊 Análisis de Ingreso de Expedientes")
         
@@ -22,7 +22,7 @@ def render_entry_analysis_tab(data: pd.DataFrame):
 
         # 1. Tendencias y Predicciones
         st.subheader("📈 Tendencias y Predicciones de Ingresos")
-        render_trends_and_predictions(data)
+        render_trends_and_predictions(data, selected_module)
         
         st.markdown("---")
         
@@ -40,30 +40,31 @@ def render_entry_analysis_tab(data: pd.DataFrame):
         st.error(f"Error al procesar los datos: {str(e)}")
         print(f"Error detallado: {str(e)}")
 
-def render_trends_and_predictions(data):
+def render_trends_and_predictions(data, selected_module=None):
     """Renderiza gráficos de tendencias y predicciones"""
     daily_counts = data.groupby(data['FechaExpendiente'].dt.date).size().reset_index(name='Ingresos')
     daily_counts['FechaExpendiente'] = pd.to_datetime(daily_counts['FechaExpendiente'])
     
-    # Crear modelo de predicción polinomial
-    X = np.arange(len(daily_counts)).reshape(-1, 1)
-    poly = PolynomialFeatures(degree=2)
-    X_poly = poly.fit_transform(X)
-    
-    model = LinearRegression()
-    model.fit(X_poly, daily_counts['Ingresos'])
-    
-    # Generar predicciones para los próximos 30 días
+    # El ajuste polinomial corre en segundo plano; el gráfico se dibuja al terminar
+    valores = daily_counts['Ingresos'].to_numpy(dtype=float)
+    render_model_job(
+        job_key(valores, daily_counts['FechaExpendiente'].max(), 'ingresos_polinomial', selected_module),
+        polynomial_forecast,
+        (valores, 30, 2),
+        lambda modelo: render_prediction_chart(daily_counts, modelo['predicciones']),
+        grupo=f'ingresos_polinomial_{selected_module}',
+        mensaje="⏳ Calculando predicción de ingresos en segundo plano..."
+    )
+
+def render_prediction_chart(daily_counts, predictions):
+    """Gráfico y métricas de la predicción de ingresos de los próximos 30 días."""
+    # Generar fechas de los próximos 30 días
     future_dates = pd.date_range(
         start=daily_counts['FechaExpendiente'].max(), 
-        periods=31, 
+        periods=len(predictions) + 1, 
         freq='D'
     )[1:]
     
-    X_future = np.arange(len(daily_counts), len(daily_counts) + 30).reshape(-1, 1)
-    X_future_poly = poly.transform(X_future)
-    predictions = model.predict(X_future_poly)
-    
     # Crear gráfico interactivo
     fig = go.Figure()
     
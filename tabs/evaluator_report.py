@@ -1,7 +1,32 @@
 import streamlit as st
 import pandas as pd
 from io import BytesIO
-from src.utils.excel_utils import create_excel_download
+from src.utils.excel_utils import deferred_excel_download
+from src.utils.cache import data_version, session_cached
+from src.services.filter_index import FilterIndex
+from src.utils.paginated_table import render_paginated_table
+
+# Columnas sobre las que se construyen los índices invertidos del reporte
+COLUMNAS_INDEXADAS = ['EVALASIGN', 'Anio', 'ESTADO', 'UltimaEtapa', 'Evaluado', 'Dependencia', 'EstadoTramite']
+DATE_COLUMNS = ['FechaExpendiente', 'FechaPre', 'FechaEtapaAprobacionMasivaFin']
+
+def _preparar_fechas(df: pd.DataFrame) -> pd.DataFrame:
+    """Convierte las columnas de fecha solo sobre las filas ya filtradas."""
+    df = df.copy()
+    for col in DATE_COLUMNS:
+        if col in df.columns and df[col].dtype != 'datetime64[ns]':
+            try:
+                df[col] = pd.to_datetime(df[col], format='%d/%m/%Y', errors='coerce')
+            except Exception:
+                pass
+    return df
+
+def _formatear_fechas(df: pd.DataFrame) -> pd.DataFrame:
+    """Copia con las columnas de fecha como texto dd/mm/yyyy (para exportar)."""
+    df = df.copy()
+    for col in df.select_dtypes(include=['datetime64']).columns:
+        df[col] = df[col].dt.strftime('%d/%m/%Y')
+    return df
 
 def render_evaluator_report_tab(data: pd.DataFrame):
     try:
@@ -12,25 +37,13 @@ def render_evaluator_report_tab(data: pd.DataFrame):
             st.error("No hay datos disponibles para mostrar")
             return
 
-        # Optimizar la carga inicial de datos
-        data = data.copy()  # Crear una copia única al inicio
-        
-        # Convertir fechas una sola vez al inicio
-        date_columns = ['FechaExpendiente', 'FechaPre', 'FechaEtapaAprobacionMasivaFin']
-        for col in date_columns:
-            if col in data.columns:
-                try:
-                    if data[col].dtype != 'datetime64[ns]':
-                        data[col] = pd.to_datetime(data[col], format='%d/%m/%Y', errors='coerce')
-                except Exception:
-                    pass
-
-        # Limpiar y preparar la columna EVALASIGN una sola vez
-        if 'EVALASIGN' in data.columns:
-            data['EVALASIGN'] = data['EVALASIGN'].fillna('').astype(str)
-            evaluators = sorted(data[data['EVALASIGN'].str.strip() != '']['EVALASIGN'].unique())
-            evaluators = ['TODOS LOS EVALUADORES'] + evaluators
-        
+        # Índices invertidos construidos una sola vez por versión de los datos;
+        # el DataFrame de la sesión no se copia ni se modifica
+        indice = session_cached(
+            "evaluator_filter_index", data,
+            lambda df: FilterIndex(df, COLUMNAS_INDEXADAS)
+        )
+
         # Verificar si es módulo SOL de manera más precisa
         is_sol_module = (
             'EstadoTramite' in data.columns and 
@@ -45,7 +58,7 @@ def render_evaluator_report_tab(data: pd.DataFrame):
             
             with col1:
                 # Selector de años
-                available_years = sorted(data['Anio'].unique(), reverse=True)
+                available_years = sorted(indice.valores('Anio'), reverse=True)
                 selected_years = st.multiselect(
                     "Seleccionar Año(s)",
                     options=available_years,
@@ -55,7 +68,7 @@ def render_evaluator_report_tab(data: pd.DataFrame):
 
             with col2:
                 # Selector de dependencias
-                dependencias = sorted(data['Dependencia'].unique())
+                dependencias = sorted(indice.valores('Dependencia'))
                 selected_dependencias = st.multiselect(
                     "Seleccionar Dependencia(s)",
                     options=dependencias,
@@ -68,7 +81,7 @@ def render_evaluator_report_tab(data: pd.DataFrame):
                 
                 with col1:
                     # Filtro por última etapa
-                    etapas = sorted(data['UltimaEtapa'].dropna().unique())
+                    etapas = sorted(indice.valores('UltimaEtapa'))
                     selected_etapas = st.multiselect(
                         "Última Etapa",
                         options=etapas,
@@ -76,7 +89,7 @@ def render_evaluator_report_tab(data: pd.DataFrame):
                     )
                     
                     # Filtro por estado de trámite
-                    estados = sorted(data['EstadoTramite'].dropna().unique())
+                    estados = sorted(indice.valores('EstadoTramite'))
                     selected_estados = st.multiselect(
                         "Estado del Trámite",
                         options=estados,
@@ -96,25 +109,20 @@ def render_evaluator_report_tab(data: pd.DataFrame):
                         key="fecha_fin_sol"
                     )
 
-            # Aplicar filtros para SOL
-            filtered_data = data.copy()
-            
-            if selected_years:
-                filtered_data = filtered_data[filtered_data['Anio'].isin(selected_years)]
-                
-            if selected_dependencias:
-                filtered_data = filtered_data[filtered_data['Dependencia'].isin(selected_dependencias)]
-                
-            if selected_etapas:
-                filtered_data = filtered_data[filtered_data['UltimaEtapa'].isin(selected_etapas)]
-                
-            if selected_estados:
-                filtered_data = filtered_data[filtered_data['EstadoTramite'].isin(selected_estados)]
-                
-            if fecha_inicio:
-                filtered_data = filtered_data[pd.to_datetime(filtered_data['FechaExpendiente'], format='%d/%m/%Y').dt.date >= fecha_inicio]
-            if fecha_fin:
-                filtered_data = filtered_data[pd.to_datetime(filtered_data['FechaExpendiente'], format='%d/%m/%Y').dt.date <= fecha_fin]
+            # Aplicar filtros para SOL (el resultado se reutiliza mientras no cambien)
+            filtros_sol = {
+                'Anio': selected_years,
+                'Dependencia': selected_dependencias,
+                'UltimaEtapa': selected_etapas,
+                'EstadoTramite': selected_estados,
+            }
+            filtered_data = session_cached(
+                "evaluator_report_resultado_sol", data,
+                lambda df: _preparar_fechas(indice.materializar(indice.consultar(
+                    filtros_sol, fecha_desde=fecha_inicio, fecha_hasta=fecha_fin
+                ))),
+                extra=repr((filtros_sol, fecha_inicio, fecha_fin))
+            )
 
             # Mostrar resumen para SOL
             if not filtered_data.empty:
@@ -131,21 +139,17 @@ def render_evaluator_report_tab(data: pd.DataFrame):
                 # Mostrar datos filtrados
                 st.markdown("### 📋 Detalle de Expedientes")
                 
-                # Preparar datos para mostrar
-                display_data = filtered_data[[
+                columnas_sol = [
                     'NumeroTramite', 'Dependencia', 'EstadoTramite', 
                     'UltimaEtapa', 'FechaExpendiente', 
                     'FechaEtapaAprobacionMasivaFin', 'Pre_Concluido'
-                ]].copy()
+                ]
                 
-                # Formatear fechas
-                display_data['FechaExpendiente'] = pd.to_datetime(display_data['FechaExpendiente'], format='%d/%m/%Y').dt.strftime('%d/%m/%Y')
-                display_data['FechaEtapaAprobacionMasivaFin'] = pd.to_datetime(display_data['FechaEtapaAprobacionMasivaFin'], format='%d/%m/%Y').dt.strftime('%d/%m/%Y')
-                
-                # Mostrar tabla
-                st.dataframe(
-                    display_data,
-                    use_container_width=True,
+                # Mostrar tabla paginada
+                render_paginated_table(
+                    filtered_data,
+                    key="evaluator_detalle_sol",
+                    default_columns=columnas_sol,
                     column_config={
                         'NumeroTramite': 'Expediente',
                         'Dependencia': 'Dependencia',
@@ -157,15 +161,17 @@ def render_evaluator_report_tab(data: pd.DataFrame):
                     }
                 )
 
-                # Botón de descarga
-                output = BytesIO()
-                with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                    display_data.to_excel(writer, index=False, sheet_name='Reporte')
-                output.seek(0)
-                
+                # Botón de descarga (todas las filas, con fechas formateadas, generado al hacer clic)
                 st.download_button(
                     label="📥 Descargar Reporte",
-                    data=output,
+                    data=deferred_excel_download(
+                        filtered_data,
+                        "reporte_sol.xlsx",
+                        "Reporte",
+                        spec=repr((filtros_sol, fecha_inicio, fecha_fin)),
+                        formato='simple',
+                        preparar=lambda df: _formatear_fechas(df[columnas_sol])
+                    ),
                     file_name=f"reporte_sol_{pd.Timestamp.now().strftime('%Y%m%d')}.xlsx",
                     mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
                 )
@@ -179,9 +185,8 @@ def render_evaluator_report_tab(data: pd.DataFrame):
                 return
 
             # Modificación para incluir "TODOS LOS EVALUADORES"
-            data['EVALASIGN'] = data['EVALASIGN'].fillna('')
-            evaluators = sorted(data[data['EVALASIGN'] != '']['EVALASIGN'].unique())
-            evaluators = ['TODOS LOS EVALUADORES'] + evaluators
+            evaluadores_validos = [v for v in indice.valores('EVALASIGN') if str(v).strip() != '']
+            evaluators = ['TODOS LOS EVALUADORES'] + sorted(evaluadores_validos, key=str)
             
             # Selección de evaluador
             selected_evaluator = st.selectbox(
@@ -195,7 +200,7 @@ def render_evaluator_report_tab(data: pd.DataFrame):
             
             with col1:
                 # Selector de años
-                available_years = sorted(data['Anio'].unique(), reverse=True)
+                available_years = sorted(indice.valores('Anio'), reverse=True)
                 selected_years = st.multiselect(
                     "Seleccionar Año(s)",
                     options=available_years,
@@ -214,7 +219,7 @@ def render_evaluator_report_tab(data: pd.DataFrame):
 
             with col3:
                 # Filtro por estado del expediente
-                estados_unicos = sorted(data['ESTADO'].dropna().unique())
+                estados_unicos = sorted(indice.valores('ESTADO'))
                 selected_estados = st.multiselect(
                     "Estado del Expediente",
                     options=estados_unicos,
@@ -227,7 +232,7 @@ def render_evaluator_report_tab(data: pd.DataFrame):
                 
                 with col1:
                     # Filtro por última etapa
-                    etapas = sorted(data['UltimaEtapa'].dropna().unique())
+                    etapas = sorted(indice.valores('UltimaEtapa'))
                     selected_etapas = st.multiselect(
                         "Última Etapa",
                         options=etapas,
@@ -251,47 +256,45 @@ def render_evaluator_report_tab(data: pd.DataFrame):
             with col1:
                 filtrar = st.button("🔍 Aplicar Filtros", type="primary")
 
-            @st.cache_data  # Cachear los resultados del filtrado
-            def filter_data(df, evaluator, years, estados, etapas, estado_eval, fecha_inicio, fecha_fin):
-                filtered = df.copy()
-                
-                if evaluator == 'TODOS LOS EVALUADORES':
-                    filtered = filtered[filtered['EVALASIGN'].str.strip() != '']
-                else:
-                    filtered = filtered[filtered['EVALASIGN'] == evaluator]
-                
-                if years:
-                    filtered = filtered[filtered['Anio'].isin(years)]
-                
-                if estado_eval == "Pendientes":
-                    filtered = filtered[filtered['Evaluado'] == 'NO']
-                elif estado_eval == "Evaluados":
-                    filtered = filtered[filtered['Evaluado'] == 'SI']
-                
-                if selected_estados:
-                    filtered = filtered[filtered['ESTADO'].isin(selected_estados)]
-                
-                if selected_etapas:
-                    filtered = filtered[filtered['UltimaEtapa'].isin(selected_etapas)]
-                
-                if fecha_inicio:
-                    filtered = filtered[filtered['FechaExpendiente'].dt.date >= fecha_inicio]
-                if fecha_fin:
-                    filtered = filtered[filtered['FechaExpendiente'].dt.date <= fecha_fin]
-                
-                return filtered
-
-            # Usar la función cacheada para el filtrado
+            # Los filtros aplicados se conservan en la sesión para que la paginación
+            # de la tabla (que provoca un rerun) no pierda el resultado. Quedan
+            # ligados a la versión de los datos: al cambiar de módulo o recargar
+            # se descartan en lugar de aplicarse a otros datos
+            version = data_version(data)
             if filtrar:
-                filtered_data = filter_data(
-                    data,
-                    selected_evaluator,
-                    selected_years,
-                    selected_estados,
-                    selected_etapas,
-                    estado_eval,
-                    fecha_inicio,
-                    fecha_fin
+                st.session_state['evaluator_report_filtros'] = {
+                    'version': version,
+                    'evaluador': selected_evaluator,
+                    'filtros': {
+                        'EVALASIGN': (
+                            evaluadores_validos
+                            if selected_evaluator == 'TODOS LOS EVALUADORES'
+                            else [selected_evaluator]
+                        ),
+                        'Anio': selected_years,
+                        'Evaluado': {'Pendientes': ['NO'], 'Evaluados': ['SI']}.get(estado_eval),
+                        'ESTADO': selected_estados,
+                        'UltimaEtapa': selected_etapas,
+                    },
+                    'fecha_desde': fecha_inicio,
+                    'fecha_hasta': fecha_fin,
+                }
+            aplicados = st.session_state.get('evaluator_report_filtros')
+            if aplicados and aplicados['version'] != version:
+                st.session_state.pop('evaluator_report_filtros', None)
+                aplicados = None
+
+            # Resolver el filtrado con los índices invertidos
+            if aplicados:
+                selected_evaluator = aplicados['evaluador']
+                filtered_data = session_cached(
+                    "evaluator_report_resultado", data,
+                    lambda df: _preparar_fechas(indice.materializar(indice.consultar(
+                        aplicados['filtros'],
+                        fecha_desde=aplicados['fecha_desde'],
+                        fecha_hasta=aplicados['fecha_hasta']
+                    ))),
+                    extra=repr(aplicados)
                 )
                 
                 # Mostrar resumen solo si hay datos filtrados
@@ -309,51 +312,43 @@ def render_evaluator_report_tab(data: pd.DataFrame):
                     # Mostrar datos filtrados
                     st.markdown("### 📋 Detalle de Expedientes")
                     
-                    # Usar todas las columnas disponibles
-                    display_data = filtered_data.copy()
-                    
-                    # Formatear fechas donde sea necesario
-                    date_columns = display_data.select_dtypes(include=['datetime64']).columns
-                    for col in date_columns:
-                        display_data[col] = display_data[col].dt.strftime('%d/%m/%Y')
-                    
-                    # Mostrar tabla con todas las columnas
-                    st.dataframe(
-                        display_data,
-                        use_container_width=True
-                    )
+                    # Tabla paginada: solo la página visible se formatea y se envía
+                    render_paginated_table(filtered_data, key="evaluator_detalle")
 
-                    # Botones de descarga
+                    # Botones de descarga: los archivos (con todas las filas y fechas
+                    # formateadas) se generan solo al hacer clic
                     col1, col2 = st.columns(2)
+                    filename_prefix = "reporte_todos" if selected_evaluator == 'TODOS LOS EVALUADORES' else f"reporte_{selected_evaluator.replace(' ', '_')}"
+                    spec = repr(aplicados)
                     
                     with col1:
                         # Botón de descarga normal
-                        output = BytesIO()
-                        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                            display_data.to_excel(writer, index=False, sheet_name='Reporte')
-                        output.seek(0)
-                        
-                        filename_prefix = "reporte_todos" if selected_evaluator == 'TODOS LOS EVALUADORES' else f"reporte_{selected_evaluator.replace(' ', '_')}"
-                        
                         st.download_button(
                             label="📥 Descargar Reporte",
-                            data=output,
+                            data=deferred_excel_download(
+                                filtered_data,
+                                f"{filename_prefix}.xlsx",
+                                "Reporte",
+                                spec=spec,
+                                formato='simple',
+                                preparar=_formatear_fechas
+                            ),
                             file_name=f"{filename_prefix}.xlsx",
                             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
                         )
 
                     with col2:
                         # Botón de descarga formateado
-                        excel_data_evaluador = create_excel_download(
-                            display_data,
-                            f"{filename_prefix}_formateado.xlsx",
-                            "Reporte_Evaluador",
-                            f"Reporte de {'Todos los Evaluadores' if selected_evaluator == 'TODOS LOS EVALUADORES' else selected_evaluator}"
-                        )
-
                         st.download_button(
                             label="📥 Descargar Reporte Formateado",
-                            data=excel_data_evaluador,
+                            data=deferred_excel_download(
+                                filtered_data,
+                                f"{filename_prefix}_formateado.xlsx",
+                                "Reporte_Evaluador",
+                                f"Reporte de {'Todos los Evaluadores' if selected_evaluator == 'TODOS LOS EVALUADORES' else selected_evaluator}",
+                                spec=spec,
+                                preparar=_formatear_fechas
+                            ),
                             file_name=f"{filename_prefix}_formateado.xlsx",
                             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
                         )
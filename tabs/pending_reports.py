@@ -2,7 +2,7 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 from config.settings import INACTIVE_EVALUATORS, VULNERABILIDAD_EVALUATORS
-from src.utils.excel_utils import create_excel_download
+from src.utils.excel_utils import deferred_excel_download
 
 def render_pending_reports_tab(data: pd.DataFrame, selected_module: str):
     st.header("Reporte de Pendientes")
@@ -164,7 +164,7 @@ def render_pending_reports_tab(data: pd.DataFrame, selected_module: str):
         )
 
         # Agregar botón de descarga formateado
-        excel_data = create_excel_download(
+        excel_data = deferred_excel_download(
             pending_table,
             "pendientes_detalle.xlsx",
             "Pendientes_Detalle",
@@ -242,7 +242,7 @@ def render_pending_reports_tab(data: pd.DataFrame, selected_module: str):
             )
 
             # Agregar botón de descarga formateado para la tabla resumen
-            excel_data_resumen = create_excel_download(
+            excel_data_resumen = deferred_excel_download(
                 summary_table,
                 "resumen_general.xlsx",
                 "Resumen_General",
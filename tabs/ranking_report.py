@@ -4,21 +4,24 @@ from datetime import datetime, timedelta
 import plotly.express as px
 import os
 import time
-from src.utils.excel_utils import create_excel_download
+from src.utils.excel_utils import deferred_excel_download
+from src.utils.paginated_table import render_paginated_table
+from src.services.rankings_repository import RankingsRepository
+from src.utils.parquet_store import existe_tabla, leer_tabla
 
 @st.cache_data
 def load_consolidated_cached(module_name):
     """Carga datos consolidados del módulo especificado."""
     folder = f"descargas/{module_name}"
-    for file in os.listdir(folder):
-        if file.startswith(f"Consolidado_{module_name}_CRUZADO") and file.endswith(".xlsx"):
-            file_path = os.path.join(folder, file)
-            data = pd.read_excel(file_path)
-            data['Anio'] = data['Anio'].astype(int)
-            data['Mes'] = data['Mes'].astype(int)
-            if 'FechaExpendiente' in data.columns:
-                data['FechaExpendiente'] = pd.to_datetime(data['FechaExpendiente'])
-            return data
+    base = os.path.join(folder, f"Consolidado_{module_name}_CRUZADO")
+    file_path = existe_tabla(f"{base}.parquet", f"{base}.xlsx")
+    if file_path:
+        data = leer_tabla(file_path)
+        data['Anio'] = data['Anio'].astype(int)
+        data['Mes'] = data['Mes'].astype(int)
+        if 'FechaExpendiente' in data.columns:
+            data['FechaExpendiente'] = pd.to_datetime(data['FechaExpendiente'])
+        return data
     return None
 
 def render_ranking_report_tab(data: pd.DataFrame, selected_module: str, rankings_collection):
@@ -67,10 +70,11 @@ def render_ranking_report_tab(data: pd.DataFrame, selected_module: str, rankings
         fecha_inicio = fecha_ayer - timedelta(days=14)
         
         # Obtener solo datos histricos de la base de datos
-        datos_historicos = get_rankings_from_db(
+        datos_historicos = load_rankings_cached(
             selected_module, 
-            rankings_collection, 
-            fecha_inicio
+            fecha_inicio,
+            _rankings_version.get(selected_module, 0),
+            rankings_collection
         )
         
         # Preparar datos nuevos solo para mostrar en el selector de guardado
@@ -172,7 +176,7 @@ def render_ranking_report_tab(data: pd.DataFrame, selected_module: str, rankings
             )
 
             # Agregar botón de descarga formateado para la matriz de ranking
-            excel_data_ranking = create_excel_download(
+            excel_data_ranking = deferred_excel_download(
                 matriz_ranking,
                 "matriz_ranking.xlsx",
                 "Matriz_Ranking",
@@ -195,6 +199,7 @@ def render_ranking_report_tab(data: pd.DataFrame, selected_module: str, rankings
                 if st.button("🔄 Resetear último día", 
                            help="Elimina los registros del último día para poder grabarlos nuevamente"):
                     reset_last_day(selected_module, rankings_collection, ultima_fecha_registrada)
+                    invalidate_rankings_cache(selected_module)
                     st.success("✅ Último día reseteado correctamente")
                     st.rerun()
 
@@ -224,8 +229,12 @@ def render_ranking_report_tab(data: pd.DataFrame, selected_module: str, rankings
                             ['FECHA DE TRABAJO', 'EVALASIGN']
                         ).size().reset_index(name='cantidad')
                         
-                        save_rankings_to_db(selected_module, rankings_collection, datos_agrupados)
-                        st.success("✅ Datos guardados correctamente")
+                        resultado = save_rankings_to_db(selected_module, rankings_collection, datos_agrupados)
+                        invalidate_rankings_cache(selected_module)
+                        st.success(
+                            f"✅ Datos guardados correctamente: {resultado['insertados']} fechas nuevas, "
+                            f"{resultado['actualizados']} actualizadas"
+                        )
                         st.rerun()
 
         # Sección de edición manual
@@ -258,26 +267,13 @@ def render_ranking_report_tab(data: pd.DataFrame, selected_module: str, rankings
                 )
             
             with col3:
-                # Obtener valor actual de manera más robusta
-                try:
-                    # Primero intentamos obtener el valor de la base de datos directamente
-                    doc = rankings_collection.find_one({
-                        "fecha": datetime.combine(fecha_editar, datetime.min.time()),
-                        "modulo": selected_module
-                    })
-                    
-                    if doc and 'datos' in doc:
-                        # Buscar el evaluador en los datos
-                        valor_actual = 0
-                        for dato in doc['datos']:
-                            if dato['evaluador'] == evaluador_editar:
-                                valor_actual = dato['cantidad']
-                                break
-                    else:
-                        valor_actual = 0
-                except Exception as e:
-                    print(f"Error al obtener valor actual: {str(e)}")
-                    valor_actual = 0
+                # Valor actual tomado de los rankings ya cargados (sin otra consulta)
+                valores_actuales = datos_historicos.loc[
+                    (datos_historicos['evaluador'] == evaluador_editar) &
+                    (pd.to_datetime(datos_historicos['fecha']) == pd.Timestamp(fecha_editar)),
+                    'cantidad'
+                ].dropna()
+                valor_actual = valores_actuales.iloc[0] if not valores_actuales.empty else 0
                 
                 nuevo_valor = st.number_input(
                     "🔢 Nueva Cantidad",
@@ -287,70 +283,20 @@ def render_ranking_report_tab(data: pd.DataFrame, selected_module: str, rankings
                     key="nuevo_valor"
                 )
             
-            # Botón para actualizar
+            # Botón para actualizar: un solo update atómico sobre el elemento del evaluador
             if st.button("💾 Actualizar Registro"):
                 try:
-                    # Convertir fecha a datetime para MongoDB
-                    fecha_datetime = datetime.combine(fecha_editar, datetime.min.time())
-                    
-                    # Buscar el documento existente
-                    documento = rankings_collection.find_one({
-                        "fecha": fecha_datetime,
-                        "modulo": selected_module
-                    })
+                    resultado = RankingsRepository(rankings_collection).set_count(
+                        selected_module, pd.Timestamp(fecha_editar), evaluador_editar, nuevo_valor
+                    )
                     
-                    if documento:
-                        # Actualizar el valor específico
-                        datos_actualizados = documento.get('datos', [])
-                        evaluador_encontrado = False
-                        
-                        for dato in datos_actualizados:
-                            if dato['evaluador'] == evaluador_editar:
-                                if dato['cantidad'] != nuevo_valor:  # Solo actualizar si el valor es diferente
-                                    dato['cantidad'] = nuevo_valor
-                                    evaluador_encontrado = True
-                                break
-                        
-                        # Si el evaluador no existe en los datos, lo agregamos
-                        if not evaluador_encontrado:
-                            datos_actualizados.append({
-                                'evaluador': evaluador_editar,
-                                'cantidad': nuevo_valor
-                            })
-                        
-                        # Actualizar documento en MongoDB
-                        result = rankings_collection.update_one(
-                            {
-                                "fecha": fecha_datetime,
-                                "modulo": selected_module
-                            },
-                            {
-                                "$set": {
-                                    "datos": datos_actualizados
-                                }
-                            },
-                            upsert=True  # Crear el documento si no existe
-                        )
-                        
-                        # Forzar la recarga de los datos
-                        st.cache_data.clear()
-                        st.success("✅ Registro actualizado correctamente")
-                        st.rerun()
-                    else:
-                        # Si no existe el documento, lo creamos
-                        nuevo_documento = {
-                            "fecha": fecha_datetime,
-                            "modulo": selected_module,
-                            "datos": [{
-                                "evaluador": evaluador_editar,
-                                "cantidad": nuevo_valor
-                            }]
-                        }
-                        rankings_collection.insert_one(nuevo_documento)
+                    # Invalidar solo los rankings de este módulo
+                    invalidate_rankings_cache(selected_module)
+                    if resultado == 'creado':
                         st.success("✅ Nuevo registro creado correctamente")
-                        st.cache_data.clear()
-                        time.sleep(1)
-                        st.rerun()
+                    else:
+                        st.success("✅ Registro actualizado correctamente")
+                    st.rerun()
                         
                 except Exception as e:
                     st.error(f"❌ Error al actualizar el registro: {str(e)}")
@@ -524,18 +470,22 @@ def render_ranking_report_tab(data: pd.DataFrame, selected_module: str, rankings
                         )
                     }
                     
-                    # Mostrar tabla de expedientes
-                    st.dataframe(
+                    # Mostrar tabla de expedientes paginada
+                    render_paginated_table(
                         expedientes_mostrar,
-                        use_container_width=True,
+                        key="ranking_detalle",
                         column_config=column_config,
-                        hide_index=True
+                        date_format=None
                     )
                     
                     # Botón para descargar todos los datos
                     if st.download_button(
                         label="📥 Descargar Expedientes",
-                        data=expedientes_mostrar.to_csv(index=False),
+                        data=deferred_excel_download(
+                            expedientes_mostrar,
+                            f'expedientes_{evaluador_seleccionado}_{fecha_seleccionada}.csv',
+                            formato='csv'
+                        ),
                         file_name=f'expedientes_{evaluador_seleccionado}_{fecha_seleccionada}.csv',
                         mime='text/csv'
                     ):
@@ -627,7 +577,7 @@ def render_ranking_report_tab(data: pd.DataFrame, selected_module: str, rankings
             )
             
             # Agregar botón de descarga formateado para inconsistencias
-            excel_data_inconsistencias = create_excel_download(
+            excel_data_inconsistencias = deferred_excel_download(
                 expedientes_sin_evaluador,
                 "inconsistencias.xlsx",
                 "Inconsistencias",
@@ -647,6 +597,19 @@ def render_ranking_report_tab(data: pd.DataFrame, selected_module: str, rankings
         st.error(f"Error al procesar el ranking: {str(e)}")
         print(f"Error detallado: {str(e)}")
 
+# Versión de los rankings por módulo: al incrementarla se invalida solo la
+# caché de ese módulo, sin tocar los datasets cacheados del resto de la app
+_rankings_version = {}
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def load_rankings_cached(module, start_date, version, _collection):
+    """Rankings del módulo desde start_date, cacheados por (módulo, fecha, versión)."""
+    return get_rankings_from_db(module, _collection, start_date)
+
+def invalidate_rankings_cache(module):
+    """Invalida los rankings cacheados del módulo indicado."""
+    _rankings_version[module] = _rankings_version.get(module, 0) + 1
+
 def get_last_date_from_db(module, collection):
     """Obtener la última fecha registrada para el módulo."""
     try:
@@ -673,97 +636,42 @@ def get_last_date_from_db(module, collection):
         print(f"Error al obtener última fecha: {str(e)}")
         return None
 
-def get_rankings_from_db(module, collection, start_date):
-    """Obtener los rankings desde expedientes_db.rankings."""
+def get_rankings_from_db(module, collection, start_date, end_date=None):
+    """
+    Obtener los rankings desde expedientes_db.rankings para la ventana
+    [start_date, end_date]. El filtro, la proyección y el aplanado de `datos`
+    se resuelven en MongoDB (ver RankingsRepository).
+    """
     try:
-        # Buscar todos los registros del módulo sin filtro de fecha inicial
-        registros = collection.find({
-            "modulo": module
-        }).sort("fecha", 1)
-        
-        data_list = []
-        fechas_procesadas = set()
-        
-        for registro in registros:
-            try:
-                fecha = registro.get('fecha')
-                if isinstance(fecha, dict) and '$date' in fecha:
-                    # Manejar formato específico de MongoDB
-                    timestamp_ms = int(fecha['$date'].get('$numberLong', 0))
-                    fecha = datetime.fromtimestamp(timestamp_ms / 1000)
-                
-                if fecha:
-                    fecha_date = fecha.date() if isinstance(fecha, datetime) else fecha
-                    fechas_procesadas.add(fecha_date)
-                    
-                    if 'datos' in registro:
-                        for evaluador_data in registro['datos']:
-                            cantidad = evaluador_data.get('cantidad')
-                            # Manejar cantidad en formato MongoDB
-                            if isinstance(cantidad, dict) and '$numberInt' in cantidad:
-                                cantidad = int(cantidad['$numberInt'])
-                            elif cantidad is not None:
-                                cantidad = int(cantidad)
-                            
-                            data_list.append({
-                                'fecha': fecha_date,
-                                'evaluador': evaluador_data['evaluador'],
-                                'cantidad': cantidad
-                            })
-
-            except Exception as e:
-                continue
+        df = RankingsRepository(collection).read(module, start_date, end_date)
+        if df.empty:
+            return pd.DataFrame()
 
-        if data_list:
-            df = pd.DataFrame(data_list)
-            # Ordenar por fecha
-            df = df.sort_values('fecha')
-            return df
-
-        return pd.DataFrame()
+        # Las fechas se manejan como date en la pestaña (selectores y edición)
+        df['fecha'] = df['fecha'].dt.date
+        return df
         
     except Exception as e:
         st.error(f"Error al obtener rankings: {str(e)}")
         return pd.DataFrame()
 
 def save_rankings_to_db(module, collection, data):
-    """Guardar nuevos rankings en MongoDB."""
+    """
+    Guardar nuevos rankings en MongoDB con un solo bulk_write de upserts
+    por (modulo, fecha).
+
+    Returns:
+        Diccionario con las fechas insertadas, actualizadas y sin cambios
+    """
     try:
-        # Agrupar datos por fecha
-        for fecha, grupo in data.groupby('FECHA DE TRABAJO'):
-            # Preparar datos en el formato correcto
-            datos_evaluadores = [
-                {
-                    "evaluador": row['EVALASIGN'],
-                    "cantidad": int(row['cantidad'])  # Asegurar que sea entero
-                }
-                for _, row in grupo.iterrows()
-            ]
-            
-            # Insertar documento con el formato correcto
-            documento = {
-                "modulo": module,
-                "fecha": fecha.to_pydatetime(),  # Convertir a datetime para MongoDB
-                "datos": datos_evaluadores
-            }
-            collection.insert_one(documento)
+        conteos = data.rename(columns={'FECHA DE TRABAJO': 'fecha', 'EVALASIGN': 'evaluador'})
+        return RankingsRepository(collection).write(module, conteos[['fecha', 'evaluador', 'cantidad']])
     except Exception as e:
         raise Exception(f"Error al guardar rankings: {str(e)}")
 
 def reset_last_day(module, collection, last_date):
     """Eliminar registros del último día."""
     try:
-        last_datetime = datetime.combine(last_date, datetime.min.time())
-        
-        # Eliminar registro con o sin módulo para esa fecha
-        collection.delete_many({
-            "$and": [
-                {"fecha": last_datetime},
-                {"$or": [
-                    {"modulo": module},
-                    {"modulo": {"$exists": False}}
-                ]}
-            ]
-        })
+        RankingsRepository(collection).delete_day(module, last_date, incluir_sin_modulo=True)
     except Exception as e:
         raise Exception(f"Error al resetear último día: {str(e)}")
\ No newline at end of file